@@ -0,0 +1,296 @@
+# affichage.py
+
+import collections
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from cache_plans import cle_plan
+from moteur import signature_morceau
+from profils import lire_profil
+
+# --- PALETTE DE COULEURS ---
+# Un calque par famille d'éléments ; chaque moteur de rendu (PDF, SVG, DXF) en tire son style.
+COULEURS = {
+    "poteau": (217, 30, 24), "lisse": (26, 188, 156), "barreau": (52, 152, 219),
+    "cote": (142, 68, 173), "texte_noir": (0, 0, 0), "liaison": (108, 117, 125),
+    "platine": (44, 62, 80), "trou": (0, 0, 0),
+}
+
+# --- LISTE D'AFFICHAGE ---
+# Coordonnées en millimètres réels, y vers le haut. Les rectangles sont repérés par leur coin
+# supérieur gauche, comme les moteurs de rendu les tracent. Les cotes portent en plus un
+# `decalage` exprimé en millimètres papier : c'est une convention de mise en page, pas de géométrie.
+
+@dataclass(slots=True)
+class Rect:
+    calque: str
+    x: float
+    y: float
+    w: float
+    h: float
+
+@dataclass(slots=True)
+class Rangee:
+    """`nombre` rectangles identiques au pas `dx` (barreaux verticaux) ; `vide` est le jour entre deux."""
+    calque: str
+    x: float
+    y: float
+    w: float
+    h: float
+    dx: float
+    nombre: int
+    vide: float
+
+    def rects(self) -> List[Rect]:
+        return [Rect(self.calque, self.x + k * self.dx, self.y, self.w, self.h) for k in range(self.nombre)]
+
+@dataclass(slots=True)
+class Cercle:
+    calque: str
+    x: float
+    y: float
+    r: float
+
+@dataclass(slots=True)
+class Cote:
+    """Cote horizontale ("h", de x à x + longueur, tracée sous l'ancre) ou verticale ("v", de y à y + longueur, à gauche ou à droite)."""
+    sens: str
+    x: float
+    y: float
+    longueur: float
+    texte: str
+    decalage: float
+    a_droite: bool = False
+
+Element = Union[Rect, Rangee, Cercle, Cote]
+
+@dataclass(slots=True)
+class Vue:
+    id: str
+    titre: str
+    largeur: float
+    hauteur: float
+    elements: List[Element] = field(default_factory=list)
+
+    def bornes(self) -> Tuple[float, float, float, float]:
+        """(x_min, y_min, x_max, y_max) de la géométrie et des lignes d'attache des cotes, hors décalages."""
+        xs, ys = [], []
+        for e in self.elements:
+            if isinstance(e, Rangee):
+                xs += [e.x, e.x + (e.nombre - 1) * e.dx + e.w]
+                ys += [e.y, e.y - e.h]
+            elif isinstance(e, Rect):
+                xs += [e.x, e.x + e.w]
+                ys += [e.y, e.y - e.h]
+            elif isinstance(e, Cercle):
+                xs += [e.x - e.r, e.x + e.r]
+                ys += [e.y - e.r, e.y + e.r]
+            elif e.sens == "h":
+                xs += [e.x, e.x + e.longueur]
+                ys.append(e.y)
+            else:
+                xs.append(e.x)
+                ys += [e.y, e.y + e.longueur]
+        return (min(xs), min(ys), max(xs), max(ys)) if xs else (0, 0, 1, 1)
+
+@dataclass(slots=True)
+class Page:
+    """Une page du plan : `type` vaut "ensemble", "morceau" ou "platine"."""
+    type: str
+    titre: str
+    vues: List[Vue] = field(default_factory=list)
+    repetition: int = 1
+    legende: List[Tuple[str, str, str, str]] = field(default_factory=list)  # (titre, détail, calque, côté "L"/"R")
+    tableau: Optional[Dict[str, Any]] = None
+
+@dataclass(slots=True)
+class Affichage:
+    pages: List[Page]
+
+    def en_dict(self) -> Dict[str, Any]:
+        return {"pages": [_page_en_dict(p) for p in self.pages], "calques": {c: "#%02x%02x%02x" % rgb for c, rgb in COULEURS.items()}}
+
+
+def _r(valeur: float) -> float:
+    """Coordonnées arrondies au dixième de millimètre pour l'export JSON."""
+    return round(valeur, 1)
+
+def _element_en_dict(e: Element) -> Dict[str, Any]:
+    if isinstance(e, Rect):
+        return {"forme": "rect", "calque": e.calque, "x": _r(e.x), "y": _r(e.y), "w": _r(e.w), "h": _r(e.h)}
+    if isinstance(e, Rangee):
+        return {"forme": "rangee", "calque": e.calque, "x": _r(e.x), "y": _r(e.y), "w": _r(e.w), "h": _r(e.h), "dx": round(e.dx, 3), "nombre": e.nombre, "vide": _r(e.vide)}
+    if isinstance(e, Cercle):
+        return {"forme": "cercle", "calque": e.calque, "x": _r(e.x), "y": _r(e.y), "r": _r(e.r)}
+    return {"forme": "cote", "sens": e.sens, "x": _r(e.x), "y": _r(e.y), "longueur": _r(e.longueur), "texte": e.texte, "decalage": e.decalage, "a_droite": e.a_droite}
+
+def _page_en_dict(page: Page) -> Dict[str, Any]:
+    return {
+        "type": page.type, "titre": page.titre, "repetition": page.repetition,
+        "vues": [{"id": v.id, "titre": v.titre, "largeur": _r(v.largeur), "hauteur": _r(v.hauteur), "elements": [_element_en_dict(e) for e in v.elements]} for v in page.vues],
+        "legende": [list(l) for l in page.legende], "tableau": page.tableau,
+    }
+
+
+# --- CONSTRUCTION ---
+
+def page_ensemble(plan: Dict[str, Any]) -> Page:
+    """Page 1 : vue d'ensemble schématique des morceaux bout à bout et nomenclature globale."""
+    page = Page("ensemble", "1. Vue d'Ensemble")
+    total_project_length = sum(m['longueur_totale'] for m in plan['morceaux'])
+    if total_project_length > 0:
+        hauteur = plan['hauteur_totale']
+        epaisseurs_jonctions = {item_type: lire_profil(plan[f"{item_type}_dims"]).deduction for item_type in ('poteau', 'liaison')}
+        vue = Vue("ensemble", "Vue d'ensemble", total_project_length, hauteur)
+        cursor_x = 0
+        for morceau in plan['morceaux']:
+            for item in morceau['structure']:
+                item_type = item.get('type')
+                if item_type in ('poteau', 'liaison'):
+                    vue.elements.append(Rect(item_type, cursor_x, hauteur, epaisseurs_jonctions[item_type], hauteur))
+                    cursor_x += epaisseurs_jonctions[item_type]
+                elif item_type == 'section':
+                    longueur_libre = morceau['sections_details'][0]['longueur_libre']
+                    vue.elements.append(Rect("lisse", cursor_x, hauteur, longueur_libre, hauteur))
+                    cursor_x += longueur_libre
+        vue.elements.append(Cote("h", 0, 0, total_project_length, f"Longueur Totale: {total_project_length} mm", 5))
+        page.vues.append(vue)
+    page.tableau = {
+        "titre": "2. Nomenclature Globale",
+        "entetes": ['Element', 'Details', 'Quantite', 'Longueur Unitaire'],
+        "lignes": [[item['item'], item['details'], str(item['quantite']), f"{item['longueur_unitaire_mm']} mm"] for item in plan['nomenclature']],
+    }
+    return page
+
+def page_morceau(morceau: Dict[str, Any], plan: Dict[str, Any], repetition: int = 1) -> Page:
+    """Élévation cotée d'un morceau, origine au pied de sa première jonction."""
+    page = Page("morceau", f"Détail du Morceau (longueur {morceau['longueur_totale']} mm)", repetition=repetition)
+    hauteur_totale = plan['hauteur_totale']
+    hauteur_lisse_basse = plan['hauteur_lisse_basse']
+    barreau = lire_profil(plan['barreau_dims'])
+    dims_map_visuel = {"poteau": lire_profil(plan['poteau_dims']).deduction, "liaison": lire_profil(plan['liaison_dims']).deduction}
+    lisse_haute_ep = lire_profil(plan['lissehaute_dims']).largeur
+    lisse_basse_ep = lire_profil(plan['lissebasse_dims']).largeur
+    remplissage_details = plan.get('remplissage_details')
+    vue = Vue(f"morceau_{morceau['id']}", page.titre, morceau['longueur_totale'], hauteur_totale)
+    elements = vue.elements
+    cursor_x = 0.0
+    section_details_iterator = iter(morceau['sections_details'])
+    for item in morceau['structure']:
+        item_type = item.get('type')
+        if item_type in ('poteau', 'liaison'):
+            elements.append(Rect(item_type, cursor_x, hauteur_totale, dims_map_visuel[item_type], hauteur_totale))
+            cursor_x += dims_map_visuel[item_type]
+        elif item_type == 'section':
+            section_details = next(section_details_iterator, None)
+            if section_details is None:
+                continue
+            longueur_libre = section_details['longueur_libre']
+            elements.append(Rect("lisse", cursor_x, hauteur_totale, longueur_libre, lisse_haute_ep))
+            elements.append(Rect("lisse", cursor_x, hauteur_lisse_basse + lisse_basse_ep, longueur_libre, lisse_basse_ep))
+            if plan.get('remplissage_type') == 'barreaudage_horizontal':
+                if remplissage_details and remplissage_details['nombre_barreaux'] > 0:
+                    jeu_depart_v = remplissage_details['jeu_depart_mm']
+                    espacement_v = remplissage_details['vide_entre_barreaux_mm']
+                    for k in range(remplissage_details['nombre_barreaux']):
+                        y_pos = hauteur_lisse_basse + lisse_basse_ep + jeu_depart_v + k * (barreau.largeur + espacement_v)
+                        elements.append(Rect("barreau", cursor_x, y_pos + barreau.largeur, longueur_libre, barreau.largeur))
+            elif section_details['nombre_barreaux'] > 0:
+                espacement = section_details['vide_entre_barreaux_mm']
+                hauteur_barreau = hauteur_totale - hauteur_lisse_basse - lisse_haute_ep - lisse_basse_ep
+                elements.append(Rangee("barreau", cursor_x + section_details['jeu_depart_mm'], hauteur_totale - lisse_haute_ep, barreau.deduction, hauteur_barreau,
+                                       espacement + barreau.deduction, section_details['nombre_barreaux'], espacement))
+            cursor_x += longueur_libre
+    elements.append(Cote("v", 0, 0, hauteur_totale, str(hauteur_totale), 5))
+    elements.append(Cote("v", 0, 0, hauteur_lisse_basse, str(hauteur_lisse_basse), 15))
+    elements.append(Cote("h", 0, 0, morceau['longueur_totale'], f"L. Totale: {morceau['longueur_totale']}", 5))
+    cursor_cote = 0
+    for item in morceau['structure']:
+        if item['type'] == 'section':
+            elements.append(Cote("h", cursor_cote, 0, item['longueur'], f"Section: {item['longueur']}", 15))
+            cursor_cote += item['longueur']
+    page.vues.append(vue)
+    page.legende = [
+        ("Poteau:", plan['poteau_dims'], "poteau", "L"),
+        ("Liaison:", plan['liaison_dims'], "liaison", "L"),
+        ("Barreau:", plan['barreau_dims'], "barreau", "L"),
+        ("Lisse Haute:", plan['lissehaute_dims'], "lisse", "R"),
+        ("Lisse Basse:", plan['lissebasse_dims'], "lisse", "R"),
+    ]
+    return page
+
+def page_platine(platine: Dict[str, Any], poteau_dims: str) -> Page:
+    """Platine vue de dessus (centrée sur le poteau) et vue de côté."""
+    p_l, p_w, p_e = platine['longueur'], platine['largeur'], platine['epaisseur']
+    e_l, e_w = platine['entraxe_longueur'], platine['entraxe_largeur']
+    poteau = lire_profil(poteau_dims)
+    trou_r = platine['diametre_trous'] / 2
+    dessus = Vue("platine_dessus", "Vue de dessus", p_l, p_w, [
+        Rect("platine", -p_l / 2, p_w / 2, p_l, p_w),
+        Rect("poteau", -poteau.largeur / 2, poteau.deduction / 2, poteau.largeur, poteau.deduction),
+        Cercle("trou", -e_l / 2, e_w / 2, trou_r), Cercle("trou", e_l / 2, e_w / 2, trou_r),
+        Cercle("trou", -e_l / 2, -e_w / 2, trou_r), Cercle("trou", e_l / 2, -e_w / 2, trou_r),
+        Cote("h", -p_l / 2, -p_w / 2, p_l, str(p_l), 10),
+        Cote("h", -e_l / 2, -p_w / 2, e_l, f"Entraxe {e_l}", 20),
+        Cote("v", -p_l / 2, -p_w / 2, p_w, str(p_w), 10),
+        Cote("v", -p_l / 2, -e_w / 2, e_w, f"Entraxe {e_w}", 20),
+    ])
+    cote = Vue("platine_cote", "Vue de cote", p_l, p_e, [
+        Rect("platine", -p_l / 2, 0, p_l, p_e),
+        Cote("v", p_l / 2, -p_e, p_e, str(p_e), 5, a_droite=True),
+    ])
+    return Page("platine", "Détail de la Platine de Fixation", [dessus, cote])
+
+def groupes_du_plan(plan: Dict[str, Any]) -> List[List[Dict[str, Any]]]:
+    """Morceaux regroupés par structure identique.
+
+    Le regroupement calculé par le moteur (`groupes_morceaux`) est repris s'il couvre chaque morceau
+    une fois, ne réunit que des structures égales et sépare des structures différentes ; sinon
+    (plan ancien ou modifié à la main), on le refait.
+    """
+    morceaux = plan['morceaux']
+    groupes = plan.get('groupes_morceaux')
+    if groupes and all(groupes) and sorted(i for g in groupes for i in g) == list(range(len(morceaux))) \
+            and all(morceaux[i]['structure'] == morceaux[g[0]]['structure'] for g in groupes for i in g[1:]) \
+            and len({signature_morceau(morceaux[g[0]]['structure']) for g in groupes}) == len(groupes):
+        return [[morceaux[i] for i in g] for g in groupes]
+    par_signature = collections.defaultdict(list)
+    for morceau in morceaux:
+        par_signature[signature_morceau(morceau['structure'])].append(morceau)
+    return list(par_signature.values())
+
+def construire_affichage(plan: Dict[str, Any]) -> Affichage:
+    """Liste d'affichage du plan : page d'ensemble, une page par morceau distinct, platine éventuelle.
+
+    Les morceaux de structure identique partagent une page (`repetition`).
+    """
+    pages = [page_ensemble(plan)]
+    for morceaux_group in groupes_du_plan(plan):
+        pages.append(page_morceau(morceaux_group[0], plan, len(morceaux_group)))
+    if plan.get('platine_details'):
+        pages.append(page_platine(plan['platine_details'], plan['poteau_dims']))
+    return Affichage(pages)
+
+
+# --- CACHE ---
+# La mise en page ne dépend que du plan : une liste d'affichage est partagée par tous les
+# rendus (PDF, SVG, DXF) du même plan, dans le processus courant.
+TAILLE_CACHE_AFFICHAGE = 64
+_cache: "collections.OrderedDict[str, Affichage]" = collections.OrderedDict()
+_verrou = threading.Lock()
+
+def affichage_plan(plan: Dict[str, Any], cle: Optional[str] = None) -> Affichage:
+    """Liste d'affichage du plan, recalculée seulement si le plan a changé."""
+    cle = cle or cle_plan(plan)
+    with _verrou:
+        affichage = _cache.get(cle)
+        if affichage is not None:
+            _cache.move_to_end(cle)
+            return affichage
+    affichage = construire_affichage(plan)
+    with _verrou:
+        _cache[cle] = affichage
+        while len(_cache) > TAILLE_CACHE_AFFICHAGE:
+            _cache.popitem(last=False)
+    return affichage
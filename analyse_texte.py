@@ -0,0 +1,269 @@
+# analyse_texte.py
+
+import asyncio
+import collections
+import functools
+import json
+import os
+import re
+import time
+from typing import Any, Callable, Dict, Optional
+
+import mesures
+
+
+class AnalyseSatureeError(Exception):
+    """Levée quand trop d'appels au modèle sont déjà en cours."""
+
+
+class AnalyseDelaiDepasseError(Exception):
+    """Levée quand le modèle ne répond pas dans le délai imparti."""
+
+
+class AnalyseNonConfigureeError(Exception):
+    """Levée quand la configuration du client Gemini échoue (clé refusée, module incomplet...)."""
+
+
+def normaliser_description(description: str) -> str:
+    """Clé de cache : casse et espaces n'influencent pas l'analyse."""
+    return " ".join(description.split()).casefold()
+
+
+def extraire_json(response_text: str) -> Dict[str, Any]:
+    response_text = response_text.strip()
+    json_match = re.search(r'```json\n({.*?})\n```', response_text, re.DOTALL)
+    json_str = json_match.group(1) if json_match else response_text
+    return json.loads(json_str)
+
+
+class AnalyseurTexte:
+    """Appelle le modèle Gemini pour transformer une description en données de formulaire.
+
+    - le modèle est instancié une seule fois, au premier appel ;
+    - les résultats sont gardés `ttl` secondes (LRU de `taille_max` entrées) par description normalisée ;
+    - des demandes identiques simultanées partagent un seul appel au modèle, qui survit à
+      l'annulation de l'une d'elles (client déconnecté) ;
+    - au plus `concurrence_max` appels en cours, chacun limité à `timeout_s` secondes.
+
+    `client` est le module `google.generativeai` (ou tout objet offrant `GenerativeModel`).
+    `valider` transforme le JSON du modèle en résultat ; une erreur de validation n'est pas mise en cache.
+    """
+
+    def __init__(self, client: Any, prompt: str, valider: Callable[[Dict[str, Any]], Dict[str, Any]] = lambda d: d,
+                 nom_modele: str = "gemini-1.5-flash", ttl: float = 3600, taille_max: int = 256,
+                 timeout_s: float = 20, concurrence_max: int = 4):
+        self.client = client
+        self.prompt = prompt
+        self.valider = valider
+        self.nom_modele = nom_modele
+        self.ttl = ttl
+        self.taille_max = taille_max
+        self.timeout_s = timeout_s
+        self.concurrence_max = concurrence_max
+        self.appels_modele = 0
+        self._modele = None
+        self._cache: "collections.OrderedDict[str, tuple]" = collections.OrderedDict()
+        self._en_vol: Dict[str, asyncio.Task] = {}
+        self._en_cours = 0
+
+    @property
+    def modele(self):
+        if self._modele is None:
+            self._modele = self.client.GenerativeModel(self.nom_modele)
+        return self._modele
+
+    def _lire_cache(self, cle: str) -> Optional[Dict[str, Any]]:
+        entree = self._cache.get(cle)
+        if entree is None:
+            return None
+        echeance, resultat = entree
+        if echeance <= time.monotonic():
+            del self._cache[cle]
+            return None
+        self._cache.move_to_end(cle)
+        return resultat
+
+    def _ecrire_cache(self, cle: str, resultat: Dict[str, Any]):
+        self._cache[cle] = (time.monotonic() + self.ttl, resultat)
+        self._cache.move_to_end(cle)
+        while len(self._cache) > self.taille_max:
+            self._cache.popitem(last=False)
+
+    async def analyser(self, description: str) -> Dict[str, Any]:
+        cle = normaliser_description(description)
+        resultat = self._lire_cache(cle)
+        if resultat is not None:
+            return resultat
+        # L'appel au modèle est une tâche partagée, attendue à l'abri (shield) par chaque demande :
+        # annuler une demande, même la première, ne l'interrompt pas pour les autres.
+        tache = self._en_vol.get(cle)
+        if tache is None:
+            tache = asyncio.ensure_future(self._appeler_et_memoriser(cle, description))
+            self._en_vol[cle] = tache
+            tache.add_done_callback(functools.partial(self._atterrir, cle))
+        return await asyncio.shield(tache)
+
+    async def _appeler_et_memoriser(self, cle: str, description: str) -> Dict[str, Any]:
+        resultat = await self._appeler_modele(description)
+        self._ecrire_cache(cle, resultat)
+        return resultat
+
+    def _atterrir(self, cle: str, tache: asyncio.Task):
+        if self._en_vol.get(cle) is tache:
+            del self._en_vol[cle]
+        # Évite l'avertissement « exception never retrieved » quand plus personne n'attendait.
+        if not tache.cancelled():
+            tache.exception()
+
+    async def _appeler_modele(self, description: str) -> Dict[str, Any]:
+        if self._en_cours >= self.concurrence_max:
+            mesures.ERREURS_GEMINI.incrementer(cause="saturation")
+            raise AnalyseSatureeError(f"{self._en_cours} analyses en cours (limite {self.concurrence_max}).")
+        self._en_cours += 1
+        try:
+            self.appels_modele += 1
+            prompt = self.prompt.format(user_text=description)
+            debut = time.perf_counter()
+            try:
+                with mesures.etape("gemini"):
+                    response = await asyncio.wait_for(self.modele.generate_content_async(prompt), timeout=self.timeout_s)
+            except asyncio.TimeoutError:
+                mesures.ERREURS_GEMINI.incrementer(cause="delai")
+                raise AnalyseDelaiDepasseError(f"Pas de réponse du modèle après {self.timeout_s} s.")
+            except Exception:
+                mesures.ERREURS_GEMINI.incrementer(cause="appel")
+                raise
+            mesures.GEMINI.observer(time.perf_counter() - debut)
+            try:
+                return self.valider(extraire_json(response.text))
+            except Exception:
+                mesures.ERREURS_GEMINI.incrementer(cause="reponse")
+                raise
+        finally:
+            self._en_cours -= 1
+
+
+def analyseur_depuis_env(client: Any, prompt: str, valider: Callable[[Dict[str, Any]], Dict[str, Any]]) -> AnalyseurTexte:
+    """Construit l'analyseur à partir des variables d'environnement GEMINI_*."""
+    return AnalyseurTexte(
+        client, prompt, valider,
+        nom_modele=os.getenv("GEMINI_MODELE", "gemini-1.5-flash"),
+        ttl=float(os.getenv("GEMINI_CACHE_TTL_S", "3600")),
+        taille_max=int(os.getenv("GEMINI_CACHE_TAILLE", "256")),
+        timeout_s=float(os.getenv("GEMINI_TIMEOUT_S", "20")),
+        concurrence_max=int(os.getenv("GEMINI_CONCURRENCE_MAX", "4")),
+    )
+
+
+# --- ANALYSE LOCALE PAR RÈGLES ---
+
+_NOMBRES_EN_LETTRES = {"un": 1, "une": 1, "deux": 2, "trois": 3, "quatre": 4, "cinq": 5, "six": 6, "sept": 7, "huit": 8, "neuf": 9, "dix": 10}
+_NOMBRE = r"\d+(?:[.,]\d+)?"
+_DIMS = rf"({_NOMBRE}(?:\s*x\s*{_NOMBRE})*)"
+_LIAISON = r"\s*(?:de|en|:)?\s*"
+_LONGUEUR = rf"{_NOMBRE}\s*(?:mm|m\b)?"
+
+# (champ de ParsedFormData, motif) : l'ordre compte, les motifs les plus précis d'abord.
+_REGLES_PROFILS = [
+    (("lissehaute_dims",), rf"\blisses?\s+hautes?{_LIAISON}{_DIMS}"),
+    (("lissebasse_dims",), rf"\blisses?\s+basses?{_LIAISON}{_DIMS}"),
+    (("lissehaute_dims", "lissebasse_dims"), rf"\blisses?{_LIAISON}{_DIMS}"),
+    (("poteau_dims",), rf"\bpoteaux?{_LIAISON}{_DIMS}"),
+    (("liaison_dims",), rf"\bliaisons?{_LIAISON}{_DIMS}"),
+    (("barreau_dims",), rf"\bbarreaux?{_LIAISON}{_DIMS}"),
+]
+_REGLES_VALEURS = [
+    ("hauteur_lisse_basse", r"\bhauteur\s+(?:de\s+)?(?:la\s+)?lisse\s+basse\s*(?:de|:|à|a)?\s*(\d+)\s*(?:mm)?"),
+    ("hauteur_totale", r"\bhauteur(?:\s+totale)?\s*(?:de|:)?\s*(\d+)\s*(?:mm)?"),
+    ("ecart_barreaux", r"(?:\btous\s+les|\btout\s+les|\bespac[ée]s?\s+de|\b[ée]cart(?:ement)?(?:\s+max(?:imal|imum)?)?\s*(?:de|:)?)\s*(\d+)\s*(?:mm)?"),
+]
+# Mots de structure qu'aucune règle ne sait représenter (fixation au mur, liaisons, plusieurs sections,
+# absence de poteau...) : s'il en reste hors des passages reconnus, la description part au modèle.
+_NOMBRES_STRUCTURE = "|".join(n for n in _NOMBRES_EN_LETTRES if n not in ("un", "une"))
+_MOTS_STRUCTURE = re.compile(
+    rf"\b(?:liaisons?|poteaux?|murs?|sections?|milieu|fix[ée]e?s?|scell[ée]e?s?|angles?|premi[eè]re?|second[e]?|\w+i[eè]me|{_NOMBRES_STRUCTURE})\b"
+)
+_REGLE_MORCEAUX = re.compile(
+    rf"\b(\d+|{'|'.join(_NOMBRES_EN_LETTRES)})\s+morceaux?(\s+identiques)?\s*(?:de|:)?\s*"
+    rf"({_LONGUEUR}(?:\s*(?:,|et)\s*{_LONGUEUR})*)"
+)
+
+
+def _en_mm(valeurs: list, unite_finale: str) -> list:
+    longueurs = []
+    for nombre, unite in valeurs:
+        valeur = float(nombre.replace(",", "."))
+        if (unite or unite_finale) == "m":
+            valeur *= 1000
+        longueurs.append(round(valeur))
+    return longueurs
+
+
+def analyser_par_regles(description: str) -> Optional[Dict[str, Any]]:
+    """Extraction locale des descriptions courantes, sans appel au modèle.
+
+    Ne répond que si elle est sûre d'elle : le nombre de morceaux et leurs longueurs doivent
+    être trouvés, chaque nombre du texte doit avoir été reconnu par une règle, et il ne doit
+    rester aucun mot de structure (liaison, mur, sections, « sans poteau », nombre en lettres...).
+    Sinon retourne None et la description part au modèle. Chaque morceau est décrit comme une
+    section unique entre deux poteaux.
+    """
+    texte = " ".join(description.replace("×", "x").split()).casefold()
+    resultat: Dict[str, Any] = {}
+
+    def consommer(match) -> str:
+        return " " * len(match.group(0))
+
+    morceaux = _REGLE_MORCEAUX.search(texte)
+    if not morceaux:
+        return None
+    nombre = morceaux.group(1)
+    nombre_morceaux = int(nombre) if nombre.isdigit() else _NOMBRES_EN_LETTRES[nombre]
+    identiques = bool(morceaux.group(2))
+    valeurs = re.findall(rf"({_NOMBRE})\s*(mm|m\b)?", morceaux.group(3))
+    longueurs = _en_mm(valeurs, valeurs[-1][1])
+    if identiques and len(longueurs) == 1:
+        longueurs = longueurs * nombre_morceaux
+    if nombre_morceaux <= 0 or len(longueurs) != nombre_morceaux:
+        return None
+    texte = texte[:morceaux.start()] + consommer(morceaux) + texte[morceaux.end():]
+    resultat["nombre_morceaux"] = nombre_morceaux
+    resultat["morceaux_identiques"] = "oui" if identiques or len(set(longueurs)) == 1 and nombre_morceaux > 1 else "non"
+    resultat["morceaux"] = [
+        {"nombre_sections": 1, "structure": [{"type": "poteau"}, {"type": "section", "longueur": longueur}, {"type": "poteau"}]}
+        for longueur in longueurs
+    ]
+
+    for champs, motif in _REGLES_PROFILS:
+        match = re.search(motif, texte)
+        if match:
+            for champ in champs:
+                resultat.setdefault(champ, re.sub(r"\s+", "", match.group(1)).replace(",", "."))
+            texte = texte[:match.start()] + consommer(match) + texte[match.end():]
+    for champ, motif in _REGLES_VALEURS:
+        match = re.search(motif, texte)
+        if match:
+            resultat[champ] = int(match.group(1))
+            texte = texte[:match.start()] + consommer(match) + texte[match.end():]
+
+    if re.search(r"\d", texte) or _MOTS_STRUCTURE.search(texte):
+        return None
+    return resultat
+
+
+class StatistiquesAnalyse:
+    """Compte les analyses servies par les règles locales et par le modèle."""
+
+    def __init__(self):
+        self.regles = 0
+        self.modele = 0
+
+    def compter(self, source: str):
+        setattr(self, source, getattr(self, source) + 1)
+
+    def taux_regles(self) -> float:
+        total = self.regles + self.modele
+        return self.regles / total if total else 0.0
+
+    def en_dict(self) -> Dict[str, Any]:
+        return {"regles": self.regles, "modele": self.modele, "taux_regles": round(self.taux_regles(), 4)}
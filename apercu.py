@@ -0,0 +1,98 @@
+# apercu.py
+
+import gzip
+from typing import Any, Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from affichage import COULEURS, Affichage, Cercle, Cote, Rangee, Rect
+
+# Au-delà de ce nombre de barreaux dans une vue, chaque rangée est résumée (premier et
+# dernier barreaux, zone teintée entre les deux) : la taille de l'aperçu suit le nombre de sections.
+APERCU_MAX_BARREAUX = 150
+
+# Largeur en pixels d'une vue dans l'aperçu SVG ; les hauteurs suivent les proportions.
+LARGEUR_SVG = 1000
+# Compression des réponses au-delà de cette taille (octets).
+TAILLE_MIN_GZIP = 1000
+
+
+def _r(valeur: float) -> float:
+    """Coordonnées arrondies au dixième de millimètre : plus que suffisant pour l'écran."""
+    return round(valeur, 1)
+
+
+def _hex(rgb: Tuple[int, int, int]) -> str:
+    return "#%02x%02x%02x" % rgb
+
+
+def _teinte(rgb: Tuple[int, int, int]) -> str:
+    return _hex(tuple(c + (255 - c) * 2 // 3 for c in rgb))
+
+
+def _svg_rect(calque: str, x: float, y: float, w: float, h: float) -> str:
+    # SVG a l'axe y vers le bas : le coin supérieur gauche (x, y) devient (x, -y).
+    return f'<rect class="{calque}" x="{_r(x)}" y="{_r(-y)}" width="{_r(w)}" height="{_r(h)}"/>'
+
+
+def _svg_rangee(e: Rangee, resumer: bool) -> List[str]:
+    if not resumer or e.nombre <= 2:
+        return [_svg_rect(r.calque, r.x, r.y, r.w, r.h) for r in e.rects()]
+    x_dernier = e.x + (e.nombre - 1) * e.dx
+    return [_svg_rect(e.calque, e.x, e.y, e.w, e.h), _svg_rect("barreaux_groupes", e.x + e.w, e.y, x_dernier - e.x - e.w, e.h), _svg_rect(e.calque, x_dernier, e.y, e.w, e.h)]
+
+
+def _svg_cote(e: Cote, u: float) -> str:
+    # `decalage` est en millimètres papier : on le convertit avec l'unité `u` de la vue.
+    t, d = 1.5 * u, e.decalage * u
+    if e.sens == "h":
+        y = -e.y + d
+        x1, x2 = _r(e.x), _r(e.x + e.longueur)
+        return (f'<path class="cote" d="M{x1} {_r(y)}H{x2}M{x1} {_r(y - t)}v{_r(2 * t)}M{x2} {_r(y - t)}v{_r(2 * t)}"/>'
+                f'<text class="cote" x="{_r((x1 + x2) / 2)}" y="{_r(y - t)}">{escape(e.texte)}</text>')
+    x = e.x + d if e.a_droite else e.x - d
+    y1, y2 = _r(-e.y), _r(-e.y - e.longueur)
+    return (f'<path class="cote" d="M{_r(x)} {y1}V{y2}M{_r(x - t)} {y1}h{_r(2 * t)}M{_r(x - t)} {y2}h{_r(2 * t)}"/>'
+            f'<text class="cote" transform="translate({_r(x - t)} {_r((y1 + y2) / 2)}) rotate(-90)">{escape(e.texte)}</text>')
+
+
+def apercu_svg(affichage: Affichage) -> str:
+    """Aperçu SVG du plan, vues empilées, tiré de la liste d'affichage : une seule chaîne, sans dépendance de rendu."""
+    parties, y_vue = [], 0.0
+    for page in affichage.pages:
+        for vue in page.vues:
+            x_min, y_min, x_max, y_max = vue.bornes()
+            marge = max(x_max - x_min, y_max - y_min, 1) * 0.06
+            u = marge / 25
+            vb_x, vb_y = x_min - marge, -y_max - marge
+            vb_w, vb_h = x_max - x_min + 2 * marge, y_max - y_min + 2 * marge
+            h_px = _r(LARGEUR_SVG * vb_h / vb_w)
+            resumer = sum(e.nombre for e in vue.elements if isinstance(e, Rangee)) > APERCU_MAX_BARREAUX
+            corps = []
+            for e in vue.elements:
+                if isinstance(e, Rangee):
+                    corps += _svg_rangee(e, resumer)
+                elif isinstance(e, Rect):
+                    corps.append(_svg_rect(e.calque, e.x, e.y, e.w, e.h))
+                elif isinstance(e, Cercle):
+                    corps.append(f'<circle class="{e.calque}" cx="{_r(e.x)}" cy="{_r(-e.y)}" r="{_r(e.r)}"/>')
+                else:
+                    corps.append(_svg_cote(e, u))
+            titre = vue.titre + (f" - répété {page.repetition} fois" if page.repetition > 1 else "")
+            parties.append(
+                f'<svg id="{vue.id}" y="{_r(y_vue)}" width="{LARGEUR_SVG}" height="{h_px}" viewBox="{_r(vb_x)} {_r(vb_y)} {_r(vb_w)} {_r(vb_h)}" style="font-size:{_r(5 * u)}px">'
+                f'<title>{escape(titre)}</title>{"".join(corps)}</svg>'
+            )
+            y_vue += h_px
+    style = "".join(f".{calque}{{stroke:{_hex(rgb)};fill:none}}" for calque, rgb in COULEURS.items() if calque != "cote")
+    style += f".barreaux_groupes{{fill:{_teinte(COULEURS['barreau'])};stroke:none}}"
+    style += f".cote{{stroke:{_hex(COULEURS['cote'])};fill:none}}text.cote{{fill:{_hex(COULEURS['cote'])};stroke:none;text-anchor:middle}}"
+    style += "rect,path,circle{vector-effect:non-scaling-stroke;stroke-width:1}"
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{LARGEUR_SVG}" height="{_r(y_vue)}" viewBox="0 0 {LARGEUR_SVG} {_r(y_vue)}">'
+            f'<style>{style}</style>{"".join(parties)}</svg>')
+
+
+def compresser_si_accepte(contenu: bytes, accept_encoding: Optional[str]) -> Optional[bytes]:
+    """Version gzip de `contenu` si le client l'accepte et que le gain en vaut la peine, sinon None."""
+    if len(contenu) < TAILLE_MIN_GZIP or "gzip" not in (accept_encoding or "").lower():
+        return None
+    return gzip.compress(contenu, compresslevel=5)
@@ -0,0 +1,123 @@
+# bench_moteur.py
+
+import argparse
+import gc
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+from main import FinalPlanData, MorceauPlan, NomenclatureItem, ProjectData, RepartitionResult, SectionPlan, calculate_repartition, parse_platine_data
+from moteur import analyser_sections, calculer_longueurs_libres, calculer_plan, compter_jonctions, grouper_longueurs, repartition_batch
+from profils import get_deduction_dimension, get_thickness_dimension
+
+
+def projet_synthetique(nombre_sections: int, sections_par_morceau: int = 10, remplissage_type: str = "barreaudage_vertical", variantes: int = 40) -> ProjectData:
+    """Projet de `nombre_sections` sections, découpé en morceaux de `sections_par_morceau` sections.
+
+    Les longueurs de section bouclent sur `variantes` valeurs : au plus `variantes` morceaux distincts.
+    """
+    morceaux = []
+    restant = nombre_sections
+    while restant > 0:
+        n = min(sections_par_morceau, restant)
+        structure = [{"type": "poteau"}]
+        for j in range(n):
+            structure += [{"type": "section", "longueur": 900 + 37 * ((len(morceaux) + j) % variantes)}, {"type": "poteau" if j == n - 1 else "liaison"}]
+        morceaux.append({"nombre_sections": n, "structure": structure})
+        restant -= n
+    return ProjectData(
+        hauteur_totale=1020, hauteur_lisse_basse=100, poteau_dims="40x40", liaison_dims="40x20",
+        lissehaute_dims="40x40", lissebasse_dims="40x40", barreau_dims="20x20", ecart_barreaux=110,
+        type_fixation="platine", remplissage_type=remplissage_type,
+        platine_dimensions="150x150x10", platine_trous="4x14", platine_entraxes="110x110",
+        nombre_morceaux=len(morceaux), morceaux_identiques="non", morceaux=morceaux,
+    )
+
+
+def via_pydantic(data: ProjectData) -> Dict[str, Any]:
+    """Chemin précédent de /api/process-data, étape par étape.
+
+    Chaque section, morceau et ligne de nomenclature est un modèle pydantic validé à la construction,
+    sans regroupement des morceaux identiques ni des longueurs libres, puis le plan passe par `model_dump()`.
+    """
+    dims_map = {"poteau": get_deduction_dimension(data.poteau_dims), "liaison": get_deduction_dimension(data.liaison_dims), "rien": 0}
+    sections = analyser_sections(data.morceaux)
+    longueurs_libres = calculer_longueurs_libres(sections, dims_map)
+    if data.remplissage_type == 'barreaudage_vertical' and sections:
+        nombres, vides, jeux = (a.tolist() for a in repartition_batch(longueurs_libres, get_deduction_dimension(data.barreau_dims), data.ecart_barreaux))
+    else:
+        nombres, vides, jeux = [0] * len(sections), [0] * len(sections), [0] * len(sections)
+    sections_par_morceau = [[] for _ in data.morceaux]
+    for k, section in enumerate(sections):
+        sections_par_morceau[section[0]].append(SectionPlan(longueur_section=section[1], longueur_libre=longueurs_libres[k], nombre_barreaux=nombres[k], vide_entre_barreaux_mm=vides[k], jeu_depart_mm=jeux[k]))
+    final_morceaux = [MorceauPlan(id=i, longueur_totale=sum(s.longueur for s in m.structure if s.type == 'section' and s.longueur is not None), structure=m.structure, sections_details=sections_par_morceau[i])
+                      for i, m in enumerate(data.morceaux)]
+
+    total_poteaux, total_liaisons = compter_jonctions(data.morceaux)
+    total_lisses, total_barreaux = sum(longueurs_libres), sum(nombres)
+    nomenclature = []
+    if total_poteaux > 0: nomenclature.append(NomenclatureItem(item="Poteaux", details=data.poteau_dims, quantite=total_poteaux, longueur_unitaire_mm=data.hauteur_totale))
+    if total_liaisons > 0: nomenclature.append(NomenclatureItem(item="Liaisons", details=data.liaison_dims, quantite=total_liaisons, longueur_unitaire_mm=data.hauteur_totale))
+    if total_lisses > 0:
+        nomenclature.append(NomenclatureItem(item="Lisse Haute", details=data.lissehaute_dims, quantite=1, longueur_unitaire_mm=round(total_lisses)))
+        nomenclature.append(NomenclatureItem(item="Lisse Basse", details=data.lissebasse_dims, quantite=1, longueur_unitaire_mm=round(total_lisses)))
+    remplissage_details: Optional[RepartitionResult] = None
+    hauteur_disponible = data.hauteur_totale - data.hauteur_lisse_basse - get_thickness_dimension(data.lissehaute_dims) - get_thickness_dimension(data.lissebasse_dims)
+    if data.remplissage_type == 'barreaudage_vertical' and total_barreaux > 0:
+        nomenclature.append(NomenclatureItem(item="Barreaux", details=data.barreau_dims, quantite=total_barreaux, longueur_unitaire_mm=round(hauteur_disponible)))
+    elif data.remplissage_type == 'barreaudage_horizontal':
+        remplissage_details = calculate_repartition(hauteur_disponible, get_thickness_dimension(data.barreau_dims), data.ecart_barreaux)
+        if remplissage_details.nombre_barreaux > 0:
+            for longueur, nb_sections in grouper_longueurs(longueurs_libres).items():
+                nomenclature.append(NomenclatureItem(item=f"Barreaux L={longueur}mm", details=data.barreau_dims, quantite=remplissage_details.nombre_barreaux * nb_sections, longueur_unitaire_mm=longueur))
+
+    platine_details = None
+    if data.type_fixation == 'platine' and data.platine_dimensions and data.platine_trous and data.platine_entraxes:
+        platine_details = parse_platine_data(f"{data.platine_dimensions} / Trous:{data.platine_trous} / Entraxes:{data.platine_entraxes}")
+    return FinalPlanData(description_projet=f"Garde-corps détaillé en {data.nombre_morceaux} morceau(x).", nomenclature=nomenclature, morceaux=final_morceaux, hauteur_totale=data.hauteur_totale, hauteur_lisse_basse=data.hauteur_lisse_basse, poteau_dims=data.poteau_dims, liaison_dims=data.liaison_dims, lissehaute_dims=data.lissehaute_dims, lissebasse_dims=data.lissebasse_dims, barreau_dims=data.barreau_dims, platine_details=platine_details, remplissage_type=data.remplissage_type, remplissage_details=remplissage_details).model_dump()
+
+
+def via_moteur(data: ProjectData) -> Dict[str, Any]:
+    return calculer_plan(data).en_dict()
+
+
+def mesurer(fn: Callable[[ProjectData], Any], data: ProjectData, repetitions: int) -> Dict[str, float]:
+    fn(data)
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fn(data)
+        durees.append(time.perf_counter() - debut)
+    gc.collect()
+    tracemalloc.start()
+    fn(data)
+    _, pic = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"temps_ms": min(durees) * 1000, "pic_ko": pic / 1024}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare le moteur interne au chemin pydantic, par tranche de 1 000 sections.")
+    parser.add_argument("--sections", type=int, default=5000)
+    parser.add_argument("--repetitions", type=int, default=10)
+    parser.add_argument("--remplissage", default="barreaudage_vertical")
+    parser.add_argument("--variantes", type=int, default=40, help="longueurs de section distinctes (morceaux tous différents si > sections / 10 + 10)")
+    args = parser.parse_args(argv)
+    data = projet_synthetique(args.sections, remplissage_type=args.remplissage, variantes=args.variantes)
+    # `groupes_morceaux` n'existait pas dans l'ancien plan : tout le reste doit être identique.
+    if {**via_pydantic(data), "groupes_morceaux": None} != {**via_moteur(data), "groupes_morceaux": None}:
+        print("Les deux chemins ne produisent pas le même plan.")
+        return 1
+    facteur = 1000 / args.sections
+    resultats = {nom: mesurer(fn, data, args.repetitions) for nom, fn in (("pydantic", via_pydantic), ("moteur", via_moteur))}
+    print(f"{args.sections} sections, valeurs ramenées à 1 000 sections :")
+    for nom, r in resultats.items():
+        print(f"  {nom:10s} {r['temps_ms'] * facteur:8.2f} ms  {r['pic_ko'] * facteur:8.0f} Ko (pic)")
+    gain = resultats["pydantic"]["temps_ms"] / resultats["moteur"]["temps_ms"]
+    print(f"  moteur {gain:.1f}x plus rapide, pic mémoire {resultats['moteur']['pic_ko'] / resultats['pydantic']['pic_ko']:.0%} du chemin pydantic")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+# bench_pages.py
+
+import argparse
+import os
+import re
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import affichage
+import dessin_pdf
+from bench_plans import SCENARIOS, chronometrer, generer_projet
+from main import ProjectData
+from moteur import calculer_plan
+
+
+def sans_identifiant(pdf: bytes) -> bytes:
+    """PDF sans sa date de création ni l'identifiant /ID qui en dépend."""
+    return re.sub(rb"/CreationDate \(D:\d+Z\)|/ID \[<[0-9A-F]+><[0-9A-F]+>\]", b"", pdf)
+
+
+def mesurer(plan: Dict[str, Any], workers: int, repetitions: int) -> Dict[str, float]:
+    """Rendu complet du plan avec `workers` processus de pages (0 : séquentiel), cache d'affichage vidé à chaque fois."""
+    def rendu():
+        affichage._cache.clear()
+        return dessin_pdf.creer_plan_pdf(plan, workers=workers)
+    return chronometrer(rendu, repetitions)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare le rendu PDF séquentiel au rendu des pages en parallèle (PDF_PAGES_WORKERS).")
+    parser.add_argument("--scenarios", default="moyen_vertical,grand_vertical,grand_horizontal")
+    parser.add_argument("--workers", default="2,4", help="nombres de processus à essayer, séparés par des virgules")
+    parser.add_argument("--repetitions", type=int, default=5)
+    args = parser.parse_args(argv)
+    essais = [int(w) for w in args.workers.split(",") if w.strip()]
+
+    # Le pool est lancé une fois, hors mesure, comme au démarrage de l'API (lifespan).
+    debut = time.perf_counter()
+    pool = dessin_pdf.pool_pages(max(essais))
+    list(pool.map(abs, range(max(essais))))
+    print(f"{os.cpu_count()} cœur(s) ; lancement du pool de {max(essais)} processus : {(time.perf_counter() - debut) * 1000:.0f} ms (non compté)")
+    try:
+        for nom in (n.strip() for n in args.scenarios.split(",") if n.strip()):
+            plan = calculer_plan(ProjectData(**generer_projet(*SCENARIOS[nom]))).en_dict()
+            sequentiel = dessin_pdf.creer_plan_pdf(plan, workers=0)
+            nombre_pages = len(affichage.affichage_plan(plan).pages)
+            print(f"{nom} ({nombre_pages} pages, {len(sequentiel) // 1024} Ko)")
+            reference = mesurer(plan, 0, args.repetitions)
+            print(f"  séquentiel      {reference['min_ms']:9.1f} ms (médiane {reference['mediane_ms']:.1f})")
+            for workers in essais:
+                if sans_identifiant(dessin_pdf.creer_plan_pdf(plan, workers=workers)) != sans_identifiant(sequentiel):
+                    print(f"  {workers} processus : le PDF diffère du rendu séquentiel.")
+                    return 1
+                mesure = mesurer(plan, workers, args.repetitions)
+                print(f"  {workers} processus    {mesure['min_ms']:9.1f} ms (médiane {mesure['mediane_ms']:.1f})  x{reference['min_ms'] / mesure['min_ms']:.2f}")
+    finally:
+        dessin_pdf.fermer_pool_pages()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
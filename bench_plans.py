@@ -0,0 +1,218 @@
+# bench_plans.py
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import affichage
+import dessin_pdf
+from main import ProjectData
+from moteur import calculer_plan
+
+# --- GÉNÉRATEUR DE PROJETS ---
+PROFILS_POTEAU = ["40x40", "40x40x3", "50x50", "60x40", "Ø42.4"]
+PROFILS_LIAISON = ["40x20", "Plat 50x8", "30x30"]
+PROFILS_LISSE = ["40x40", "40x20x2", "Ø42.4x2", "50x30"]
+PROFILS_BARREAU = ["20x20", "14x14", "Ø16", "25x10"]
+
+
+def generer_projet(graine: int, nombre_morceaux: int, remplissage_type: Optional[str] = None, platine: Optional[bool] = None) -> Dict[str, Any]:
+    """Projet réaliste et reproductible (même graine, même projet), au format JSON de /api/process-data.
+
+    Chaque morceau compte 1 à 8 sections de 600 à 2 500 mm, bornées par des poteaux ou des liaisons ;
+    un tiers des morceaux reprend un morceau déjà tiré, comme les balcons répétés d'un même immeuble.
+    Le remplissage et la platine sont tirés s'ils ne sont pas imposés.
+    """
+    alea = random.Random(graine)
+    morceaux = []
+    for _ in range(nombre_morceaux):
+        if morceaux and alea.random() < 1 / 3:
+            morceaux.append(alea.choice(morceaux))
+            continue
+        nombre_sections = alea.randint(1, 8)
+        structure = []
+        for j in range(nombre_sections + 1):
+            if j in (0, nombre_sections):
+                jonction = alea.choices(["poteau", "liaison"], weights=[9, 1])[0]
+            else:
+                jonction = alea.choices(["poteau", "liaison"], weights=[2, 1])[0]
+            structure.append({"type": jonction})
+            if j < nombre_sections:
+                structure.append({"type": "section", "longueur": alea.randrange(600, 2505, 5)})
+        morceaux.append({"nombre_sections": nombre_sections, "structure": structure})
+    if remplissage_type is None:
+        remplissage_type = alea.choice(["barreaudage_vertical", "barreaudage_horizontal"])
+    if platine is None:
+        platine = alea.random() < 0.7
+    return {
+        "hauteur_totale": alea.choice([1000, 1020, 1100]), "hauteur_lisse_basse": alea.choice([50, 80, 100]),
+        "poteau_dims": alea.choice(PROFILS_POTEAU), "liaison_dims": alea.choice(PROFILS_LIAISON),
+        "lissehaute_dims": alea.choice(PROFILS_LISSE), "lissebasse_dims": alea.choice(PROFILS_LISSE),
+        "barreau_dims": alea.choice(PROFILS_BARREAU), "ecart_barreaux": alea.choice([100, 110, 120]),
+        "type_fixation": "platine" if platine else "scellement", "remplissage_type": remplissage_type,
+        "platine_dimensions": "150x150x10" if platine else None,
+        "platine_trous": "4x14" if platine else None,
+        "platine_entraxes": "110x110" if platine else None,
+        "nombre_morceaux": nombre_morceaux, "morceaux_identiques": "non", "morceaux": morceaux,
+    }
+
+
+# Scénarios de la suite : nom -> (graine, nombre de morceaux, remplissage, platine).
+SCENARIOS = {
+    "petit_vertical": (1, 1, "barreaudage_vertical", True),
+    "moyen_vertical": (2, 20, "barreaudage_vertical", True),
+    "moyen_horizontal": (3, 20, "barreaudage_horizontal", False),
+    "grand_vertical": (4, 150, "barreaudage_vertical", True),
+    "grand_horizontal": (5, 150, "barreaudage_horizontal", True),
+    "tres_grand_mixte": (6, 500, None, None),
+}
+
+
+# --- MESURES ---
+
+def chronometrer(fn: Callable[[], Any], repetitions: int) -> Dict[str, float]:
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fn()
+        durees.append((time.perf_counter() - debut) * 1000)
+    return {"min_ms": min(durees), "mediane_ms": statistics.median(durees)}
+
+
+def etalonner(repetitions: int = 5) -> float:
+    """Meilleur temps (ms) d'une charge fixe en pur Python : mesure la vitesse de la machine au moment du scénario."""
+    def charge():
+        total = {}
+        for i in range(100_000):
+            total[i % 97] = total.get(i % 97, 0) + i * 0.5
+        return total
+    return chronometrer(charge, repetitions)["min_ms"]
+
+
+def mesurer_pages(plan: Dict[str, Any]) -> Dict[str, float]:
+    """Un rendu complet, chaque fonction de page chronométrée à part (cumul par fonction), puis `pdf.output`."""
+    durees: Dict[str, float] = {}
+    pdf = dessin_pdf.PlanPDF(orientation='L', unit='mm', format='A4')
+    for page in affichage.construire_affichage(plan).pages:
+        fonction = dessin_pdf.DESSIN_PAGES[page.type]
+        debut = time.perf_counter()
+        fonction(pdf, page, None)
+        durees[fonction.__name__] = durees.get(fonction.__name__, 0.0) + (time.perf_counter() - debut) * 1000
+    debut = time.perf_counter()
+    pdf.output()
+    durees["pdf.output"] = (time.perf_counter() - debut) * 1000
+    return durees
+
+
+def mesurer_scenario(projet: Dict[str, Any], repetitions: int) -> Dict[str, Dict[str, float]]:
+    """Temps de chaque étape, du JSON reçu au PDF ; le cache des listes d'affichage est vidé avant chaque rendu."""
+    plan = calculer_plan(ProjectData(**projet)).en_dict()
+
+    def pdf_complet():
+        affichage._cache.clear()
+        return dessin_pdf.creer_plan_pdf(plan)
+
+    pdf_complet()
+    resultats = {
+        "process_data": chronometrer(lambda: calculer_plan(ProjectData(**projet)).en_dict(), repetitions),
+        "construire_affichage": chronometrer(lambda: affichage.construire_affichage(plan), repetitions),
+        "creer_plan_pdf": chronometrer(pdf_complet, repetitions),
+    }
+    pages = [mesurer_pages(plan) for _ in range(repetitions)]
+    for etape in pages[0]:
+        valeurs = [p[etape] for p in pages]
+        resultats[etape] = {"min_ms": min(valeurs), "mediane_ms": statistics.median(valeurs)}
+    return resultats
+
+
+def commit_courant() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def executer(noms: List[str], repetitions: int) -> Dict[str, Any]:
+    scenarios = {}
+    for nom in noms:
+        graine, nombre_morceaux, remplissage, platine = SCENARIOS[nom]
+        projet = generer_projet(graine, nombre_morceaux, remplissage, platine)
+        scenarios[nom] = {
+            "etalon_ms": etalonner(),
+            "nombre_morceaux": nombre_morceaux,
+            "nombre_sections": sum(m["nombre_sections"] for m in projet["morceaux"]),
+            "etapes": mesurer_scenario(projet, repetitions),
+        }
+    return {"commit": commit_courant(), "python": platform.python_version(), "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "repetitions": repetitions, "scenarios": scenarios}
+
+
+# --- COMPARAISON ---
+
+def comparer(ancien: Dict[str, Any], nouveau: Dict[str, Any], seuil: float = 0.10, plancher_ms: float = 0.5) -> List[Dict[str, Any]]:
+    """Étapes dont le meilleur temps a augmenté de plus de `seuil` (relatif) et de plus de `plancher_ms` (absolu).
+
+    On compare les minimums plutôt que les médianes : ils sont bien moins sensibles à la charge de la machine.
+    Quand les deux scénarios ont un étalon, les temps de l'ancien sont ramenés à la vitesse de la machine du nouveau.
+    """
+    regressions = []
+    for nom, scenario in nouveau["scenarios"].items():
+        scenario_avant = ancien["scenarios"].get(nom, {})
+        etapes_avant = scenario_avant.get("etapes", {})
+        facteur = scenario["etalon_ms"] / scenario_avant["etalon_ms"] if scenario.get("etalon_ms") and scenario_avant.get("etalon_ms") else 1.0
+        for etape, mesure in scenario["etapes"].items():
+            if etape not in etapes_avant:
+                continue
+            avant, apres = etapes_avant[etape]["min_ms"] * facteur, mesure["min_ms"]
+            if apres > avant * (1 + seuil) and apres - avant > plancher_ms:
+                regressions.append({"scenario": nom, "etape": etape, "avant_ms": avant, "apres_ms": apres, "ecart": apres / avant - 1})
+    return regressions
+
+
+def afficher(resultats: Dict[str, Any]):
+    for nom, scenario in resultats["scenarios"].items():
+        print(f"{nom} ({scenario['nombre_morceaux']} morceaux, {scenario['nombre_sections']} sections)")
+        for etape, mesure in scenario["etapes"].items():
+            print(f"  {etape:24s} {mesure['mediane_ms']:9.2f} ms (min {mesure['min_ms']:.2f})")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Suite de performance : calcul, mise en page et dessin PDF sur des projets synthétiques.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="noms séparés par des virgules")
+    parser.add_argument("--repetitions", type=int, default=5)
+    parser.add_argument("--sortie", help="fichier JSON des résultats")
+    parser.add_argument("--comparer", nargs=2, metavar=("ANCIEN", "NOUVEAU"), help="compare deux fichiers de résultats ; code de sortie 1 en cas de régression")
+    parser.add_argument("--seuil", type=float, default=0.10, help="hausse relative tolérée (défaut 10 %%)")
+    args = parser.parse_args(argv)
+
+    if args.comparer:
+        with open(args.comparer[0], encoding="utf-8") as f:
+            ancien = json.load(f)
+        with open(args.comparer[1], encoding="utf-8") as f:
+            nouveau = json.load(f)
+        regressions = comparer(ancien, nouveau, args.seuil)
+        for r in regressions:
+            print(f"RÉGRESSION {r['scenario']} / {r['etape']} : {r['avant_ms']:.2f} -> {r['apres_ms']:.2f} ms (+{r['ecart']:.0%})")
+        print(f"{len(regressions)} régression(s) entre {ancien.get('commit')} et {nouveau.get('commit')}.")
+        return 1 if regressions else 0
+
+    noms = [n.strip() for n in args.scenarios.split(",") if n.strip()]
+    inconnus = [n for n in noms if n not in SCENARIOS]
+    if inconnus:
+        parser.error(f"scénario(s) inconnu(s) : {', '.join(inconnus)}")
+    resultats = executer(noms, args.repetitions)
+    afficher(resultats)
+    if args.sortie:
+        with open(args.sortie, "w", encoding="utf-8") as f:
+            json.dump(resultats, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+# cache_plans.py
+
+import collections
+import hashlib
+import json
+import os
+import secrets
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+# À incrémenter à chaque changement du rendu de dessin_pdf.py : les anciens PDF en cache deviennent invalides.
+VERSION_CACHE = "4"
+
+
+def cle_plan(data: Dict[str, Any]) -> str:
+    """Empreinte canonique d'un plan (FinalPlanData validé puis `model_dump()`)."""
+    canon = json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(f"{VERSION_CACHE}:{canon}".encode("utf-8")).hexdigest()
+
+
+def etag_correspond(if_none_match: Optional[str], etag: str) -> bool:
+    """Vrai si l'en-tête If-None-Match du client désigne `etag`."""
+    if not if_none_match:
+        return False
+    valeurs = [v.strip() for v in if_none_match.split(",")]
+    return "*" in valeurs or any(v.removeprefix("W/") == etag for v in valeurs)
+
+
+class CachePDF:
+    """Cache LRU des PDF rendus, borné en octets, avec un niveau disque optionnel.
+
+    Le niveau disque (un fichier `<cle>.pdf` par plan) est partagé entre les workers
+    uvicorn qui pointent vers le même dossier ; les écritures sont atomiques. Il est borné
+    à `taille_max_disque_octets` et `ttl_disque` secondes. La taille du dossier est suivie en
+    mémoire, écriture après écriture ; le dossier n'est parcouru qu'à la première écriture, quand
+    cette taille dépasse la limite, ou toutes les `intervalle_nettoyage` secondes (ce qui rattrape
+    les écritures des autres workers). Le parcours supprime les fichiers expirés, puis les plus
+    anciens (par date de modification, rafraîchie à chaque lecture) jusqu'à repasser sous la limite.
+    Les PDF d'une ancienne VERSION_CACHE, jamais relus, finissent ainsi par disparaître.
+    """
+
+    def __init__(self, taille_max_octets: int = 64 * 1024 * 1024, dossier: Optional[str] = None,
+                 taille_max_disque_octets: int = 1024 * 1024 * 1024, ttl_disque: float = 30 * 24 * 3600,
+                 intervalle_nettoyage: float = 300):
+        self.taille_max_octets = taille_max_octets
+        self.dossier = dossier
+        self.taille_max_disque_octets = taille_max_disque_octets
+        self.ttl_disque = ttl_disque
+        self.intervalle_nettoyage = intervalle_nettoyage
+        self.taille_octets = 0
+        # Taille du dossier estimée (None : pas encore parcouru) et date du prochain parcours.
+        self.taille_disque_octets: Optional[int] = None
+        self._prochain_nettoyage = 0.0
+        self._entrees: "collections.OrderedDict[str, bytes]" = collections.OrderedDict()
+        self._verrou = threading.Lock()
+        self._verrou_disque = threading.Lock()
+        if dossier:
+            os.makedirs(dossier, exist_ok=True)
+
+    def __len__(self) -> int:
+        return len(self._entrees)
+
+    def get(self, cle: str) -> Optional[bytes]:
+        with self._verrou:
+            contenu = self._entrees.get(cle)
+            if contenu is not None:
+                self._entrees.move_to_end(cle)
+                return contenu
+        contenu = self._lire_disque(cle)
+        if contenu is not None:
+            self._garder_en_memoire(cle, contenu)
+        return contenu
+
+    def put(self, cle: str, contenu: bytes):
+        self._garder_en_memoire(cle, contenu)
+        self._ecrire_disque(cle, contenu)
+
+    def _garder_en_memoire(self, cle: str, contenu: bytes):
+        if len(contenu) > self.taille_max_octets:
+            return
+        with self._verrou:
+            ancien = self._entrees.pop(cle, None)
+            if ancien is not None:
+                self.taille_octets -= len(ancien)
+            self._entrees[cle] = contenu
+            self.taille_octets += len(contenu)
+            while self.taille_octets > self.taille_max_octets:
+                _, evince = self._entrees.popitem(last=False)
+                self.taille_octets -= len(evince)
+
+    def _chemin(self, cle: str) -> str:
+        return os.path.join(self.dossier, f"{cle}.pdf")
+
+    def _lire_disque(self, cle: str) -> Optional[bytes]:
+        if not self.dossier:
+            return None
+        chemin = self._chemin(cle)
+        try:
+            if os.stat(chemin).st_mtime < time.time() - self.ttl_disque:
+                os.remove(chemin)
+                return None
+            with open(chemin, "rb") as f:
+                contenu = f.read()
+            os.utime(chemin)
+            return contenu
+        except OSError:
+            return None
+
+    def _ecrire_disque(self, cle: str, contenu: bytes):
+        if not self.dossier:
+            return
+        chemin = self._chemin(cle)
+        ajout = len(contenu)
+        try:
+            fd, chemin_tmp = tempfile.mkstemp(dir=self.dossier, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(contenu)
+            try:
+                ajout -= os.stat(chemin).st_size
+            except OSError:
+                pass
+            os.replace(chemin_tmp, chemin)
+        except OSError as e:
+            print(f"Avertissement: écriture du cache PDF impossible ({e}).")
+            ajout = 0
+        with self._verrou_disque:
+            if self.taille_disque_octets is not None:
+                self.taille_disque_octets += ajout
+            if (self.taille_disque_octets is None or self.taille_disque_octets > self.taille_max_disque_octets
+                    or time.monotonic() >= self._prochain_nettoyage):
+                self.taille_disque_octets = self._nettoyer_disque()
+                self._prochain_nettoyage = time.monotonic() + min(self.intervalle_nettoyage, self.ttl_disque)
+
+    def _nettoyer_disque(self) -> Optional[int]:
+        """Supprime les fichiers expirés (y compris les .tmp abandonnés), puis les plus anciens au-delà de la taille maximale.
+
+        Retourne la taille restante des PDF du dossier (None s'il n'a pas pu être parcouru).
+        """
+        limite = time.time() - self.ttl_disque
+        fichiers = []
+        try:
+            with os.scandir(self.dossier) as entrees:
+                for entree in entrees:
+                    if not entree.name.endswith((".pdf", ".tmp")):
+                        continue
+                    try:
+                        stat = entree.stat()
+                    except OSError:
+                        continue
+                    if stat.st_mtime < limite:
+                        self._supprimer(entree.path)
+                    elif entree.name.endswith(".pdf"):
+                        fichiers.append((stat.st_mtime, stat.st_size, entree.path))
+        except OSError:
+            return None
+        taille = sum(t for _, t, _ in fichiers)
+        for _, t, chemin in sorted(fichiers):
+            if taille <= self.taille_max_disque_octets:
+                break
+            self._supprimer(chemin)
+            taille -= t
+        return taille
+
+    @staticmethod
+    def _supprimer(chemin: str):
+        # Un autre worker peut l'avoir déjà supprimé.
+        try:
+            os.remove(chemin)
+        except OSError:
+            pass
+
+
+def cache_depuis_env() -> CachePDF:
+    """Construit le cache à partir des variables d'environnement PDF_CACHE_*."""
+    return CachePDF(
+        taille_max_octets=int(os.getenv("PDF_CACHE_TAILLE_MO", "64")) * 1024 * 1024,
+        dossier=os.getenv("PDF_CACHE_DOSSIER") or None,
+        taille_max_disque_octets=int(os.getenv("PDF_CACHE_DISQUE_MO", "1024")) * 1024 * 1024,
+        ttl_disque=float(os.getenv("PDF_CACHE_DISQUE_TTL_JOURS", "30")) * 24 * 3600,
+        intervalle_nettoyage=float(os.getenv("PDF_CACHE_DISQUE_NETTOYAGE_S", "300")),
+    )
+
+
+class StockPlans:
+    """Plans calculés par /api/process-data, conservés sous un identifiant court.
+
+    Un plan expire `ttl` secondes après son dernier accès ; au-delà de `max_plans`,
+    les plus anciens sont évincés. Le stock est propre à chaque worker uvicorn.
+    """
+
+    def __init__(self, ttl: float = 3600, max_plans: int = 1000):
+        self.ttl = ttl
+        self.max_plans = max_plans
+        self._plans: "collections.OrderedDict[str, Tuple[float, Dict[str, Any]]]" = collections.OrderedDict()
+        self._verrou = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._plans)
+
+    def ajouter(self, plan: Dict[str, Any]) -> str:
+        plan_id = secrets.token_urlsafe(8)
+        with self._verrou:
+            self._purger()
+            self._plans[plan_id] = (time.monotonic() + self.ttl, plan)
+            while len(self._plans) > self.max_plans:
+                self._plans.popitem(last=False)
+        return plan_id
+
+    def get(self, plan_id: str) -> Optional[Dict[str, Any]]:
+        with self._verrou:
+            self._purger()
+            entree = self._plans.pop(plan_id, None)
+            if entree is None:
+                return None
+            self._plans[plan_id] = (time.monotonic() + self.ttl, entree[1])
+            return entree[1]
+
+    def _purger(self):
+        # Les entrées sont rangées par échéance croissante : on s'arrête à la première encore valide.
+        maintenant = time.monotonic()
+        while self._plans:
+            plan_id, (echeance, _) = next(iter(self._plans.items()))
+            if echeance > maintenant:
+                break
+            del self._plans[plan_id]
+
+
+def stock_depuis_env() -> StockPlans:
+    """Construit le stock à partir de PLANS_TTL_SECONDES et PLANS_MAX."""
+    return StockPlans(
+        ttl=float(os.getenv("PLANS_TTL_SECONDES", "3600")),
+        max_plans=int(os.getenv("PLANS_MAX", "1000")),
+    )
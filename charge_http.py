@@ -0,0 +1,247 @@
+# charge_http.py
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from analyse_texte import analyseur_depuis_env
+from bench_plans import generer_projet
+
+# --- GEMINI SIMULÉ ---
+# Réponse type du modèle : un bloc ```json, comme le vrai Gemini avec PROMPT_TEXT_PARSER.
+REPONSE_SIMULEE = {
+    "nombre_morceaux": 2, "hauteur_totale": 1020, "poteau_dims": "40x40",
+    "morceaux": [
+        {"nombre_sections": 1, "structure": [{"type": "poteau"}, {"type": "section", "longueur": 3000}, {"type": "liaison"}]},
+        {"nombre_sections": 1, "structure": [{"type": "liaison"}, {"type": "section", "longueur": 4000}, {"type": "poteau"}]},
+    ],
+}
+
+
+class _ReponseSimulee:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _ModeleSimule:
+    def __init__(self, genai: "GenaiSimule"):
+        self.genai = genai
+
+    async def generate_content_async(self, prompt: str) -> _ReponseSimulee:
+        self.genai.appels += 1
+        await asyncio.sleep(max(0.0, random.gauss(self.genai.latence_s, self.genai.gigue_s)))
+        return _ReponseSimulee(f"```json\n{json.dumps(REPONSE_SIMULEE)}\n```")
+
+
+class GenaiSimule:
+    """Remplace le module `google.generativeai` : même interface que ce qu'utilise AnalyseurTexte, sans réseau.
+
+    Chaque appel attend `latence_s` secondes (loi normale d'écart-type `gigue_s`) sans bloquer la boucle.
+    """
+
+    def __init__(self, latence_s: float = 0.8, gigue_s: float = 0.2):
+        self.latence_s = latence_s
+        self.gigue_s = gigue_s
+        self.appels = 0
+
+    def GenerativeModel(self, nom_modele: str) -> _ModeleSimule:
+        return _ModeleSimule(self)
+
+
+def app_simulee(latence_ms: Optional[float] = None, gigue_ms: Optional[float] = None):
+    """Application de main.py dont l'assistant IA passe par GenaiSimule.
+
+    Fabrique pour `uvicorn --factory` : chaque worker uvicorn l'appelle au démarrage, sans
+    argument ; la latence vient alors de CHARGE_LATENCE_GENAI_MS et CHARGE_GIGUE_GENAI_MS.
+    """
+    import main
+    latence_ms = float(os.getenv("CHARGE_LATENCE_GENAI_MS", "800")) if latence_ms is None else latence_ms
+    gigue_ms = float(os.getenv("CHARGE_GIGUE_GENAI_MS", "200")) if gigue_ms is None else gigue_ms
+    genai = GenaiSimule(latence_ms / 1000, gigue_ms / 1000)
+    main.analyseur_texte = analyseur_depuis_env(genai, main.PROMPT_TEXT_PARSER, lambda d: main.ParsedFormData(**d).model_dump())
+    return main.app
+
+
+# --- REQUÊTES ---
+# Mélange par défaut : poids relatifs des trois routes sollicitées.
+MELANGE_DEFAUT = {"process-data": 5, "draw-pdf": 3, "parse-text": 2}
+
+
+class Scenario:
+    """Corps de requête pré-calculés (projets, plans, descriptions) pour ne mesurer que le serveur."""
+
+    def __init__(self, graine: int, taux_cache_parse: float):
+        from main import ProjectData
+        from moteur import calculer_plan
+        self.alea = random.Random(graine)
+        self.taux_cache_parse = taux_cache_parse
+        self.projets = [generer_projet(graine + i, self.alea.choice([1, 5, 20, 60])) for i in range(8)]
+        self.plans = [calculer_plan(ProjectData(**p)).en_dict() for p in self.projets]
+        self.numero = 0
+
+    def requete(self, route: str) -> Dict[str, Any]:
+        if route == "process-data":
+            return {"method": "POST", "url": "/api/process-data", "json": self.alea.choice(self.projets)}
+        if route == "draw-pdf":
+            return {"method": "POST", "url": "/api/draw-pdf", "json": self.alea.choice(self.plans)}
+        # Texte libre hors des règles locales : il part au modèle, sauf répétition d'une description déjà vue.
+        self.numero += 1
+        numero = self.alea.randrange(4) if self.alea.random() < self.taux_cache_parse else self.numero
+        description = f"Garde-corps pour la terrasse du client n°{numero}, deux morceaux, un contre le mur côté jardin."
+        return {"method": "POST", "url": "/api/parse-text", "json": {"description": description}}
+
+
+def centile(valeurs: List[float], p: float) -> Optional[float]:
+    """Centile `p` (0-100) par rang le plus proche ; None si aucune valeur."""
+    if not valeurs:
+        return None
+    ordonnees = sorted(valeurs)
+    rang = max(1, -(-len(ordonnees) * p // 100))
+    return ordonnees[int(rang) - 1]
+
+
+async def lancer_clients(client: httpx.AsyncClient, scenario: Scenario, melange: Dict[str, int], clients: int,
+                         duree_s: Optional[float], requetes: Optional[int]) -> Dict[str, Any]:
+    """`clients` clients en boucle fermée (une requête à la fois chacun) jusqu'à `duree_s` ou `requetes` au total."""
+    routes, poids = list(melange), list(melange.values())
+    mesures: Dict[str, List[float]] = {route: [] for route in routes}
+    statuts: Dict[str, Dict[str, int]] = {route: {} for route in routes}
+    lancees = 0
+    debut = time.perf_counter()
+    echeance = debut + duree_s if duree_s else None
+
+    async def boucle():
+        nonlocal lancees
+        while (requetes is None or lancees < requetes) and (echeance is None or time.perf_counter() < echeance):
+            lancees += 1
+            route = scenario.alea.choices(routes, poids)[0]
+            t0 = time.perf_counter()
+            try:
+                reponse = await client.request(**scenario.requete(route))
+                statut = str(reponse.status_code)
+            except httpx.HTTPError as e:
+                statut = type(e).__name__
+            mesures[route].append((time.perf_counter() - t0) * 1000)
+            statuts[route][statut] = statuts[route].get(statut, 0) + 1
+
+    await asyncio.gather(*(boucle() for _ in range(clients)))
+    duree = time.perf_counter() - debut
+    rapport = {"clients": clients, "duree_s": round(duree, 3), "requetes": lancees, "debit_rps": round(lancees / duree, 2), "routes": {}}
+    for route in routes:
+        durees = mesures[route]
+        rapport["routes"][route] = {
+            "requetes": len(durees), "debit_rps": round(len(durees) / duree, 2), "statuts": statuts[route],
+            **{f"p{p}_ms": round(centile(durees, p), 2) if durees else None for p in (50, 95, 99)},
+        }
+    return rapport
+
+
+# --- SERVEUR ---
+
+def port_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def demarrer_uvicorn(port: int, workers: int, latence_ms: float, gigue_ms: float) -> subprocess.Popen:
+    env = dict(os.environ, CHARGE_LATENCE_GENAI_MS=str(latence_ms), CHARGE_GIGUE_GENAI_MS=str(gigue_ms))
+    processus = subprocess.Popen([sys.executable, "-m", "uvicorn", "charge_http:app_simulee", "--factory", "--host", "127.0.0.1",
+                                  "--port", str(port), "--workers", str(workers), "--log-level", "warning"], env=env)
+    for _ in range(200):
+        if processus.poll() is not None:
+            raise RuntimeError("uvicorn s'est arrêté au démarrage (est-il installé ?).")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/api/startup-report", timeout=1)
+            return processus
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    processus.terminate()
+    raise RuntimeError("uvicorn ne répond pas après 20 s.")
+
+
+async def executer(mode: str = "asgi", clients: int = 16, duree_s: Optional[float] = 10, requetes: Optional[int] = None,
+                   melange: Optional[Dict[str, int]] = None, workers: int = 1, latence_ms: float = 800, gigue_ms: float = 200,
+                   taux_cache_parse: float = 0.5, graine: int = 1) -> Dict[str, Any]:
+    """Lance l'application et les clients, renvoie le rapport.
+
+    - `asgi` : l'application tourne dans ce processus, appelée sans réseau (httpx.ASGITransport) ;
+      aucun serveur à installer, mais clients et serveur se partagent la même boucle et le même cœur.
+    - `uvicorn` : un vrai serveur uvicorn (`workers` processus) sur un port local, comme en production.
+    """
+    melange = melange or MELANGE_DEFAUT
+    scenario = Scenario(graine, taux_cache_parse)
+    limites = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    if mode == "asgi":
+        transport = httpx.ASGITransport(app=app_simulee(latence_ms, gigue_ms))
+        async with httpx.AsyncClient(transport=transport, base_url="http://charge", timeout=120, limits=limites) as client:
+            rapport = await lancer_clients(client, scenario, melange, clients, duree_s, requetes)
+    elif mode == "uvicorn":
+        port = port_libre()
+        processus = demarrer_uvicorn(port, workers, latence_ms, gigue_ms)
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120, limits=limites) as client:
+                rapport = await lancer_clients(client, scenario, melange, clients, duree_s, requetes)
+        finally:
+            processus.terminate()
+            processus.wait(timeout=10)
+    else:
+        raise ValueError(f"Mode inconnu : {mode!r} (attendu 'asgi' ou 'uvicorn').")
+    rapport.update(mode=mode, workers=workers if mode == "uvicorn" else None, latence_genai_ms=latence_ms, melange=melange)
+    return rapport
+
+
+def lire_melange(texte: str) -> Dict[str, int]:
+    melange = {}
+    for element in texte.split(","):
+        route, _, poids = element.partition("=")
+        if route.strip() not in MELANGE_DEFAUT:
+            raise ValueError(f"Route inconnue dans le mélange : {route.strip()!r}.")
+        melange[route.strip()] = int(poids or 1)
+    return melange
+
+
+def afficher(rapport: Dict[str, Any]):
+    print(f"{rapport['mode']} : {rapport['clients']} clients, {rapport['requetes']} requêtes en {rapport['duree_s']} s, {rapport['debit_rps']} req/s")
+    for route, r in rapport["routes"].items():
+        print(f"  {route:14s} {r['requetes']:6d} req {r['debit_rps']:8.2f} req/s  p50 {r['p50_ms']} ms  p95 {r['p95_ms']} ms  p99 {r['p99_ms']} ms  {r['statuts']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Test de charge HTTP de l'API, Gemini remplacé par un modèle simulé local.")
+    parser.add_argument("--mode", choices=("asgi", "uvicorn"), default="asgi")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duree", type=float, default=10, help="secondes (ignoré si --requetes est donné)")
+    parser.add_argument("--requetes", type=int, help="nombre total de requêtes")
+    parser.add_argument("--melange", default="process-data=5,draw-pdf=3,parse-text=2")
+    parser.add_argument("--workers", type=int, default=1, help="workers uvicorn (mode uvicorn)")
+    parser.add_argument("--latence-genai", type=float, default=800, help="latence simulée du modèle, en ms")
+    parser.add_argument("--gigue-genai", type=float, default=200, help="écart-type de la latence simulée, en ms")
+    parser.add_argument("--taux-cache-parse", type=float, default=0.5, help="part des analyses de texte qui répètent une description")
+    parser.add_argument("--graine", type=int, default=1)
+    parser.add_argument("--sortie", help="fichier JSON du rapport")
+    args = parser.parse_args(argv)
+    try:
+        melange = lire_melange(args.melange)
+    except ValueError as e:
+        parser.error(str(e))
+    rapport = asyncio.run(executer(args.mode, args.clients, None if args.requetes else args.duree, args.requetes, melange, args.workers,
+                                   args.latence_genai, args.gigue_genai, args.taux_cache_parse, args.graine))
+    afficher(rapport)
+    if args.sortie:
+        with open(args.sortie, "w", encoding="utf-8") as f:
+            json.dump(rapport, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+# chargement.py
+
+import argparse
+import importlib
+import importlib.util
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# Durée d'import des modules différés, renseignée à leur premier usage.
+TEMPS_CHARGEMENT: Dict[str, float] = {}
+
+
+def module_disponible(nom: str) -> bool:
+    """Vrai si le module est installé, sans l'importer."""
+    try:
+        return importlib.util.find_spec(nom) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+class ModuleDiffere:
+    """Module importé au premier accès à l'un de ses attributs.
+
+    `apres_import` est appelé une fois sur le module fraîchement importé (configuration).
+    """
+
+    def __init__(self, nom: str, apres_import: Optional[Callable[[Any], None]] = None):
+        self._nom = nom
+        self._apres_import = apres_import
+        self._module = None
+        self._verrou = threading.Lock()
+
+    @property
+    def charge(self) -> bool:
+        return self._module is not None
+
+    def charger(self):
+        if self._module is None:
+            with self._verrou:
+                if self._module is None:
+                    debut = time.perf_counter()
+                    module = importlib.import_module(self._nom)
+                    if self._apres_import:
+                        self._apres_import(module)
+                    TEMPS_CHARGEMENT[self._nom] = time.perf_counter() - debut
+                    self._module = module
+        return self._module
+
+    def __getattr__(self, attribut: str):
+        return getattr(self.charger(), attribut)
+
+    def __repr__(self) -> str:
+        return f"<ModuleDiffere {self._nom} {'chargé' if self.charge else 'non chargé'}>"
+
+
+def rapport_imports(module: str = "main") -> Dict[str, Any]:
+    """Coût d'import de `module` et de chacun des modules qu'il importe, mesuré dans un processus neuf.
+
+    S'appuie sur `python -X importtime` ; les durées sont cumulées (sous-modules compris).
+    """
+    resultat = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    if resultat.returncode != 0:
+        raise RuntimeError(f"Import de {module} impossible :\n{resultat.stderr[-2000:]}")
+    # Les sous-modules sont listés avant leur parent : on garde ceux qui précèdent la ligne de `module`.
+    total_ms, modules, enfants = 0.0, [], []
+    for ligne in resultat.stderr.splitlines():
+        if not ligne.startswith("import time:") or "|" not in ligne:
+            continue
+        _, cumule, nom = ligne.split("|", 2)
+        if not cumule.strip().isdigit():
+            continue
+        profondeur = (len(nom) - len(nom.lstrip()) - 1) // 2
+        nom = nom.strip()
+        if profondeur == 0:
+            if nom == module:
+                total_ms, modules = int(cumule) / 1000, enfants
+            enfants = []
+        elif profondeur == 1:
+            enfants.append({"module": nom, "cumul_ms": int(cumule) / 1000})
+    modules.sort(key=lambda m: -m["cumul_ms"])
+    return {"module": module, "total_ms": total_ms, "modules": modules}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Rapport de coût d'import au démarrage.")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Échoue (code 1) si l'import dépasse ce budget.")
+    args = parser.parse_args(argv)
+    rapport = rapport_imports(args.module)
+    for m in rapport["modules"]:
+        print(f"{m['cumul_ms']:10.1f} ms  {m['module']}")
+    print(f"{rapport['total_ms']:10.1f} ms  TOTAL import {rapport['module']}")
+    if args.budget_ms is not None and rapport["total_ms"] > args.budget_ms:
+        print(f"Budget dépassé : {rapport['total_ms']:.1f} ms > {args.budget_ms:.1f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+# conftest.py
+import pytest
+
+
+@pytest.fixture
+def projet_data():
+    """Projet de référence : deux morceaux, barreaudage vertical, fixation sur platine."""
+    return {
+        "hauteur_totale": 1020, "hauteur_lisse_basse": 100,
+        "poteau_dims": "40x40", "liaison_dims": "40x20",
+        "lissehaute_dims": "40x40", "lissebasse_dims": "40x40",
+        "barreau_dims": "20x20", "ecart_barreaux": 110,
+        "type_fixation": "platine",
+        "remplissage_type": "barreaudage_vertical",
+        "platine_dimensions": "150x150x10",
+        "platine_trous": "4x14",
+        "platine_entraxes": "110x110",
+        "nombre_morceaux": 2, "morceaux_identiques": "non",
+        "morceaux": [
+            {"nombre_sections": 2, "structure": [
+                {"type": "poteau"}, {"type": "section", "longueur": 1500},
+                {"type": "liaison"}, {"type": "section", "longueur": 2000},
+                {"type": "poteau"},
+            ]},
+            {"nombre_sections": 1, "structure": [
+                {"type": "poteau"}, {"type": "section", "longueur": 1000},
+                {"type": "poteau"},
+            ]},
+        ],
+    }
+
+
+@pytest.fixture
+def plan_data(projet_data):
+    """Plan calculé par /api/process-data pour `projet_data`."""
+    from fastapi.testclient import TestClient
+    from main import app
+    response = TestClient(app).post("/api/process-data", json=projet_data)
+    assert response.status_code == 200
+    return response.json()["data"]
@@ -0,0 +1,181 @@
+# decoupe.py
+
+import bisect
+import collections
+import math
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# Articles de la nomenclature exprimés en longueur cumulée : on les redécoupe par section.
+ARTICLES_PAR_SECTION = {"Lisse Haute", "Lisse Basse"}
+
+LONGUEUR_BARRE_MM = 6000
+TRAIT_DE_SCIE_MM = 3
+MODES = ("rapide", "optimise")
+
+# Une pièce : (longueur en mm, nom de l'article)
+Piece = Tuple[float, str]
+
+
+def pieces_depuis_plan(plan: Dict[str, Any]) -> Dict[str, List[Piece]]:
+    """Liste des pièces à débiter, regroupées par profil (`details` de la nomenclature).
+
+    Les lisses, cumulées en une seule longueur dans la nomenclature, sont remplacées
+    par une pièce par section (longueur libre arrondie).
+    """
+    pieces = collections.defaultdict(list)
+    longueurs_sections = [round(s['longueur_libre']) for m in plan['morceaux'] for s in m['sections_details']]
+    for ligne in plan['nomenclature']:
+        if ligne['item'] in ARTICLES_PAR_SECTION:
+            pieces[ligne['details']].extend((longueur, ligne['item']) for longueur in longueurs_sections if longueur > 0)
+        elif ligne['longueur_unitaire_mm'] > 0:
+            pieces[ligne['details']].extend([(ligne['longueur_unitaire_mm'], ligne['item'])] * ligne['quantite'])
+    return dict(pieces)
+
+
+def _nombre_qui_tiennent(restant: float, longueur: float, trait: float) -> int:
+    # k pièces occupent k * longueur + (k - 1) * trait : la dernière n'a pas besoin de trait de scie.
+    return max(0, math.floor((restant + trait) / (longueur + trait) + 1e-9))
+
+
+class _ArbreMax:
+    """Arbre de segments (maximum) sur la place restante des barres : trouve en O(log n) la première barre où une pièce tient."""
+
+    def __init__(self, taille: int):
+        self.n = 1
+        while self.n < taille:
+            self.n *= 2
+        self.valeurs = [-1.0] * (2 * self.n)
+
+    def mettre_a_jour(self, i: int, valeur: float):
+        i += self.n
+        self.valeurs[i] = valeur
+        i //= 2
+        while i:
+            self.valeurs[i] = max(self.valeurs[2 * i], self.valeurs[2 * i + 1])
+            i //= 2
+
+    def premier(self, minimum: float) -> int:
+        if self.valeurs[1] < minimum:
+            return -1
+        i = 1
+        while i < self.n:
+            i = 2 * i if self.valeurs[2 * i] >= minimum else 2 * i + 1
+        return i - self.n
+
+
+def _first_fit_decreasing(pieces: List[Piece], longueur_barre: float, trait: float) -> List[List[Piece]]:
+    """FFD sur des pièces regroupées par longueur : chaque groupe remplit la première barre où il tient, puis la suivante."""
+    groupes = collections.Counter(pieces)
+    barres: List[List[Piece]] = []
+    restants: List[float] = []
+    arbre = _ArbreMax(len(pieces))
+    for piece in sorted(groupes, key=lambda p: (-p[0], p[1])):
+        longueur, a_placer = piece[0], groupes[piece]
+        while a_placer > 0:
+            b = arbre.premier(longueur - 1e-9)
+            if b < 0:
+                b = len(barres)
+                barres.append([])
+                restants.append(longueur_barre)
+            k = min(a_placer, _nombre_qui_tiennent(restants[b], longueur, trait))
+            barres[b].extend([piece] * k)
+            restants[b] = max(0.0, restants[b] - k * (longueur + trait))
+            arbre.mettre_a_jour(b, restants[b])
+            a_placer -= k
+    return barres
+
+
+def _best_fit(pieces: List[Piece], longueur_barre: float, trait: float) -> List[List[Piece]]:
+    """Best-fit dans l'ordre donné : chaque pièce va dans la barre où il reste le moins de place suffisante."""
+    barres: List[List[Piece]] = []
+    restants: List[Tuple[float, int]] = []  # (place restante, index de barre), triée
+    for piece in pieces:
+        longueur = piece[0]
+        i = bisect.bisect_left(restants, (longueur - 1e-9, -1))
+        if i < len(restants):
+            restant, b = restants.pop(i)
+        else:
+            restant, b = longueur_barre, len(barres)
+            barres.append([])
+        barres[b].append(piece)
+        bisect.insort(restants, (max(0.0, restant - longueur - trait), b))
+    return barres
+
+
+def _borne_inferieure(pieces: List[Piece], longueur_barre: float, trait: float) -> int:
+    return math.ceil(sum(p[0] + trait for p in pieces) / (longueur_barre + trait) - 1e-9)
+
+
+def _optimiser(pieces: List[Piece], longueur_barre: float, trait: float, echeance: float, graine: int) -> List[List[Piece]]:
+    """Part du FFD puis essaie des ordres perturbés (best-fit) jusqu'à `echeance` (perf_counter) ou la borne inférieure."""
+    meilleure = _first_fit_decreasing(pieces, longueur_barre, trait)
+    borne = _borne_inferieure(pieces, longueur_barre, trait)
+    rng = random.Random(graine)
+    ordre = sorted(pieces, key=lambda p: -p[0])
+    while len(meilleure) > borne and time.perf_counter() < echeance:
+        essai = _best_fit(sorted(ordre, key=lambda p: -p[0] * rng.uniform(0.8, 1.2)), longueur_barre, trait)
+        if len(essai) < len(meilleure):
+            meilleure = essai
+    return meilleure
+
+
+def _decrire_barres(barres: List[List[Piece]], longueur_barre: float, trait: float) -> List[Dict[str, Any]]:
+    """Regroupe les barres au plan de coupe identique."""
+    motifs = collections.Counter(tuple(sorted(barre, key=lambda p: (-p[0], p[1]))) for barre in barres)
+    description = []
+    for motif, quantite in sorted(motifs.items(), key=lambda m: (-m[1], -sum(p[0] for p in m[0]))):
+        utilise = sum(p[0] for p in motif) + trait * (len(motif) - 1)
+        description.append({
+            "quantite": quantite,
+            "coupes": [{"item": item, "longueur_mm": longueur} for longueur, item in motif],
+            "chute_mm": round(longueur_barre - utilise, 1),
+        })
+    return description
+
+
+def optimiser_decoupe(pieces_par_profil: Dict[str, List[Piece]], longueur_barre: float = LONGUEUR_BARRE_MM, trait_de_scie: float = TRAIT_DE_SCIE_MM,
+                      mode: str = "rapide", temps_max_s: float = 0.5, graine: int = 0) -> Dict[str, Any]:
+    """Plan de débit des pièces dans des barres du commerce de `longueur_barre` mm.
+
+    `mode="rapide"` applique un first-fit-decreasing ; `mode="optimise"` cherche à réduire
+    le nombre de barres pendant au plus `temps_max_s` secondes en tout : chaque profil reçoit
+    une part égale du temps restant, et le temps qu'un profil n'utilise pas revient aux suivants.
+    Les pièces plus longues qu'une barre sont listées à part dans `pieces_hors_barre`.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Mode de découpe inconnu : {mode!r} (attendu {' ou '.join(MODES)}).")
+    if longueur_barre <= 0 or trait_de_scie < 0:
+        raise ValueError("La longueur de barre doit être positive et le trait de scie positif ou nul.")
+    profils = []
+    fin = time.perf_counter() + temps_max_s
+    for rang, (details, pieces) in enumerate(pieces_par_profil.items()):
+        a_debiter = [p for p in pieces if p[0] <= longueur_barre]
+        hors_barre = [{"item": item, "longueur_mm": longueur} for longueur, item in pieces if longueur > longueur_barre]
+        if mode == "optimise":
+            maintenant = time.perf_counter()
+            echeance = maintenant + max(0.0, fin - maintenant) / (len(pieces_par_profil) - rang)
+            barres = _optimiser(a_debiter, longueur_barre, trait_de_scie, echeance, graine)
+        else:
+            barres = _first_fit_decreasing(a_debiter, longueur_barre, trait_de_scie)
+        description = _decrire_barres(barres, longueur_barre, trait_de_scie)
+        chute = sum(b["chute_mm"] * b["quantite"] for b in description)
+        profils.append({
+            "details": details,
+            "nombre_barres": len(barres),
+            "nombre_pieces": len(a_debiter),
+            "borne_inferieure_barres": _borne_inferieure(a_debiter, longueur_barre, trait_de_scie),
+            "chute_totale_mm": round(chute, 1),
+            "taux_chute": round(chute / (len(barres) * longueur_barre), 4) if barres else 0,
+            "barres": description,
+            "pieces_hors_barre": hors_barre,
+        })
+    return {
+        "longueur_barre_mm": longueur_barre,
+        "trait_de_scie_mm": trait_de_scie,
+        "mode": mode,
+        "nombre_barres_total": sum(p["nombre_barres"] for p in profils),
+        "chute_totale_mm": round(sum(p["chute_totale_mm"] for p in profils), 1),
+        "profils": profils,
+    }
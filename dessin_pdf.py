@@ -1,23 +1,54 @@
 # dessin_pdf.py
 
+import functools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import fpdf
 from fpdf import FPDF
-from typing import List, Dict, Any, Optional
-import json
-import collections
-import re
-
-# --- PALETTE DE COULEURS ---
-COLORS = {
-    "poteau": (217, 30, 24), "lisse": (26, 188, 156), "barreau": (52, 152, 219),
-    "cote": (142, 68, 173), "texte_noir": (0, 0, 0), "liaison": (108, 117, 125),
-    "platine": (44, 62, 80)
-}
+from typing import Callable, List, Dict, Any, Optional
+
+import mesures
+from rendu import RenduInterrompu
+from affichage import COULEURS as COLORS, Cercle, Cote, Page, Rangee, Rect, affichage_plan
+
+# --- NIVEAU DE DÉTAIL (LOD) ---
+# Chaque rangée de barreaux est un seul tracé (un sous-chemin par barreau, un seul trait) : tous les
+# barreaux sont dessinés, à l'identique, sans répéter l'opérateur de tracé. Seule une rangée dont le
+# vide entre deux barreaux fait moins de LOD_VIDE_MIN_MM sur le papier, où les barreaux se confondraient
+# à l'impression, est dessinée en bloc : premier et dernier barreaux exacts, zone intermédiaire teintée
+# et légendée. Les cotes restent exactes.
+LOD_VIDE_MIN_MM = 0.3
 
 # --- CLASSE PDF PERSONNALISÉE ---
 class PlanPDF(FPDF):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.show_main_header = True
+        self.show_footer = True
+        # Polices déclarées d'avance, dans un ordre fixe : /F1, /F2, /F3 désignent les mêmes
+        # polices dans tous les documents, condition pour recopier une page d'un document à l'autre.
+        for style in POLICES:
+            self.set_font('Arial', style, 8)
+        self.trait_initial = self.line_width
+
+    def dessiner(self, page: Page, lod: Optional[bool] = None):
+        """Dessine une page du plan, puis revient à l'état graphique de départ du document.
+
+        Chaque page commence et finit dans le même état (couleurs, trait, police) : son contenu,
+        son pied de page et le début de la suivante ne dépendent pas des autres pages, qu'elles
+        soient dessinées ici ou dans un autre processus (voir dessiner_pages_paralleles).
+        """
+        DESSIN_PAGES[page.type](self, page, lod)
+        self.set_draw_color(0)
+        self.set_fill_color(0)
+        self.set_text_color(0)
+        self.set_line_width(self.trait_initial)
+        self.set_font('Arial', POLICES[-1], 8)
+        # La police sera redéclarée au prochain texte, comme après un changement de police.
+        self.current_font_is_set_on_page = False
 
     def header(self):
         if self.show_main_header:
@@ -27,51 +58,191 @@ class PlanPDF(FPDF):
             self.show_main_header = False 
 
     def footer(self):
+        if not self.show_footer:
+            return
         self.set_y(-15)
         self.set_font('Arial', 'I', 8)
+        self.set_text_color(*COLORS["texte_noir"])
         self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
 
+    def ajouter_page_dessinee(self, contenu: bytes):
+        """Ajoute une page dont le contenu a été dessiné par `dessiner_lot` dans un autre document.
+
+        Les pages commencent et finissent dans l'état graphique de départ (voir `dessiner`) : le contenu
+        recopié débute par les mêmes opérations que la page ouverte ici, qui ne sont pas répétées, et
+        le pied de page est écrit comme en rendu séquentiel. Les ressources (polices) de la page sont
+        déclarées comme fpdf le fait en dessinant.
+        """
+        self.add_page()
+        debut = bytes(self.pages[self.page].contents)
+        if not contenu.startswith(debut):
+            raise RuntimeError(f"page {self.page} : début de page différent de celui du document principal")
+        reste = contenu[len(debut):].rstrip(b"\n")
+        if reste:
+            self._out(reste)
+        self._resource_catalog.index_stream_resources(contenu.decode("latin-1"), self.page)
+
+# Styles de la police Arial utilisés par le plan ('BU' partage la police de 'B').
+POLICES = ('', 'B', 'I')
+
 # --- FONCTION PRINCIPALE ---
-def creer_plan_pdf(data: Dict[str, Any]):
+def creer_plan_pdf(data: Dict[str, Any], filepath: Optional[str] = None, lod: Optional[bool] = None, progression: Optional[Callable[[int, int], None]] = None,
+                   workers: Optional[int] = None):
+    """Dessine le plan complet à partir de sa liste d'affichage (affichage.py).
+
+    Sans `filepath`, le PDF est rendu en mémoire et retourné sous forme de bytes :
+    rien n'est écrit sur le disque et chaque appel est isolé des autres.
+    Avec `filepath`, le PDF est écrit à cet emplacement et le chemin est retourné.
+    `lod` : None décide rangée par rangée selon le vide imprimé entre barreaux, True/False force le mode.
+    `progression(pages_faites, pages_total)` est appelé avant la première page puis après chacune ;
+    s'il lève RenduInterrompu, le rendu s'arrête et l'exception remonte.
+    `workers` : processus de dessin des pages (défaut PDF_PAGES_WORKERS) ; voir dessiner_pages_paralleles.
+    """
     try:
-        pdf = PlanPDF(orientation='L', unit='mm', format='A4')
-        
-        dessiner_page_1(pdf, data)
-        
-        grouped_morceaux = collections.defaultdict(list)
-        for morceau in data['morceaux']:
-            structure_key = json.dumps([(s.get('type'), s.get('longueur')) for s in morceau['structure']])
-            grouped_morceaux[structure_key].append(morceau)
-            
-        for structure_key, morceaux_group in grouped_morceaux.items():
-            dessiner_page_morceau(pdf, morceaux_group[0], data, len(morceaux_group))
-
-        if data.get('platine_details'):
-            dessiner_page_platine(pdf, data['platine_details'], data['poteau_dims'])
-            
-        filepath = "plan_garde_corps.pdf"
-        pdf.output(filepath)
+        with mesures.etape("affichage"):
+            pages = affichage_plan(data).pages
+        workers = PAGES_WORKERS if workers is None else workers
+        pdf = None
+        # Dans un worker du pool de rendu (PDF_POOL_MODE=process), les processus sont déjà là :
+        # pas de pool de pages imbriqué, que rien ne fermerait à l'arrêt du worker.
+        if workers > 1 and len(pages) >= PAGES_MIN and multiprocessing.parent_process() is None:
+            try:
+                pdf = PlanPDF(orientation='L', unit='mm', format='A4')
+                with mesures.etape("pages_paralleles"):
+                    dessiner_pages_paralleles(pdf, pages, lod, workers, progression)
+            except RenduInterrompu:
+                raise
+            except Exception as e:
+                print(f"Avertissement: dessin parallèle impossible ({e!r}), rendu séquentiel.")
+                pdf = None
+        if pdf is None:
+            pdf = PlanPDF(orientation='L', unit='mm', format='A4')
+            if progression is not None:
+                progression(0, len(pages))
+            for numero, page in enumerate(pages, 1):
+                with mesures.etape(f"page_{page.type}"):
+                    pdf.dessiner(page, lod)
+                if progression is not None:
+                    progression(numero, len(pages))
+        with mesures.etape("pdf_output"):
+            if filepath is None:
+                return bytes(pdf.output())
+            pdf.output(filepath)
         return filepath
+    except RenduInterrompu:
+        raise
     except Exception as e:
         print(f"Erreur lors de la création du PDF : {e}")
         import traceback
         traceback.print_exc()
         return None
 
-# --- FONCTIONS AUXILIAIRES ---
-def get_deduction_dimension(dim_string: str) -> float:
-    if not dim_string: return 0
-    numbers = re.findall(r'(\d+\.?\d*)', dim_string)
-    if len(numbers) >= 2: return float(numbers[1])
-    elif len(numbers) == 1: return float(numbers[0])
-    return 0
-
-def get_thickness_dimension(dim_string: str) -> float:
-    if not dim_string: return 0
-    numbers = re.findall(r'(\d+\.?\d*)', dim_string)
-    if len(numbers) > 0: return float(numbers[0])
-    return 0
+# --- DESSIN PARALLÈLE DES PAGES ---
+# Avec PDF_PAGES_WORKERS > 1, les pages de morceaux et la platine d'un plan d'au moins PDF_PAGES_MIN
+# pages sont dessinées par lots dans des processus. Chaque lot renvoie le contenu brut de ses pages,
+# recopié dans le document principal, qui dessine la page d'ensemble (et l'en-tête) pendant ce temps,
+# puis les pieds de page. Chaque page commençant et finissant dans le même état graphique (PlanPDF.dessiner),
+# le PDF obtenu est identique octet pour octet au rendu séquentiel, /ID excepté. Si un processus échoue,
+# ou si une page déborde sur plusieurs pages PDF (début de page différent), le plan est redessiné en séquentiel.
+# Désactivé par défaut : le gain dépend des cœurs libres, à mesurer avec bench_pages.py sur la machine
+# cible (sur un seul cœur, le rendu parallèle est plus lent que le séquentiel).
+# La recopie s'appuie sur des attributs internes de fpdf2 (version épinglée dans requirements.txt) :
+# verifier_internes_fpdf() les contrôle avant chaque rendu parallèle, et leur absence ramène au séquentiel.
+PAGES_WORKERS = int(os.getenv("PDF_PAGES_WORKERS", "0"))
+PAGES_MIN = int(os.getenv("PDF_PAGES_MIN", "8"))
+# Lots par processus : de petits lots équilibrent mieux les pages de coûts inégaux.
+LOTS_PAR_WORKER = 3
+
+# Pool de processus partagé par tous les rendus : ouvert au démarrage de l'API (lifespan), sinon au
+# premier rendu parallèle, avec le nombre de processus demandé alors ; un rendu qui en demande un autre
+# découpe ses lots en conséquence mais partage ce pool. Les processus sont lancés en « spawn » : un fork
+# depuis les threads du serveur pourrait copier un verrou tenu par un autre thread (mesures, cache, logging).
+_pool_pages: Optional[ProcessPoolExecutor] = None
+_verrou_pool_pages = threading.Lock()
+
+def pool_pages(workers: int = PAGES_WORKERS) -> ProcessPoolExecutor:
+    global _pool_pages
+    with _verrou_pool_pages:
+        if _pool_pages is None:
+            _pool_pages = ProcessPoolExecutor(max_workers=max(1, workers), mp_context=multiprocessing.get_context("spawn"))
+        return _pool_pages
+
+def abandonner_pool_pages(pool: ProcessPoolExecutor):
+    """Remplace le pool s'il est cassé (processus mort) ; le suivant sera recréé à la demande."""
+    global _pool_pages
+    with _verrou_pool_pages:
+        if _pool_pages is pool:
+            _pool_pages = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def fermer_pool_pages():
+    global _pool_pages
+    with _verrou_pool_pages:
+        if _pool_pages is not None:
+            _pool_pages.shutdown(wait=False, cancel_futures=True)
+            _pool_pages = None
+
+@functools.lru_cache(maxsize=1)
+def verifier_internes_fpdf() -> Optional[str]:
+    """None si fpdf2 offre les attributs internes dont dépend la recopie des pages, sinon ce qui manque."""
+    pdf = PlanPDF(orientation='L', unit='mm', format='A4')
+    pdf.add_page()
+    page = getattr(pdf, "pages", {}).get(1)
+    manquants = [nom for nom, present in (
+        ("FPDF._out", callable(getattr(pdf, "_out", None))),
+        ("FPDF._resource_catalog.index_stream_resources", callable(getattr(getattr(pdf, "_resource_catalog", None), "index_stream_resources", None))),
+        ("PDFPage.contents", isinstance(getattr(page, "contents", None), (bytes, bytearray))),
+    ) if not present]
+    if manquants:
+        return f"fpdf2 {getattr(fpdf, '__version__', '?')} : attributs internes absents ({', '.join(manquants)})"
+    return None
+
+def dessiner_lot(pages: List[Page], lod: Optional[bool] = None) -> List[List[bytes]]:
+    """Dessine des pages dans un document à part, sans en-tête ni pied de page.
+
+    Renvoie, pour chaque page du plan, le contenu de ses pages PDF (plusieurs si elle déborde).
+    """
+    pdf = PlanPDF(orientation='L', unit='mm', format='A4')
+    pdf.show_main_header = pdf.show_footer = False
+    contenus = []
+    for page in pages:
+        avant = pdf.page
+        pdf.dessiner(page, lod)
+        contenus.append([bytes(pdf.pages[n].contents) for n in range(avant + 1, pdf.page + 1)])
+    return contenus
+
+def dessiner_pages_paralleles(pdf: PlanPDF, pages: List[Page], lod: Optional[bool], workers: int,
+                              progression: Optional[Callable[[int, int], None]] = None):
+    """Dessine `pages` dans `pdf` : la première sur place, les suivantes par lots dans le pool de processus."""
+    manquants = verifier_internes_fpdf()
+    if manquants is not None:
+        raise RuntimeError(manquants)
+    taille = max(1, -(-(len(pages) - 1) // (workers * LOTS_PAR_WORKER)))
+    lots = [range(debut, min(debut + taille, len(pages))) for debut in range(1, len(pages), taille)]
+    pool = pool_pages(workers)
+    futurs = []
+    try:
+        futurs = [pool.submit(dessiner_lot, [pages[i] for i in lot], lod) for lot in lots]
+        if progression is not None:
+            progression(0, len(pages))
+        pdf.dessiner(pages[0], lod)
+        if progression is not None:
+            progression(1, len(pages))
+        for lot, futur in zip(lots, futurs):
+            for i, contenus in zip(lot, futur.result()):
+                for contenu in contenus:
+                    pdf.ajouter_page_dessinee(contenu)
+                if progression is not None:
+                    progression(i + 1, len(pages))
+    except BrokenProcessPool:
+        abandonner_pool_pages(pool)
+        raise
+    finally:
+        # Seuls les lots de ce rendu sont annulés : le pool reste aux autres rendus en cours.
+        for futur in futurs:
+            futur.cancel()
 
+# --- FONCTIONS AUXILIAIRES ---
 def draw_horizontal_dim(pdf: FPDF, x, y, width, text):
     pdf.set_draw_color(*COLORS["cote"])
     pdf.set_text_color(*COLORS["cote"])
@@ -114,186 +285,162 @@ def draw_annotation(pdf: FPDF, x, y, title, detail, color, align='L'):
         title_width = pdf.get_string_width(title)
         pdf.text(x - detail_width - title_width, y, title)
 
+def draw_barreaux(pdf: FPDF, x_premier, y, w, h, pas, nombre):
+    """Rangée de `nombre` barreaux verticaux au pas `pas` (unités de la page), en un seul tracé :
+    les mêmes rectangles que `pdf.rect(..., 'D')`, mais un seul opérateur de trait pour la rangée."""
+    if nombre <= 0:
+        return
+    k = pdf.k
+    haut, largeur, hauteur = (pdf.h - y) * k, w * k, -h * k
+    pdf._out("\n".join(f"{(x_premier + i * pas) * k:.2f} {haut:.2f} {largeur:.2f} {hauteur:.2f} re" for i in range(nombre)) + " S")
+
+def draw_barreaux_groupes(pdf: FPDF, x_premier, y, w, h, pas, nombre, vide_mm):
+    """Rangée de `nombre` barreaux verticaux au pas `pas` (unités de la page), dessinée en bloc."""
+    pdf.set_draw_color(*COLORS["barreau"])
+    pdf.rect(x_premier, y, w, h, 'D')
+    if nombre == 1:
+        return
+    x_dernier = x_premier + (nombre - 1) * pas
+    pdf.rect(x_dernier, y, w, h, 'D')
+    if x_dernier - x_premier - w > 0:
+        pdf.set_fill_color(*(c + (255 - c) * 2 // 3 for c in COLORS["barreau"]))
+        pdf.rect(x_premier + w, y, x_dernier - x_premier - w, h, 'F')
+    pdf.set_font('Arial', '', 6)
+    pdf.set_text_color(*COLORS["barreau"])
+    legende = f"{nombre} barreaux, vide {vide_mm:.1f}"
+    if pdf.get_string_width(legende) > x_dernier + w - x_premier:
+        legende = str(nombre)
+    pdf.text(x_premier + (x_dernier + w - x_premier - pdf.get_string_width(legende)) / 2, y + h / 2, legende)
+
+# --- DESSIN DES ÉLÉMENTS ---
+class Repere:
+    """Passage des millimètres réels (y vers le haut) à la page : x' = ox + x * sx, y' = oy - y * sy / div."""
+
+    def __init__(self, ox, oy, sx, sy, div=None):
+        self.ox, self.oy, self.sx, self.sy, self.div = ox, oy, sx, sy, div
+
+    def x(self, x):
+        return self.ox + x * self.sx
+
+    def y(self, y):
+        return self.oy - self.h(y)
+
+    def h(self, h):
+        return h * self.sy / self.div if self.div else h * self.sy
+
+def dessiner_elements(pdf: FPDF, elements, repere: Repere, lod: Optional[bool] = None, epaisseurs: Optional[Dict[str, float]] = None):
+    """Trace les éléments d'une vue ; `epaisseurs` fixe l'épaisseur de trait de certains calques.
+    `lod` : rangées de barreaux en bloc (True), exactes (False), ou selon le vide imprimé (None)."""
+    epaisseurs = epaisseurs or {}
+    for e in elements:
+        if isinstance(e, Cote):
+            if e.sens == "h":
+                draw_horizontal_dim(pdf, repere.x(e.x), repere.y(e.y) + e.decalage, e.longueur * repere.sx, e.texte)
+            else:
+                x = repere.x(e.x) + (e.decalage if e.a_droite else -e.decalage)
+                draw_vertical_dim(pdf, x, repere.y(e.y), repere.h(e.longueur), e.texte, right_side=e.a_droite)
+            continue
+        pdf.set_draw_color(*COLORS[e.calque])
+        if e.calque in epaisseurs:
+            pdf.set_line_width(epaisseurs[e.calque])
+        if isinstance(e, Rect):
+            pdf.rect(repere.x(e.x), repere.y(e.y), e.w * repere.sx, repere.h(e.h), 'D')
+        elif isinstance(e, Cercle):
+            pdf.circle(repere.x(e.x), repere.y(e.y), e.r * repere.sx)
+        elif isinstance(e, Rangee):
+            if lod or (lod is None and e.vide * repere.sx < LOD_VIDE_MIN_MM):
+                draw_barreaux_groupes(pdf, repere.x(e.x), repere.y(e.y), e.w * repere.sx, repere.h(e.h), e.dx * repere.sx, e.nombre, e.vide)
+            else:
+                draw_barreaux(pdf, repere.x(e.x), repere.y(e.y), e.w * repere.sx, repere.h(e.h), e.dx * repere.sx, e.nombre)
+
 # --- DESSIN DES PAGES ---
-def dessiner_page_1(pdf: FPDF, data: Dict[str, Any]):
+def commencer_page(pdf: FPDF):
+    """Nouvelle page, partant des couleurs et de l'épaisseur de trait par défaut : son dessin ne dépend
+    pas des pages précédentes, ce qui permet de la dessiner dans un autre processus (voir dessiner_lot)."""
     pdf.add_page()
+    pdf.set_draw_color(0)
+    pdf.set_fill_color(0)
+    pdf.set_text_color(0)
+    pdf.set_line_width(0.2)
+
+def dessiner_page_1(pdf: FPDF, page: Page, lod: Optional[bool] = None):
+    commencer_page(pdf)
     
     pdf.set_font('Arial', 'B', 12)
-    pdf.cell(0, 10, "1. Vue d'Ensemble", 0, 1, 'L')
+    pdf.cell(0, 10, page.titre, 0, 1, 'L')
     pdf.ln(2)
 
-    total_project_length = sum(m['longueur_totale'] for m in data['morceaux'])
-    if total_project_length > 0:
+    if page.vues:
+        vue = page.vues[0]
         margin = 20
         drawing_width = pdf.w - 2 * margin
         overview_height = 20
-        scale = drawing_width / total_project_length
-        
-        start_x = margin
+        scale = drawing_width / vue.largeur
         start_y = pdf.get_y() + overview_height
-
-        cursor_x = 0
-        for morceau in data['morceaux']:
-            structure_items = [item for item in morceau['structure'] if item.get('type') != 'rien']
-            for item in structure_items:
-                item_type = item['type']
-                if item_type in ['poteau', 'liaison']:
-                    epaisseur = get_deduction_dimension(data[f"{item_type}_dims"])
-                    pdf.set_draw_color(*COLORS[item_type])
-                    pdf.rect(start_x + cursor_x * scale, start_y - overview_height, epaisseur * scale, overview_height, 'D')
-                    cursor_x += epaisseur
-                elif item_type == 'section':
-                    longueur_libre = morceau['sections_details'][0]['longueur_libre']
-                    pdf.set_draw_color(*COLORS['lisse'])
-                    pdf.rect(start_x + cursor_x * scale, start_y - overview_height, longueur_libre * scale, overview_height, 'D')
-                    cursor_x += longueur_libre
-        
-        draw_horizontal_dim(pdf, start_x, start_y + 5, total_project_length * scale, f"Longueur Totale: {total_project_length} mm")
+        # Vue schématique : la hauteur du garde-corps est ramenée à une bande de `overview_height` mm.
+        dessiner_elements(pdf, vue.elements, Repere(margin, start_y, scale, overview_height, vue.hauteur), lod)
         pdf.ln(15)
 
+    tableau = page.tableau
     pdf.set_font('Arial', 'B', 12)
-    pdf.cell(0, 10, '2. Nomenclature Globale', 0, 1, 'L')
+    pdf.cell(0, 10, tableau['titre'], 0, 1, 'L')
     pdf.ln(5)
     pdf.set_font('Arial', 'B', 9)
     pdf.set_fill_color(220, 220, 220)
     col_widths = [60, 80, 40, 60]
-    headers = ['Element', 'Details', 'Quantite', 'Longueur Unitaire']
-    for i, header in enumerate(headers):
+    for i, header in enumerate(tableau['entetes']):
         pdf.cell(col_widths[i], 7, header, 1, 0, 'C', True)
     pdf.ln()
     pdf.set_font('Arial', '', 9)
-    for item in data['nomenclature']:
-        pdf.cell(col_widths[0], 6, item['item'], 1)
-        pdf.cell(col_widths[1], 6, item['details'], 1)
-        pdf.cell(col_widths[2], 6, str(item['quantite']), 1, 0, 'C')
-        pdf.cell(col_widths[3], 6, f"{item['longueur_unitaire_mm']} mm", 1, 0, 'R')
+    for item, details, quantite, longueur in tableau['lignes']:
+        pdf.cell(col_widths[0], 6, item, 1)
+        pdf.cell(col_widths[1], 6, details, 1)
+        pdf.cell(col_widths[2], 6, quantite, 1, 0, 'C')
+        pdf.cell(col_widths[3], 6, longueur, 1, 0, 'R')
         pdf.ln()
 
-def dessiner_page_platine(pdf: FPDF, platine: Dict[str, Any], poteau_dims: str):
-    pdf.add_page()
+def dessiner_page_platine(pdf: FPDF, page: Page, lod: Optional[bool] = None):
+    dessus, cote = page.vues
+    epaisseurs = {"platine": 0.5, "poteau": 0.3, "trou": 0.2}
+    commencer_page(pdf)
     pdf.set_font('Arial', 'B', 12)
-    pdf.cell(0, 10, 'Détail de la Platine de Fixation', 0, 1, 'L')
+    pdf.cell(0, 10, page.titre, 0, 1, 'L')
     pdf.ln(10)
     pdf.set_font('Arial', 'BU', 10)
-    pdf.cell(0, 10, 'Vue de dessus', 0, 1, 'C')
+    pdf.cell(0, 10, dessus.titre, 0, 1, 'C')
     pdf.ln(5)
-    p_l, p_w = platine['longueur'], platine['largeur']
     center_x, center_y = pdf.w / 2, 80
-    pdf.set_draw_color(*COLORS['platine'])
-    pdf.set_line_width(0.5)
-    pdf.rect(center_x - p_l / 2, center_y - p_w / 2, p_l, p_w)
-    po_l = get_thickness_dimension(poteau_dims)
-    po_w = get_deduction_dimension(poteau_dims)
-    pdf.set_draw_color(*COLORS['poteau'])
-    pdf.set_line_width(0.3)
-    pdf.rect(center_x - po_l / 2, center_y - po_w / 2, po_l, po_w)
-    e_l, e_w = platine['entraxe_longueur'], platine['entraxe_largeur']
-    trou_d = platine['diametre_trous']
-    pdf.set_draw_color(0,0,0)
-    pdf.set_line_width(0.2)
-    coords = [(center_x - e_l / 2, center_y - e_w / 2), (center_x + e_l / 2, center_y - e_w / 2), (center_x - e_l / 2, center_y + e_w / 2), (center_x + e_l / 2, center_y + e_w / 2)]
-    for x, y in coords:
-        pdf.circle(x, y, trou_d / 2)
-    draw_horizontal_dim(pdf, center_x - p_l / 2, center_y + p_w / 2 + 10, p_l, str(p_l))
-    draw_horizontal_dim(pdf, center_x - e_l / 2, center_y + p_w / 2 + 20, e_l, f"Entraxe {e_l}")
-    draw_vertical_dim(pdf, center_x - p_l / 2 - 10, center_y + p_w / 2, p_w, str(p_w))
-    draw_vertical_dim(pdf, center_x - p_l / 2 - 20, center_y + e_w / 2, e_w, f"Entraxe {e_w}")
+    dessiner_elements(pdf, dessus.elements, Repere(center_x, center_y, 1, 1), epaisseurs=epaisseurs)
     pdf.set_y(pdf.h - 60)
     pdf.set_font('Arial', 'BU', 10)
-    pdf.cell(0, 10, 'Vue de cote', 0, 1, 'C')
+    pdf.cell(0, 10, cote.titre, 0, 1, 'C')
     pdf.ln(5)
-    p_e = platine['epaisseur']
-    pdf.set_draw_color(*COLORS['platine'])
-    pdf.set_line_width(0.5)
-    pdf.rect(center_x - p_l / 2, pdf.h - 40, p_l, p_e)
-    draw_vertical_dim(pdf, center_x + p_l / 2 + 5, pdf.h - 40 + p_e, p_e, str(p_e), right_side=True)
+    dessiner_elements(pdf, cote.elements, Repere(center_x, pdf.h - 40, 1, 1), epaisseurs=epaisseurs)
 
-def dessiner_page_morceau(pdf: FPDF, morceau: Dict[str, Any], all_data: Dict[str, Any], repetition: int):
-    pdf.add_page()
+def dessiner_page_morceau(pdf: FPDF, page: Page, lod: Optional[bool] = None):
+    commencer_page(pdf)
     pdf.set_font('Arial', 'B', 12)
-    pdf.cell(0, 10, f"Détail du Morceau (longueur {morceau['longueur_totale']} mm)", 0, 1, 'C')
-    if repetition > 1:
+    pdf.cell(0, 10, page.titre, 0, 1, 'C')
+    if page.repetition > 1:
         pdf.set_font('Arial', 'I', 10)
-        pdf.cell(0, 10, f"Répété {repetition} fois", 0, 1, 'C')
+        pdf.cell(0, 10, f"Répété {page.repetition} fois", 0, 1, 'C')
     pdf.ln(30)
+    vue = page.vues[0]
     margin = 40
     drawing_width = pdf.w - 2 * margin
     drawing_height = pdf.h - 2 * margin - 40
-    hauteur_totale = all_data['hauteur_totale']
-    scale = min(drawing_width / morceau['longueur_totale'], drawing_height / hauteur_totale) if morceau['longueur_totale'] > 0 else 0
-    def transform(x, y):
-        origine_x = (pdf.w - morceau['longueur_totale'] * scale) / 2
-        origine_y = pdf.h - margin - (pdf.h - 2 * margin - hauteur_totale * scale) / 2
-        return origine_x + x * scale, origine_y - y * scale
+    longueur_totale, hauteur_totale = vue.largeur, vue.hauteur
+    scale = min(drawing_width / longueur_totale, drawing_height / hauteur_totale) if longueur_totale > 0 else 0
+    origine_x = (pdf.w - longueur_totale * scale) / 2
+    origine_y = pdf.h - margin - (pdf.h - 2 * margin - hauteur_totale * scale) / 2
     pdf.set_line_width(0.3)
-    cursor_x = 0.0
-    structure_items = [item for item in morceau['structure'] if item.get('type') != 'rien']
-    section_details_iterator = iter(morceau['sections_details'])
-    dims_map_visuel = {"poteau": get_deduction_dimension(all_data['poteau_dims']), "liaison": get_deduction_dimension(all_data['liaison_dims']), "barreau": get_deduction_dimension(all_data['barreau_dims'])}
-    dims_map_epaisseur = {"lissehaute": get_thickness_dimension(all_data['lissehaute_dims']), "lissebasse": get_thickness_dimension(all_data['lissebasse_dims'])}
-    for item in structure_items:
-        item_type = item['type']
-        if item_type in ['poteau', 'liaison']:
-            epaisseur_visuelle = dims_map_visuel.get(item_type, 0)
-            pdf.set_draw_color(*COLORS[item_type])
-            x_rect, y_rect = transform(cursor_x, all_data['hauteur_totale'])
-            pdf.rect(x_rect, y_rect, epaisseur_visuelle * scale, all_data['hauteur_totale'] * scale, 'D')
-            cursor_x += epaisseur_visuelle
-        elif item_type == 'section':
-            try:
-                section_details = next(section_details_iterator)
-            except StopIteration:
-                continue
-            longueur_libre = section_details['longueur_libre']
-            lisse_haute_ep = dims_map_epaisseur['lissehaute']
-            lisse_basse_ep = dims_map_epaisseur['lissebasse']
-            pdf.set_draw_color(*COLORS["lisse"])
-            x_lisse, y_lisse_h = transform(cursor_x, all_data['hauteur_totale'])
-            pdf.rect(x_lisse, y_lisse_h, longueur_libre * scale, lisse_haute_ep * scale, 'D')
-            _, y_lisse_b = transform(cursor_x, all_data['hauteur_lisse_basse'] + lisse_basse_ep)
-            pdf.rect(x_lisse, y_lisse_b, longueur_libre * scale, lisse_basse_ep * scale, 'D')
-            if all_data.get('remplissage_type') == 'barreaudage_horizontal':
-                remplissage_details = all_data.get('remplissage_details')
-                if remplissage_details and remplissage_details['nombre_barreaux'] > 0:
-                    pdf.set_draw_color(*COLORS["barreau"])
-                    barreau_ep_horizontal = get_thickness_dimension(all_data['barreau_dims'])
-                    jeu_depart_v = remplissage_details['jeu_depart_mm']
-                    espacement_v = remplissage_details['vide_entre_barreaux_mm']
-                    for k in range(remplissage_details['nombre_barreaux']):
-                        y_pos = all_data['hauteur_lisse_basse'] + lisse_basse_ep + jeu_depart_v + k * (barreau_ep_horizontal + espacement_v)
-                        x_barreau, y_barreau = transform(cursor_x, y_pos + barreau_ep_horizontal)
-                        pdf.rect(x_barreau, y_barreau, longueur_libre * scale, barreau_ep_horizontal * scale, 'D')
-            else: 
-                barreau_ep_visuel = dims_map_visuel.get('barreau', 0)
-                barreau_ep_calcul = get_deduction_dimension(all_data['barreau_dims'])
-                if section_details['nombre_barreaux'] > 0:
-                    pdf.set_draw_color(*COLORS["barreau"])
-                    jeu_depart = section_details['jeu_depart_mm']
-                    espacement = section_details['vide_entre_barreaux_mm']
-                    pos_premier_barreau = cursor_x + jeu_depart
-                    for k in range(section_details['nombre_barreaux']):
-                        pos_x = pos_premier_barreau + k * (espacement + barreau_ep_calcul)
-                        x_barreau, y_barreau = transform(pos_x, all_data['hauteur_totale'] - lisse_haute_ep)
-                        h = (all_data['hauteur_totale'] - all_data['hauteur_lisse_basse'] - lisse_haute_ep - lisse_basse_ep) * scale
-                        w = barreau_ep_visuel * scale
-                        pdf.rect(x_barreau, y_barreau, w, h, 'D')
-            cursor_x += longueur_libre
-    x_origine, y_origine_bas = transform(0, 0)
-    draw_vertical_dim(pdf, x_origine - 5, y_origine_bas, hauteur_totale * scale, str(hauteur_totale))
-    _, y_lisse_basse_pdf = transform(0, all_data['hauteur_lisse_basse'])
-    draw_vertical_dim(pdf, x_origine - 15, y_origine_bas, y_origine_bas - y_lisse_basse_pdf, str(all_data['hauteur_lisse_basse']))
-    draw_horizontal_dim(pdf, x_origine, y_origine_bas + 5, morceau['longueur_totale'] * scale, f"L. Totale: {morceau['longueur_totale']}")
-    temp_cursor_x_cote = 0
-    for item in morceau['structure']:
-        if item['type'] == 'section':
-            longueur_section = item['longueur']
-            x_sec_start, _ = transform(temp_cursor_x_cote, 0)
-            draw_horizontal_dim(pdf, x_sec_start, y_origine_bas + 15, longueur_section * scale, f"Section: {longueur_section}")
-            temp_cursor_x_cote += longueur_section
+    dessiner_elements(pdf, vue.elements, Repere(origine_x, origine_y, scale, scale), lod)
     y_annot_base = 30
     decalage_annot = 15
-    draw_annotation(pdf, decalage_annot, y_annot_base, "Poteau:", all_data['poteau_dims'], COLORS["poteau"], align='L')
-    draw_annotation(pdf, decalage_annot, y_annot_base + 10, "Liaison:", all_data['liaison_dims'], COLORS["liaison"], align='L')
-    draw_annotation(pdf, decalage_annot, y_annot_base + 20, "Barreau:", all_data['barreau_dims'], COLORS["barreau"], align='L')
-    draw_annotation(pdf, pdf.w - decalage_annot, y_annot_base, "Lisse Haute:", all_data['lissehaute_dims'], COLORS["lisse"], align='R')
-    draw_annotation(pdf, pdf.w - decalage_annot, y_annot_base + 10, "Lisse Basse:", all_data['lissebasse_dims'], COLORS["lisse"], align='R')
+    rangs = {"L": 0, "R": 0}
+    for titre, detail, calque, cote in page.legende:
+        x = decalage_annot if cote == 'L' else pdf.w - decalage_annot
+        draw_annotation(pdf, x, y_annot_base + 10 * rangs[cote], titre, detail, COLORS[calque], align=cote)
+        rangs[cote] += 1
+
+DESSIN_PAGES = {"ensemble": dessiner_page_1, "morceau": dessiner_page_morceau, "platine": dessiner_page_platine}
@@ -0,0 +1,105 @@
+# export_dxf.py
+
+from typing import Iterator, List, Tuple
+
+from affichage import Affichage, Cercle, Cote, Rangee, Rect, Vue
+
+# DXF R12 (AC1009) en ASCII : lu par tous les logiciels de FAO/CNC, écrit sans dépendance.
+# Une couche par calque de la liste d'affichage, couleur ACI : 1 rouge, 4 cyan, 5 bleu, 6 magenta, 7 noir/blanc, 8 gris.
+COUCHES = {
+    "poteau": ("POTEAU", 1), "liaison": ("LIAISON", 8), "lisse": ("LISSE", 4),
+    "barreau": ("BARREAU", 5), "platine": ("PLATINE", 7), "trou": ("TROU", 1),
+    "cote": ("COTE", 6), "texte": ("TEXTE", 7),
+}
+# Pages exportées : les élévations de morceaux et la platine. La vue d'ensemble est schématique (hauteur non à l'échelle).
+PAGES_EXPORTEES = ("morceau", "platine")
+# Espace entre deux vues posées côte à côte dans l'espace objet, en fraction de la plus grande vue.
+ESPACE_ENTRE_VUES = 0.15
+
+
+def _paires(*paires) -> str:
+    return "".join(f"{code}\n{valeur}\n" for code, valeur in paires)
+
+
+def _n(valeur: float) -> str:
+    return f"{valeur:.3f}"
+
+
+def _polyligne(couche: str, points: List[Tuple[float, float]], fermee: bool = True) -> str:
+    morceaux = [_paires((0, "POLYLINE"), (8, couche), (66, 1), (10, "0.0"), (20, "0.0"), (30, "0.0"), (70, 1 if fermee else 0))]
+    morceaux += [_paires((0, "VERTEX"), (8, couche), (10, _n(x)), (20, _n(y)), (30, "0.0")) for x, y in points]
+    morceaux.append(_paires((0, "SEQEND"), (8, couche)))
+    return "".join(morceaux)
+
+
+def _rectangle(couche: str, x: float, y: float, w: float, h: float) -> str:
+    # (x, y) est le coin supérieur gauche, y vers le haut.
+    return _polyligne(couche, [(x, y - h), (x + w, y - h), (x + w, y), (x, y)])
+
+
+def _ligne(couche: str, x1: float, y1: float, x2: float, y2: float) -> str:
+    return _paires((0, "LINE"), (8, couche), (10, _n(x1)), (20, _n(y1)), (30, "0.0"), (11, _n(x2)), (21, _n(y2)), (31, "0.0"))
+
+
+def _texte(couche: str, x: float, y: float, hauteur: float, texte: str, rotation: float = 0, centre: bool = False) -> str:
+    paires = [(0, "TEXT"), (8, couche), (10, _n(x)), (20, _n(y)), (30, "0.0"), (40, _n(hauteur)), (1, texte.replace("\n", " "))]
+    if rotation:
+        paires.append((50, _n(rotation)))
+    if centre:
+        paires += [(72, 1), (11, _n(x)), (21, _n(y)), (31, "0.0")]
+    return _paires(*paires)
+
+
+def _cote(e: Cote, dx: float, dy: float, u: float) -> str:
+    # Le décalage des cotes est donné en millimètres papier : on le ramène à la taille de la vue avec `u`.
+    couche, t, d = COUCHES["cote"][0], 1.5 * u, e.decalage * u
+    x, y = e.x + dx, e.y + dy
+    if e.sens == "h":
+        yc = y - d
+        return (_ligne(couche, x, yc, x + e.longueur, yc) + _ligne(couche, x, yc - t, x, yc + t)
+                + _ligne(couche, x + e.longueur, yc - t, x + e.longueur, yc + t)
+                + _texte(couche, x + e.longueur / 2, yc + t, 3 * u, e.texte, centre=True))
+    xc = x + d if e.a_droite else x - d
+    return (_ligne(couche, xc, y, xc, y + e.longueur) + _ligne(couche, xc - t, y, xc + t, y)
+            + _ligne(couche, xc - t, y + e.longueur, xc + t, y + e.longueur)
+            + _texte(couche, xc - t, y + e.longueur / 2, 3 * u, e.texte, rotation=90, centre=True))
+
+
+def _entites_vue(vue: Vue, titre: str, dx: float, dy: float) -> Iterator[str]:
+    x_min, y_min, x_max, y_max = vue.bornes()
+    u = max(x_max - x_min, y_max - y_min, 1) * 0.06 / 25
+    yield _texte(COUCHES["texte"][0], x_min + dx, y_max + dy + 10 * u, 5 * u, titre)
+    for e in vue.elements:
+        if isinstance(e, Rangee):
+            # Les barreaux sont toujours développés : la machine a besoin de chaque position.
+            couche = COUCHES[e.calque][0]
+            yield "".join(_rectangle(couche, r.x + dx, r.y + dy, r.w, r.h) for r in e.rects())
+        elif isinstance(e, Rect):
+            yield _rectangle(COUCHES[e.calque][0], e.x + dx, e.y + dy, e.w, e.h)
+        elif isinstance(e, Cercle):
+            yield _paires((0, "CIRCLE"), (8, COUCHES[e.calque][0]), (10, _n(e.x + dx)), (20, _n(e.y + dy)), (30, "0.0"), (40, _n(e.r)))
+        else:
+            yield _cote(e, dx, dy, u)
+
+
+def flux_dxf(affichage: Affichage) -> Iterator[str]:
+    """Écrit le DXF au fil de l'eau, vue par vue, à partir de la liste d'affichage du plan.
+
+    Les vues sont posées côte à côte dans l'espace objet, en millimètres réels (1 unité = 1 mm).
+    """
+    yield _paires((0, "SECTION"), (2, "HEADER"), (9, "$ACADVER"), (1, "AC1009"), (9, "$INSUNITS"), (70, 4), (0, "ENDSEC"))
+    yield _paires((0, "SECTION"), (2, "TABLES"), (0, "TABLE"), (2, "LAYER"), (70, len(COUCHES)))
+    for nom, couleur in COUCHES.values():
+        yield _paires((0, "LAYER"), (2, nom), (70, 0), (62, couleur), (6, "CONTINUOUS"))
+    yield _paires((0, "ENDTAB"), (0, "ENDSEC"), (0, "SECTION"), (2, "ENTITIES"))
+    curseur_x = 0.0
+    for page in affichage.pages:
+        if page.type not in PAGES_EXPORTEES:
+            continue
+        for vue in page.vues:
+            x_min, y_min, x_max, y_max = vue.bornes()
+            titre = vue.titre + (f" - x{page.repetition}" if page.repetition > 1 else "")
+            yield from _entites_vue(vue, titre, curseur_x - x_min, -y_min)
+            largeur = x_max - x_min
+            curseur_x += largeur + max(largeur, y_max - y_min) * ESPACE_ENTRE_VUES
+    yield _paires((0, "ENDSEC"), (0, "EOF"))
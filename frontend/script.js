@@ -14,6 +14,7 @@ document.addEventListener('DOMContentLoaded', () => {
     const iaForm = document.getElementById('iaForm');
 
     let dernierePropositionComplete = null;
+    let dernierPlanId = null;
 
     // --- GESTION DES ONGLETS ---
     function switchTab(tabToShow, tabToHide, contentToShow, contentToHide) {
@@ -149,13 +150,8 @@ document.addEventListener('DOMContentLoaded', () => {
     nombreMorceauxInput.addEventListener('input', renderForm);
     morceauxIdentiquesRadios.forEach(radio => radio.addEventListener('change', renderForm));
 
-    gardeCorpsForm.addEventListener('submit', async (event) => {
-        event.preventDefault();
-        if (!gardeCorpsForm.checkValidity()) {
-            gardeCorpsForm.reportValidity();
-            return;
-        }
-        resultatSection.innerHTML = `<div class="p-4 text-center bg-blue-100 text-blue-800 rounded-lg"><p class="font-semibold">Calcul en cours...</p></div>`;
+    // --- LECTURE DU FORMULAIRE ---
+    function lireProjectData() {
         const formData = new FormData(gardeCorpsForm);
         const data = Object.fromEntries(formData.entries());
         const projectData = { ...data, morceaux: [] };
@@ -190,8 +186,106 @@ document.addEventListener('DOMContentLoaded', () => {
                 projectData.morceaux.push(morceau);
             }
         }
+        return projectData;
+    }
+
+    // --- APERÇU EN DIRECT ---
+    // Redessine un aperçu SVG léger à chaque modification, sans attendre le PDF.
+    const apercuDiv = document.getElementById('apercu');
+    let minuterieApercu = null;
+    let requeteApercu = null;
+    function planifierApercu() {
+        clearTimeout(minuterieApercu);
+        minuterieApercu = setTimeout(rafraichirApercu, 250);
+    }
+    async function rafraichirApercu() {
+        if (!apercuDiv || !gardeCorpsForm.checkValidity()) return;
+        if (requeteApercu) requeteApercu.abort();
+        requeteApercu = new AbortController();
+        try {
+            const response = await fetch('/api/preview?format=svg', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(lireProjectData()),
+                signal: requeteApercu.signal,
+            });
+            if (!response.ok) return;
+            apercuDiv.innerHTML = await response.text();
+            const svg = apercuDiv.querySelector('svg');
+            if (svg) { svg.removeAttribute('width'); svg.removeAttribute('height'); svg.style.width = '100%'; }
+            apercuDiv.classList.remove('hidden');
+        } catch (error) {
+            if (error.name !== 'AbortError') apercuDiv.classList.add('hidden');
+        }
+    }
+    gardeCorpsForm.addEventListener('input', planifierApercu);
+    gardeCorpsForm.addEventListener('change', planifierApercu);
+
+    // --- SESSION D'ÉDITION ---
+    // Après un premier calcul, une modification des seules longueurs de sections ou de l'écart
+    // est envoyée en PATCH : le serveur ne recalcule que ce qui change et renvoie un diff du plan.
+    let sessionEdition = null;
+    function squelette(projet) {
+        const morceaux = projet.morceaux.map(m => ({ ...m, structure: m.structure.map(item => item.type === 'section' ? { type: 'section' } : item) }));
+        return JSON.stringify({ ...projet, ecart_barreaux: null, morceaux });
+    }
+    function patchesDepuis(ancien, nouveau) {
+        if (squelette(ancien) !== squelette(nouveau)) return null;
+        const patches = [];
+        if (ancien.ecart_barreaux !== nouveau.ecart_barreaux) {
+            patches.push({ op: 'ecart_barreaux', valeur: parseInt(nouveau.ecart_barreaux, 10) });
+        }
+        nouveau.morceaux.forEach((morceau, m) => {
+            const anciennes = ancien.morceaux[m].structure.filter(item => item.type === 'section');
+            morceau.structure.filter(item => item.type === 'section').forEach((section, k) => {
+                if (section.longueur !== anciennes[k].longueur) {
+                    patches.push({ op: 'section', morceau: m, section: k, longueur: section.longueur });
+                }
+            });
+        });
+        return patches.every(p => Number.isInteger(p.longueur ?? p.valeur)) ? patches : null;
+    }
+    function appliquerDiff(plan, diff) {
+        for (const { path, value } of diff) {
+            const cles = path.split('/').slice(1);
+            const derniere = cles.pop();
+            cles.reduce((objet, cle) => objet[cle], plan)[derniere] = value;
+        }
+    }
+    async function envoyerPatches(patches, projectData) {
+        // Session expirée, modifiée ailleurs ou patch refusé : on retombe sur un calcul complet.
+        const response = await fetch(`/api/sessions/${sessionEdition.id}`, {
+            method: 'PATCH',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ version: sessionEdition.version, patches }),
+        });
+        if (!response.ok) {
+            sessionEdition = null;
+            return false;
+        }
+        const result = await response.json();
+        appliquerDiff(dernierePropositionComplete, result.diff);
+        sessionEdition = { ...sessionEdition, version: result.version, projet: projectData };
+        // Le plan stocké sous dernierPlanId est l'ancien : le PDF viendra de la session, le DXF du plan complet.
+        dernierPlanId = null;
+        return true;
+    }
+
+    gardeCorpsForm.addEventListener('submit', async (event) => {
+        event.preventDefault();
+        if (!gardeCorpsForm.checkValidity()) {
+            gardeCorpsForm.reportValidity();
+            return;
+        }
+        resultatSection.innerHTML = `<div class="p-4 text-center bg-blue-100 text-blue-800 rounded-lg"><p class="font-semibold">Calcul en cours...</p></div>`;
+        const projectData = lireProjectData();
         try {
-            const response = await fetch('/api/process-data', {
+            const patches = sessionEdition ? patchesDepuis(sessionEdition.projet, projectData) : null;
+            if (patches && await envoyerPatches(patches, projectData)) {
+                displayResults(dernierePropositionComplete);
+                return;
+            }
+            const response = await fetch('/api/sessions', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify(projectData),
@@ -202,6 +296,8 @@ document.addEventListener('DOMContentLoaded', () => {
             }
             const result = await response.json();
             dernierePropositionComplete = result.data;
+            dernierPlanId = result.plan_id || null;
+            sessionEdition = { id: result.session_id, version: result.version, projet: projectData };
             displayResults(result.data);
         } catch (error) {
             resultatSection.innerHTML = `<div class="p-4 text-center bg-red-100 text-red-800 rounded-lg"><p class="font-semibold">Erreur</p><p>${error.message}</p></div>`;
@@ -324,8 +420,47 @@ document.addEventListener('DOMContentLoaded', () => {
                 return `<div class="mt-4"><h4 class="font-semibold text-md text-slate-700">Détail du Morceau ${index + 1} (Longueur totale: ${morceau.longueur_totale.toFixed(1)} mm)</h4><div class="overflow-hidden border border-slate-200 rounded-lg mt-1"><table class="min-w-full bg-white text-xs"><thead class="bg-slate-50"><tr><th class="p-2 text-center font-semibold text-slate-600">Section</th><th class="p-2 text-right font-semibold text-slate-600">Long. Section</th><th class="p-2 text-right font-semibold text-slate-600">Long. Libre</th><th class="p-2 text-center font-semibold text-slate-600">Nb. Barreaux</th><th class="p-2 text-right font-semibold text-slate-600">Vide entre Barreaux</th><th class="p-2 text-right font-semibold text-slate-600">Jeu Départ</th></tr></thead><tbody>${sectionRows}</tbody></table></div></div>`;
             }).join('');
         }
-        resultatSection.innerHTML = `<div class="bg-white p-6 rounded-lg shadow-inner border border-slate-200 text-left space-y-4"><h2 class="text-2xl font-bold text-slate-800 border-b pb-2">Proposition Générée</h2><p class="text-slate-600">${data.description_projet || 'Description non fournie.'}</p>${nomenclatureHtml}<div><h3 class="font-bold text-lg text-slate-700 mt-6 mb-2">Plan de Fabrication Détaillé</h3>${planDetailsHtml}</div><div class="text-center pt-6"><button id="downloadPdfBtn" class="w-full bg-purple-600 text-white font-bold py-3 px-4 rounded-lg hover:bg-purple-700 transition-colors">Télécharger le Plan PDF</button></div><div><h3 class="font-bold text-lg text-slate-700 mt-6 mb-2">Données Techniques (JSON)</h3><pre class="bg-slate-800 text-white p-4 rounded-md overflow-x-auto text-sm"><code>${JSON.stringify(data, null, 2)}</code></pre></div></div>`;
+        resultatSection.innerHTML = `<div class="bg-white p-6 rounded-lg shadow-inner border border-slate-200 text-left space-y-4"><h2 class="text-2xl font-bold text-slate-800 border-b pb-2">Proposition Générée</h2><p class="text-slate-600">${data.description_projet || 'Description non fournie.'}</p>${nomenclatureHtml}<div><h3 class="font-bold text-lg text-slate-700 mt-6 mb-2">Plan de Fabrication Détaillé</h3>${planDetailsHtml}</div><div class="text-center pt-6"><button id="downloadPdfBtn" class="w-full bg-purple-600 text-white font-bold py-3 px-4 rounded-lg hover:bg-purple-700 transition-colors">Télécharger le Plan PDF</button><button id="downloadDxfBtn" class="w-full mt-2 bg-slate-600 text-white font-bold py-3 px-4 rounded-lg hover:bg-slate-700 transition-colors">Télécharger le DXF (découpe)</button></div><div><h3 class="font-bold text-lg text-slate-700 mt-6 mb-2">Données Techniques (JSON)</h3><pre class="bg-slate-800 text-white p-4 rounded-md overflow-x-auto text-sm"><code>${JSON.stringify(data, null, 2)}</code></pre></div></div>`;
         document.getElementById('downloadPdfBtn').addEventListener('click', handleDownloadPdf);
+        document.getElementById('downloadDxfBtn').addEventListener('click', handleDownloadDxf);
+    }
+    async function handleDownloadDxf() {
+        if (!dernierePropositionComplete) return;
+        const downloadBtn = document.getElementById('downloadDxfBtn');
+        downloadBtn.disabled = true;
+        try {
+            let response = dernierPlanId ? await fetch('/api/export-dxf', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ plan_id: dernierPlanId }),
+            }) : null;
+            if (!response || response.status === 404) {
+                response = await fetch('/api/export-dxf', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ plan: dernierePropositionComplete }),
+                });
+            }
+            if (!response.ok) {
+                const errorData = await response.json();
+                throw new Error(errorData.detail || "Erreur lors de l'export DXF.");
+            }
+            const url = window.URL.createObjectURL(await response.blob());
+            const a = document.createElement('a');
+            a.href = url;
+            a.download = 'plan_garde_corps.dxf';
+            document.body.appendChild(a);
+            a.click();
+            window.URL.revokeObjectURL(url);
+            a.remove();
+        } catch (error) {
+            const errorDiv = document.createElement('div');
+            errorDiv.className = 'p-4 mt-4 text-center bg-red-100 text-red-800 rounded-lg';
+            errorDiv.innerHTML = `<p class="font-semibold">Erreur d'export DXF</p><p>${error.message}</p>`;
+            resultatSection.appendChild(errorDiv);
+        } finally {
+            downloadBtn.disabled = false;
+        }
     }
     async function handleDownloadPdf() {
         if (!dernierePropositionComplete) return;
@@ -333,11 +468,17 @@ document.addEventListener('DOMContentLoaded', () => {
         downloadBtn.textContent = 'Génération en cours...';
         downloadBtn.disabled = true;
         try {
-            const response = await fetch('/api/draw-pdf', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(dernierePropositionComplete),
-            });
+            // Le plan est déjà côté serveur : la session d'édition (à jour des PATCH) ou le plan stocké.
+            // On évite de le renvoyer en entier ; s'il a expiré, on retombe sur /api/draw-pdf.
+            const source = sessionEdition ? `/api/sessions/${sessionEdition.id}/pdf` : dernierPlanId ? `/api/plans/${dernierPlanId}/pdf` : null;
+            let response = source ? await fetch(source) : null;
+            if (!response || response.status === 404) {
+                response = await fetch('/api/draw-pdf', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify(dernierePropositionComplete),
+                });
+            }
             if (!response.ok) {
                  const errorData = await response.json();
                 throw new Error(errorData.detail || 'Erreur lors de la génération du PDF.');
@@ -1,38 +1,160 @@
 # main.py
 
+import time
+_debut_import = time.perf_counter()
+
 import os
 import json
-from fastapi import FastAPI, HTTPException
+import functools
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Header, Query, Request
+from fastapi.routing import APIRoute
+from starlette.datastructures import MutableHeaders
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
-import re
-import math
-
-# On importe le module pour la clé API, mais on le rend optionnel
-try:
-    import google.generativeai as genai
-except ImportError:
-    genai = None
-
-from dessin_pdf import creer_plan_pdf
-
-# --- CONFIGURATION ---
-app = FastAPI(title="API Garde-Corps v11.0 (Unified)", version="11.0.0")
-
-# Configuration de l'API Gemini (si la clé est disponible)
-if genai:
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError, field_validator
+from typing import List, Optional, Dict, Any, Union
+
+import mesures
+from chargement import TEMPS_CHARGEMENT, ModuleDiffere, module_disponible
+from rendu import PoolSatureError, Reservation, flux_zip, pool_depuis_env
+from decoupe import LONGUEUR_BARRE_MM, TRAIT_DE_SCIE_MM, optimiser_decoupe, pieces_depuis_plan
+from analyse_texte import AnalyseDelaiDepasseError, AnalyseNonConfigureeError, AnalyseSatureeError, StatistiquesAnalyse, analyser_par_regles, analyseur_depuis_env
+from profils import ProfileSpec, get_deduction_dimension, get_thickness_dimension
+import moteur
+from moteur import MAX_VARIANTES_SWEEP, calculer_plan, fusionner_nomenclatures, lire_platine, repartition, repartition_batch
+from cache_plans import cache_depuis_env, cle_plan, etag_correspond, stock_depuis_env
+from apercu import apercu_svg, compresser_si_accepte
+from affichage import affichage_plan
+from export_dxf import flux_dxf
+from sessions_plan import SessionPlan, sessions_depuis_env
+from travaux import TERMINE, TravauxSaturesError, travaux_depuis_env
+
+# --- MODULES LOURDS, IMPORTÉS AU PREMIER USAGE ---
+np = moteur.np
+dessin_pdf = ModuleDiffere("dessin_pdf")  # fpdf2
+
+# Configuration de l'API Gemini (si la clé est disponible et le module installé).
+# google.generativeai (grpc, protobuf) n'est importé et configuré qu'à la première analyse.
+def configurer_gemini(module):
+    """Configure le client ; en cas d'échec, l'assistant est désactivé comme avant le chargement différé."""
+    global analyseur_texte
     try:
-        api_key = os.getenv("MA_CLE_GEMINI")
-        if api_key:
-            genai.configure(api_key=api_key)
-        else:
-            print("Avertissement: MA_CLE_GEMINI n'est pas définie. L'assistant IA sera désactivé.")
-            genai = None
+        module.configure(api_key=os.getenv("MA_CLE_GEMINI"))
     except Exception as e:
         print(f"Erreur de configuration de l'API Gemini: {e}")
-        genai = None
+        analyseur_texte = None
+        raise AnalyseNonConfigureeError(str(e)) from e
+
+genai = None
+if module_disponible("google.generativeai"):
+    if os.getenv("MA_CLE_GEMINI"):
+        genai = ModuleDiffere("google.generativeai", apres_import=configurer_gemini)
+    else:
+        print("Avertissement: MA_CLE_GEMINI n'est pas définie. L'assistant IA sera désactivé.")
+
+def prechauffer():
+    """Importe d'avance les modules différés et démarre le pool de rendu."""
+    for module in (np, dessin_pdf, genai):
+        if module is not None:
+            try:
+                module.charger()
+            except AnalyseNonConfigureeError:
+                pass  # assistant désactivé, l'erreur est déjà affichée
+    pool_rendu.executor
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # PRECHARGEMENT=1 : on paie les imports au démarrage plutôt qu'à la première requête.
+    if os.getenv("PRECHARGEMENT") == "1":
+        prechauffer()
+    # Le pool de dessin des pages est créé ici, une fois, plutôt que depuis un thread de rendu.
+    if int(os.getenv("PDF_PAGES_WORKERS", "0")) > 1:
+        dessin_pdf.pool_pages()
+    app.state.duree_demarrage_s = time.perf_counter() - _debut_import
+    yield
+    pool_rendu.fermer()
+    travaux_rendu.fermer()
+    if dessin_pdf.charge:
+        dessin_pdf.fermer_pool_pages()
+
+# --- CONFIGURATION ---
+app = FastAPI(title="API Garde-Corps v11.0 (Unified)", version="11.0.0", lifespan=lifespan)
+
+# Pool de rendu PDF (PDF_POOL_MODE, PDF_POOL_WORKERS, PDF_POOL_FILE_MAX, PDF_POOL_RETRY_AFTER)
+# PDF_POOL_MODE=thread (défaut) rend sous le GIL, sur un seul cœur ; le Dockerfile pose PDF_POOL_MODE=process
+# pour que les rendus, export ZIP compris, se répartissent sur les cœurs de la machine.
+# Chaque rendu peut en plus répartir ses pages entre processus (PDF_PAGES_WORKERS, PDF_PAGES_MIN, voir dessin_pdf.py).
+pool_rendu = pool_depuis_env()
+
+# Cache des PDF rendus (PDF_CACHE_TAILLE_MO, PDF_CACHE_DOSSIER, PDF_CACHE_DISQUE_MO, PDF_CACHE_DISQUE_TTL_JOURS,
+# PDF_CACHE_DISQUE_NETTOYAGE_S)
+cache_pdf = cache_depuis_env()
+
+# Plans calculés, récupérables par identifiant (PLANS_TTL_SECONDES, PLANS_MAX)
+stock_plans = stock_depuis_env()
+
+# Sessions d'édition incrémentale (SESSIONS_TTL_SECONDES, SESSIONS_MAX)
+stock_sessions = sessions_depuis_env()
+
+# Rendus en arrière-plan (TRAVAUX_CONCURRENCE, TRAVAUX_FILE_MAX, TRAVAUX_TTL_SECONDES, TRAVAUX_MAX_FINIS)
+travaux_rendu = travaux_depuis_env()
+
+# --- MESURES (MESURES=0 pour désactiver) ---
+# Chaque réponse porte un en-tête Server-Timing (validation, calcul, affichage, page_*, pdf_output,
+# gemini, serialisation, total) ; /metrics expose les séries au format Prometheus.
+
+class RouteMesuree(APIRoute):
+    """Route dont le temps se décompose en validation, exécution et sérialisation de la réponse."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, mesures.chronometrer_appel(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        traiter = super().get_route_handler()
+
+        async def traiter_mesure(request: Request) -> Response:
+            chronos = mesures.chronos_courant()
+            if chronos is not None:
+                chronos.debut_route = time.perf_counter()
+            response = await traiter(request)
+            if chronos is not None and chronos.fin_appel is not None:
+                chronos.ajouter("serialisation", time.perf_counter() - chronos.fin_appel)
+            return response
+        return traiter_mesure
+
+class MiddlewareMesures:
+    """Middleware ASGI : ouvre le Chronos de la requête, ajoute Server-Timing au début de la réponse
+    et enregistre la durée complète (corps compris) par route et le statut."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        debut = time.perf_counter()
+        chronos, jeton = mesures.demarrer_requete()
+        statut = 500
+
+        async def envoyer(message):
+            nonlocal statut
+            if message["type"] == "http.response.start":
+                statut = message["status"]
+                MutableHeaders(scope=message).append("Server-Timing", chronos.server_timing(time.perf_counter() - debut))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, envoyer)
+        finally:
+            mesures.terminer_requete(jeton)
+            route = getattr(scope.get("route"), "path", "inconnue")
+            mesures.REQUETES.observer(time.perf_counter() - debut, route=route, methode=scope["method"])
+            mesures.REPONSES.incrementer(route=route, methode=scope["method"], statut=str(statut))
+
+if mesures.ACTIVES:
+    app.router.route_class = RouteMesuree
+    app.add_middleware(MiddlewareMesures)
 
 # Configuration CORS pour le développement local
 origins = ["http://127.0.0.1:5500", "http://localhost:5500", "null"]
@@ -77,6 +199,12 @@ class ProjectData(BaseModel):
     nombre_morceaux: int; morceaux_identiques: str
     morceaux: List[MorceauData]
 
+    @field_validator('poteau_dims', 'liaison_dims', 'lissehaute_dims', 'lissebasse_dims', 'barreau_dims')
+    @classmethod
+    def verifier_profil(cls, valeur: str) -> str:
+        ProfileSpec.depuis_texte(valeur)
+        return valeur
+
 class NomenclatureItem(BaseModel):
     item: str; details: str; quantite: int; longueur_unitaire_mm: int
 
@@ -108,6 +236,56 @@ class FinalPlanData(BaseModel):
     platine_details: Optional[PlatineDetails] = None
     remplissage_type: str
     remplissage_details: Optional[RepartitionResult] = None
+    groupes_morceaux: Optional[List[List[int]]] = None
+
+class ExportZipData(BaseModel):
+    plans: List[FinalPlanData] = []
+    plan_ids: List[str] = []
+
+class PlageSweep(BaseModel):
+    debut: int
+    fin: int
+    pas: int = 1
+
+class SweepData(BaseModel):
+    projet: ProjectData
+    ecart_barreaux: Optional[Union[List[int], PlageSweep]] = None
+    barreau_dims: Optional[List[str]] = None
+    poteau_dims: Optional[List[str]] = None
+
+    @field_validator('barreau_dims', 'poteau_dims')
+    @classmethod
+    def verifier_profils(cls, valeurs: Optional[List[str]]) -> Optional[List[str]]:
+        for valeur in valeurs or []:
+            ProfileSpec.depuis_texte(valeur)
+        return valeurs
+
+class CutListData(BaseModel):
+    plan: Optional[FinalPlanData] = None
+    plan_id: Optional[str] = None
+    longueur_barre_mm: float = LONGUEUR_BARRE_MM
+    trait_de_scie_mm: float = TRAIT_DE_SCIE_MM
+    mode: str = "rapide"
+    temps_max_s: float = Field(default=0.5, ge=0, le=10)
+
+class ExportDxfData(BaseModel):
+    plan: Optional[FinalPlanData] = None
+    plan_id: Optional[str] = None
+
+class TravailRenduData(BaseModel):
+    plan: Optional[FinalPlanData] = None
+    plan_id: Optional[str] = None
+
+class PatchSession(BaseModel):
+    op: str
+    morceau: Optional[int] = None
+    section: Optional[int] = None
+    longueur: Optional[int] = None
+    valeur: Optional[int] = None
+
+class ModificationSession(BaseModel):
+    version: Optional[int] = None
+    patches: List[PatchSession]
 
 class DescriptionData(BaseModel):
     description: str
@@ -170,150 +348,351 @@ Exemple de sortie JSON attendue :
 Produis uniquement le JSON.
 """
 
+# Analyseur partagé : modèle réutilisé, cache, coalescence et limites
+# (GEMINI_MODELE, GEMINI_CACHE_TTL_S, GEMINI_CACHE_TAILLE, GEMINI_TIMEOUT_S, GEMINI_CONCURRENCE_MAX)
+analyseur_texte = analyseur_depuis_env(genai, PROMPT_TEXT_PARSER, lambda d: ParsedFormData(**d).model_dump()) if genai else None
+statistiques_analyse = StatistiquesAnalyse()
+
 # --- FONCTIONS AUXILIAIRES ---
-def get_deduction_dimension(dim_string: str) -> float:
-    if not dim_string: return 0
-    numbers = re.findall(r'(\d+\.?\d*)', dim_string)
-    if len(numbers) >= 2: return float(numbers[1])
-    elif len(numbers) == 1: return float(numbers[0])
-    return 0
-
-def get_thickness_dimension(dim_string: str) -> float:
-    if not dim_string: return 0
-    numbers = re.findall(r'(\d+\.?\d*)', dim_string)
-    if len(numbers) > 0: return float(numbers[0])
-    return 0
+# Le calcul vit dans moteur.py (dataclasses à slots) ; ces enveloppes gardent l'API pydantic historique.
+calculate_repartition_batch = repartition_batch
 
 def calculate_repartition(longueur_libre: float, epaisseur_barreau: float, ecart_maximal: float) -> RepartitionResult:
-    if longueur_libre <= 0 or epaisseur_barreau <= 0 or ecart_maximal <= 0:
-        return RepartitionResult(nombre_barreaux=0, vide_entre_barreaux_mm=0, jeu_depart_mm=longueur_libre)
-    nombre_blocs = longueur_libre / (epaisseur_barreau + ecart_maximal)
-    nombre_barreaux = math.ceil(nombre_blocs - 1)
-    if nombre_barreaux < 0: nombre_barreaux = 0
-    nombre_espaces = nombre_barreaux + 1
-    longueur_totale_barreaux = nombre_barreaux * epaisseur_barreau
-    espacement_reel = (longueur_libre - longueur_totale_barreaux) / nombre_espaces
-    if espacement_reel > (ecart_maximal + 1e-9):
-        nombre_barreaux += 1
-        nombre_espaces = nombre_barreaux + 1
-        longueur_totale_barreaux = nombre_barreaux * epaisseur_barreau
-        espacement_reel = (longueur_libre - longueur_totale_barreaux) / nombre_espaces
-    if nombre_barreaux <= 0:
-        return RepartitionResult(nombre_barreaux=0, vide_entre_barreaux_mm=0, jeu_depart_mm=longueur_libre)
-    return RepartitionResult(nombre_barreaux=nombre_barreaux, vide_entre_barreaux_mm=espacement_reel, jeu_depart_mm=espacement_reel)
+    return RepartitionResult(**repartition(longueur_libre, epaisseur_barreau, ecart_maximal).en_dict())
 
 def parse_platine_data(platine_string: str) -> Optional[PlatineDetails]:
-    if not platine_string: return None
-    try:
-        parts = {p.split(':')[0].strip().lower(): p.split(':')[1].strip() for p in platine_string.split('/') if ':' in p}
-        dims_part = next((p.strip() for p in platine_string.split('/') if ':' not in p), "")
-        dims = [float(d) for d in re.findall(r'(\d+\.?\d*)', dims_part)]
-        trous = [float(t) for t in re.findall(r'(\d+\.?\d*)', parts.get('trous', ''))]
-        entraxes = [float(e) for e in re.findall(r'(\d+\.?\d*)', parts.get('entraxes', ''))]
-        return PlatineDetails(longueur=dims[0], largeur=dims[1], epaisseur=dims[2], nombre_trous=int(trous[0]), diametre_trous=trous[1], entraxe_longueur=entraxes[0], entraxe_largeur=entraxes[1])
-    except (IndexError, ValueError, KeyError): return None
+    platine = lire_platine(platine_string)
+    return PlatineDetails(**platine.en_dict()) if platine else None
+
+def calculer_sweep(data: SweepData) -> List[Dict[str, Any]]:
+    """Déplie les listes et plages de paramètres demandées, puis évalue les variantes (moteur.calculer_sweep).
+
+    Une plage reste un `range` : sa taille est contrôlée avant que la moindre valeur soit produite.
+    """
+    projet = data.projet
+    if isinstance(data.ecart_barreaux, PlageSweep):
+        if data.ecart_barreaux.pas <= 0:
+            raise ValueError("Le pas de la plage d'écarts doit être positif.")
+        ecarts = range(data.ecart_barreaux.debut, data.ecart_barreaux.fin + 1, data.ecart_barreaux.pas)
+    else:
+        ecarts = data.ecart_barreaux or [projet.ecart_barreaux]
+    barreaux = data.barreau_dims or [projet.barreau_dims]
+    poteaux = data.poteau_dims or [projet.poteau_dims]
+    return moteur.calculer_sweep(projet, ecarts, barreaux, poteaux)
 
 # --- ROUTES API ---
 
 @app.post("/api/parse-text", response_model=ParsedFormData)
-async def parse_text_to_form(data: DescriptionData):
-    if not genai:
+async def parse_text_to_form(data: DescriptionData, response: Response):
+    # Les descriptions courantes sont reconnues localement, sans aller-retour vers le modèle.
+    parsed_data = analyser_par_regles(data.description)
+    if parsed_data is not None:
+        statistiques_analyse.compter("regles")
+        response.headers["X-Analyse-Source"] = "regles"
+        return ParsedFormData(**parsed_data)
+    if not analyseur_texte:
         raise HTTPException(status_code=503, detail="Le service d'analyse IA n'est pas configuré.")
+    statistiques_analyse.compter("modele")
+    response.headers["X-Analyse-Source"] = "modele"
     try:
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        prompt = PROMPT_TEXT_PARSER.format(user_text=data.description)
-        response = await model.generate_content_async(prompt)
-        response_text = response.text.strip()
-        json_match = re.search(r'```json\n({.*?})\n```', response_text, re.DOTALL)
-        json_str = json_match.group(1) if json_match else response_text
-        parsed_data = json.loads(json_str)
-        return ParsedFormData(**parsed_data)
+        return ParsedFormData(**await analyseur_texte.analyser(data.description))
+    except AnalyseNonConfigureeError:
+        raise HTTPException(status_code=503, detail="Le service d'analyse IA n'est pas configuré.")
+    except AnalyseSatureeError:
+        raise HTTPException(status_code=503, detail="Trop d'analyses en cours, réessayez dans quelques instants.", headers={"Retry-After": "2"})
+    except AnalyseDelaiDepasseError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de l'analyse du texte: {str(e)}")
 
+@app.get("/api/parse-text/stats")
+async def parse_text_stats():
+    """Répartition des analyses entre règles locales et modèle."""
+    return statistiques_analyse.en_dict()
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Séries Prometheus (format texte 0.0.4) du processus."""
+    if not mesures.ACTIVES:
+        raise HTTPException(status_code=404, detail="Mesures désactivées (MESURES=0).")
+    return Response(content=mesures.exposition(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/startup-report")
+async def startup_report():
+    """Durée de démarrage et coût des modules différés déjà chargés."""
+    return {
+        "duree_demarrage_s": getattr(app.state, "duree_demarrage_s", None),
+        "prechargement": os.getenv("PRECHARGEMENT") == "1",
+        "modules_differes": {nom: {"charge": nom in TEMPS_CHARGEMENT, "temps_s": TEMPS_CHARGEMENT.get(nom)} for nom in ("numpy", "dessin_pdf", "google.generativeai")},
+    }
+
 @app.post("/api/process-data")
 async def process_data(data: ProjectData):
-    final_morceaux = []
-    dims_map = {"poteau": get_deduction_dimension(data.poteau_dims), "liaison": get_deduction_dimension(data.liaison_dims), "rien": 0}
-    barreau_epaisseur_deduction = get_deduction_dimension(data.barreau_dims)
     try:
-        for i, morceau_data in enumerate(data.morceaux):
-            sections_details = []
-            structure_items = [item for item in morceau_data.structure if item.type != 'rien']
-            section_indices = [idx for idx, item in enumerate(structure_items) if item.type == 'section']
-            for sec_idx in section_indices:
-                longueur_section = structure_items[sec_idx].longueur
-                jonction_gauche = structure_items[sec_idx - 1]
-                jonction_droite = structure_items[sec_idx + 1]
-                is_extremite_gauche = (sec_idx == 1)
-                is_extremite_droite = (sec_idx == len(structure_items) - 2)
-                deduction_gauche = dims_map.get(jonction_gauche.type, 0) / (1 if is_extremite_gauche else 2)
-                deduction_droite = dims_map.get(jonction_droite.type, 0) / (1 if is_extremite_droite else 2)
-                longueur_libre = longueur_section - deduction_gauche - deduction_droite
-                repartition = RepartitionResult(nombre_barreaux=0, vide_entre_barreaux_mm=0, jeu_depart_mm=0)
-                if data.remplissage_type == 'barreaudage_vertical':
-                    repartition = calculate_repartition(longueur_libre, barreau_epaisseur_deduction, data.ecart_barreaux)
-                sections_details.append(SectionPlan(longueur_section=longueur_section, longueur_libre=longueur_libre, **repartition.model_dump()))
-            final_morceaux.append(MorceauPlan(id=i, longueur_totale=sum(s.longueur for s in morceau_data.structure if s.type == 'section' and s.longueur is not None), structure=morceau_data.structure, sections_details=sections_details))
-        
-        nomenclature = []
-        total_poteaux, total_liaisons = 0, 0
-        for m in data.morceaux:
-            for s_item in m.structure:
-                if s_item.type == 'poteau': total_poteaux +=1
-                elif s_item.type == 'liaison': total_liaisons +=1
-        if total_poteaux > 0: nomenclature.append(NomenclatureItem(item="Poteaux", details=data.poteau_dims, quantite=total_poteaux, longueur_unitaire_mm=data.hauteur_totale))
-        if total_liaisons > 0: nomenclature.append(NomenclatureItem(item="Liaisons", details=data.liaison_dims, quantite=total_liaisons, longueur_unitaire_mm=data.hauteur_totale))
-        total_longueur_lisses = sum(s.longueur_libre for m in final_morceaux for s in m.sections_details)
-        if total_longueur_lisses > 0:
-            nomenclature.append(NomenclatureItem(item="Lisse Haute", details=data.lissehaute_dims, quantite=1, longueur_unitaire_mm=round(total_longueur_lisses)))
-            nomenclature.append(NomenclatureItem(item="Lisse Basse", details=data.lissebasse_dims, quantite=1, longueur_unitaire_mm=round(total_longueur_lisses)))
-        
-        remplissage_details = None
-        if data.remplissage_type == 'barreaudage_vertical':
-            total_barreaux = sum(s.nombre_barreaux for m in final_morceaux for s in m.sections_details)
-            if total_barreaux > 0:
-                epaisseur_lisse_haute = get_thickness_dimension(data.lissehaute_dims)
-                epaisseur_lisse_basse = get_thickness_dimension(data.lissebasse_dims)
-                longueur_unitaire_barreau = data.hauteur_totale - data.hauteur_lisse_basse - epaisseur_lisse_haute - epaisseur_lisse_basse
-                nomenclature.append(NomenclatureItem(item="Barreaux", details=data.barreau_dims, quantite=total_barreaux, longueur_unitaire_mm=round(longueur_unitaire_barreau)))
-        elif data.remplissage_type == 'barreaudage_horizontal':
-            hauteur_disponible = data.hauteur_totale - data.hauteur_lisse_basse - get_thickness_dimension(data.lissehaute_dims) - get_thickness_dimension(data.lissebasse_dims)
-            epaisseur_barreau_horizontal = get_thickness_dimension(data.barreau_dims)
-            remplissage_details = calculate_repartition(hauteur_disponible, epaisseur_barreau_horizontal, data.ecart_barreaux)
-            barreaux_par_longueur = {}
-            for m in final_morceaux:
-                for s in m.sections_details:
-                    longueur = round(s.longueur_libre)
-                    if longueur > 0: barreaux_par_longueur[longueur] = barreaux_par_longueur.get(longueur, 0) + 1
-            if remplissage_details and remplissage_details.nombre_barreaux > 0:
-                for longueur, nb_sections in barreaux_par_longueur.items():
-                    nomenclature.append(NomenclatureItem(item=f"Barreaux L={longueur}mm", details=data.barreau_dims, quantite=remplissage_details.nombre_barreaux * nb_sections, longueur_unitaire_mm=longueur))
-        
-        platine_details = None
-        if data.type_fixation == 'platine' and data.platine_dimensions and data.platine_trous and data.platine_entraxes:
-            full_platine_string = f"{data.platine_dimensions} / Trous:{data.platine_trous} / Entraxes:{data.platine_entraxes}"
-            platine_details = parse_platine_data(full_platine_string)
-        
-        final_data = FinalPlanData(description_projet=f"Garde-corps détaillé en {data.nombre_morceaux} morceau(x).", nomenclature=nomenclature, morceaux=final_morceaux, hauteur_totale=data.hauteur_totale, hauteur_lisse_basse=data.hauteur_lisse_basse, poteau_dims=data.poteau_dims, liaison_dims=data.liaison_dims, lissehaute_dims=data.lissehaute_dims, lissebasse_dims=data.lissebasse_dims, barreau_dims=data.barreau_dims, platine_details=platine_details, remplissage_type=data.remplissage_type, remplissage_details=remplissage_details)
-        return {"status": "success", "data": final_data.model_dump()}
+        plan = calculer_plan(data).en_dict()
+        plan_id = stock_plans.ajouter(plan)
+        return {"status": "success", "plan_id": plan_id, "data": plan}
     except Exception as e:
         import traceback
         traceback.print_exc()
         error_detail = f"Erreur inattendue: {str(e)}"
         raise HTTPException(status_code=500, detail=error_detail)
 
+@app.post("/api/preview")
+def preview_plan(data: ProjectData, format_apercu: str = Query("svg", alias="format", pattern="^(svg|json)$"), accept_encoding: Optional[str] = Header(None)):
+    """Aperçu léger du plan (SVG ou liste d'affichage JSON), à appeler à chaque modification du formulaire."""
+    try:
+        plan = calculer_plan(data).en_dict()
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Projet incomplet : {str(e)}")
+    affichage = affichage_plan(plan)
+    if format_apercu == "json":
+        contenu, media_type = json.dumps(affichage.en_dict(), separators=(",", ":")).encode(), "application/json"
+    else:
+        contenu, media_type = apercu_svg(affichage).encode(), "image/svg+xml"
+    headers = {"Vary": "Accept-Encoding"}
+    compresse = compresser_si_accepte(contenu, accept_encoding)
+    if compresse is not None:
+        contenu, headers["Content-Encoding"] = compresse, "gzip"
+    return Response(content=contenu, media_type=media_type, headers=headers)
+
+@app.post("/api/sessions")
+def create_session(data: ProjectData):
+    """Ouvre une session d'édition : le plan est calculé une fois, puis modifié par PATCH."""
+    try:
+        session = SessionPlan(data)
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Projet incomplet : {str(e)}")
+    plan = session.en_dict()
+    return {"status": "success", "session_id": stock_sessions.ajouter(session), "version": session.version, "plan_id": stock_plans.ajouter(plan), "data": plan}
+
+def obtenir_session(session_id: str) -> SessionPlan:
+    session = stock_sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session inconnue ou expirée.")
+    return session
+
+@app.patch("/api/sessions/{session_id}")
+def patch_session(session_id: str, data: ModificationSession):
+    """Modifie une section ou l'écart entre barreaux ; renvoie le diff (JSON Patch) du plan."""
+    session = obtenir_session(session_id)
+    with session.verrou:
+        if data.version is not None and data.version != session.version:
+            raise HTTPException(status_code=409, detail=f"La session est à la version {session.version}, rechargez le plan.")
+        try:
+            diff = session.appliquer([p.model_dump(exclude_none=True) for p in data.patches])
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        return {"status": "success", "version": session.version, "diff": diff}
+
+@app.get("/api/sessions/{session_id}")
+def read_session(session_id: str):
+    session = obtenir_session(session_id)
+    with session.verrou:
+        return {"status": "success", "version": session.version, "data": session.en_dict()}
+
+@app.get("/api/sessions/{session_id}/pdf")
+async def draw_session_pdf(session_id: str, if_none_match: Optional[str] = Header(None)):
+    session = obtenir_session(session_id)
+    with session.verrou:
+        plan = session.en_dict()
+    return await rendre_plan_pdf(plan, if_none_match)
+
+# Nombre maximal de projets par appel à /api/process-batch
+MAX_PROJETS_BATCH = 200
+
+@app.post("/api/process-batch")
+def process_batch(projets: List[Dict[str, Any]], stocker: bool = False):
+    """Calcule plusieurs projets en un seul appel ; un projet en erreur n'interrompt pas les autres.
+
+    Les plans ne sont conservés (`plan_id`) que sur demande (`?stocker=true`) : le stock est
+    partagé entre clients et borné, un gros lot en évincerait les plans des autres.
+    """
+    if len(projets) > MAX_PROJETS_BATCH:
+        raise HTTPException(status_code=413, detail=f"{len(projets)} projets envoyés (maximum {MAX_PROJETS_BATCH}).")
+    resultats, nomenclatures = [], []
+    for index, projet in enumerate(projets):
+        try:
+            final_data = calculer_plan(ProjectData.model_validate(projet))
+        except ValidationError as e:
+            resultats.append({"index": index, "status": "error", "detail": e.errors(include_url=False, include_context=False)})
+            continue
+        except Exception as e:
+            resultats.append({"index": index, "status": "error", "detail": f"Erreur inattendue: {str(e)}"})
+            continue
+        plan = final_data.en_dict()
+        nomenclatures.append(final_data.nomenclature)
+        resultat = {"index": index, "status": "success", "data": plan}
+        if stocker:
+            resultat["plan_id"] = stock_plans.ajouter(plan)
+        resultats.append(resultat)
+    nomenclature_globale = [n.en_dict() for n in fusionner_nomenclatures(nomenclatures)]
+    nombre_erreurs = sum(1 for r in resultats if r["status"] == "error")
+    return {"status": "success" if nombre_erreurs == 0 else "partial", "nombre_erreurs": nombre_erreurs, "nomenclature_globale": nomenclature_globale, "resultats": resultats}
+
+@app.post("/api/sweep")
+def sweep_project(data: SweepData):
+    """Évalue un projet sur le produit cartésien des paramètres fournis."""
+    try:
+        variantes = calculer_sweep(data)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur inattendue: {str(e)}")
+    return {"status": "success", "nombre_variantes": len(variantes), "variantes": variantes}
+
+def resoudre_plan(plan: Optional[FinalPlanData], plan_id: Optional[str]) -> Dict[str, Any]:
+    """Plan envoyé en entier, ou retrouvé par son identifiant."""
+    if plan is not None:
+        return plan.model_dump()
+    if plan_id:
+        stocke = stock_plans.get(plan_id)
+        if stocke is None:
+            raise HTTPException(status_code=404, detail="Plan inconnu ou expiré.")
+        return stocke
+    raise HTTPException(status_code=400, detail="Fournir un plan ou un plan_id.")
+
+@app.post("/api/cut-list")
+def cut_list(data: CutListData):
+    """Plan de débit de la nomenclature dans des barres du commerce, trait de scie compris."""
+    plan = resoudre_plan(data.plan, data.plan_id)
+    try:
+        debit = optimiser_decoupe(pieces_depuis_plan(plan), data.longueur_barre_mm, data.trait_de_scie_mm, data.mode, data.temps_max_s)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"status": "success", "data": debit}
+
+@app.post("/api/export-dxf")
+def export_dxf(data: ExportDxfData):
+    """Élévations des morceaux et platine en DXF (R12, mm), pour la découpe et le perçage."""
+    plan = resoudre_plan(data.plan, data.plan_id)
+    try:
+        affichage = affichage_plan(plan)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la préparation du DXF: {str(e)}")
+    return StreamingResponse(flux_dxf(affichage), media_type="application/dxf", headers={"Content-Disposition": 'attachment; filename="plan_garde_corps.dxf"'})
+
 @app.post("/api/draw-pdf")
-async def draw_pdf_plan(data: FinalPlanData):
+async def draw_pdf_plan(data: FinalPlanData, if_none_match: Optional[str] = Header(None)):
+    return await rendre_plan_pdf(data.model_dump(), if_none_match)
+
+@app.get("/api/plans/{plan_id}/pdf")
+async def draw_stored_plan_pdf(plan_id: str, if_none_match: Optional[str] = Header(None)):
+    plan = stock_plans.get(plan_id)
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Plan inconnu ou expiré.")
+    return await rendre_plan_pdf(plan, if_none_match)
+
+async def rendre_plan_pdf(plan: Dict[str, Any], if_none_match: Optional[str] = None) -> Response:
+    cle = cle_plan(plan)
+    headers = {"ETag": f'"{cle}"', "Cache-Control": "private, no-cache"}
+    if etag_correspond(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
     try:
-        filepath = creer_plan_pdf(data.model_dump())
-        if filepath:
-            return FileResponse(path=filepath, media_type='application/pdf', filename='plan_garde_corps.pdf')
-        else:
-            raise HTTPException(status_code=500, detail="La création du PDF a échoué.")
+        pdf_bytes = await obtenir_pdf(plan, cle)
+        headers["Content-Disposition"] = 'attachment; filename="plan_garde_corps.pdf"'
+        return Response(content=pdf_bytes, media_type='application/pdf', headers=headers)
+    except PoolSatureError:
+        raise HTTPException(status_code=503, detail="Trop de plans en cours de génération, réessayez dans quelques instants.", headers={"Retry-After": str(pool_rendu.retry_after)})
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors du dessin: {str(e)}")
 
+async def obtenir_pdf(plan: Dict[str, Any], cle: Optional[str] = None, reservation: Optional[Reservation] = None) -> bytes:
+    """PDF du plan, depuis le cache ou rendu par le pool (dans les places de `reservation` si fournie)."""
+    cle = cle or cle_plan(plan)
+    pdf_bytes = cache_pdf.get(cle)
+    if pdf_bytes is None:
+        pdf_bytes = await (reservation or pool_rendu).executer(dessin_pdf.creer_plan_pdf, plan)
+        if not pdf_bytes:
+            raise HTTPException(status_code=500, detail="La création du PDF a échoué.")
+        cache_pdf.put(cle, pdf_bytes)
+    mesures.TAILLE_PDF.observer(len(pdf_bytes))
+    return pdf_bytes
+
+# --- RENDUS EN ARRIÈRE-PLAN ---
+# Pour les très grands plans : la requête rend tout de suite un identifiant, le client suit
+# la progression puis télécharge le PDF, sans garder de connexion ouverte pendant le rendu.
+
+def rendre_travail(plan: Dict[str, Any], cle: str, progression) -> bytes:
+    # Servi depuis le cache, le travail finit sans progression (pages_total reste nul).
+    # Sinon le rendu passe par pool_rendu, comme /api/draw-pdf, et compte dans sa limite.
+    pdf_bytes = cache_pdf.get(cle)
+    if pdf_bytes is None:
+        pdf_bytes = pool_rendu.executer_bloquant(dessin_pdf.creer_plan_pdf, plan, progression=progression)
+        if not pdf_bytes:
+            raise RuntimeError("La création du PDF a échoué.")
+        cache_pdf.put(cle, pdf_bytes)
+    return pdf_bytes
+
+def obtenir_travail(job_id: str):
+    travail = travaux_rendu.get(job_id)
+    if travail is None:
+        raise HTTPException(status_code=404, detail="Rendu inconnu ou expiré.")
+    return travail
+
+@app.post("/api/jobs", status_code=202)
+def submit_job(data: TravailRenduData):
+    """Lance le rendu PDF d'un plan en arrière-plan ; suivre /api/jobs/{job_id}."""
+    plan = resoudre_plan(data.plan, data.plan_id)
+    try:
+        travail = travaux_rendu.soumettre(functools.partial(rendre_travail, plan, cle_plan(plan)))
+    except TravauxSaturesError:
+        raise HTTPException(status_code=503, detail="Trop de rendus en attente, réessayez dans quelques instants.", headers={"Retry-After": str(pool_rendu.retry_after)})
+    return travail.en_dict()
+
+@app.get("/api/jobs/{job_id}")
+def read_job(job_id: str):
+    """État et progression (pages dessinées sur le total) d'un rendu."""
+    return obtenir_travail(job_id).en_dict()
+
+@app.get("/api/jobs/{job_id}/pdf")
+def download_job(job_id: str):
+    travail = obtenir_travail(job_id)
+    if travail.etat != TERMINE:
+        raise HTTPException(status_code=409, detail=f"Rendu non disponible (état : {travail.etat}).")
+    mesures.TAILLE_PDF.observer(len(travail.resultat))
+    return Response(content=travail.resultat, media_type='application/pdf', headers={"Content-Disposition": 'attachment; filename="plan_garde_corps.pdf"'})
+
+@app.delete("/api/jobs/{job_id}")
+def cancel_job(job_id: str):
+    """Annule un rendu en attente ou en cours (arrêt à la page suivante) ; un rendu fini est supprimé."""
+    travail = travaux_rendu.annuler(job_id)
+    if travail is None:
+        raise HTTPException(status_code=404, detail="Rendu inconnu ou expiré.")
+    return travail.en_dict()
+
+@app.post("/api/draw-pdf-zip")
+async def draw_pdf_zip(data: ExportZipData):
+    """Rend plusieurs plans en parallèle et les renvoie dans une archive ZIP, au fil de l'eau."""
+    plans = [p.model_dump() for p in data.plans]
+    for plan_id in data.plan_ids:
+        plan = stock_plans.get(plan_id)
+        if plan is None:
+            raise HTTPException(status_code=404, detail=f"Plan inconnu ou expiré : {plan_id}.")
+        plans.append(plan)
+    if not plans:
+        raise HTTPException(status_code=400, detail="Aucun plan à exporter.")
+    # L'archive retient d'emblée ses places dans le pool (une par worker au plus) et ne rend jamais plus de
+    # plans à la fois : une fois l'envoi commencé, aucun rendu n'est refusé, et les autres requêtes voient
+    # le pool saturé au lieu d'être doublées par l'export.
+    try:
+        reservation = pool_rendu.reserver(min(pool_rendu.workers, len(plans)))
+    except PoolSatureError:
+        raise HTTPException(status_code=503, detail="Trop de plans en cours de génération, réessayez dans quelques instants.", headers={"Retry-After": str(pool_rendu.retry_after)})
+    elements = [(f"plan_garde_corps_{i + 1:03d}.pdf", plan) for i, plan in enumerate(plans)]
+    flux = flux_zip(elements, lambda plan: obtenir_pdf(plan, reservation=reservation), fenetre=reservation.places)
+    return StreamingResponse(liberer_apres(flux, reservation), media_type="application/zip", headers={"Content-Disposition": 'attachment; filename="plans_garde_corps.zip"'})
+
+async def liberer_apres(flux, reservation: Reservation):
+    """Relaie le flux de l'archive, puis rend les places retenues, y compris si le client se déconnecte."""
+    try:
+        async for morceau in flux:
+            yield morceau
+    finally:
+        reservation.liberer()
+
 # --- SERVIR LE FRONTEND ---
 app.mount("/static", StaticFiles(directory="frontend"), name="static")
 
@@ -0,0 +1,211 @@
+# mesures.py
+
+import bisect
+import contextvars
+import functools
+import inspect
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# MESURES=0 désactive tout : `etape()` rend alors un objet vide et aucune série n'est alimentée.
+ACTIVES = os.getenv("MESURES", "1") != "0"
+
+
+# --- CHRONOMÉTRAGE DES ÉTAPES D'UNE REQUÊTE ---
+
+class Chronos:
+    """Durées cumulées des étapes d'une requête, exposées dans l'en-tête Server-Timing."""
+
+    __slots__ = ("durees", "debut_route", "fin_appel")
+
+    def __init__(self):
+        self.durees: Dict[str, float] = {}
+        self.debut_route: Optional[float] = None
+        self.fin_appel: Optional[float] = None
+
+    def ajouter(self, nom: str, duree: float):
+        self.durees[nom] = self.durees.get(nom, 0.0) + duree
+
+    def server_timing(self, total: float) -> str:
+        return ", ".join(f"{nom};dur={duree * 1000:.2f}" for nom, duree in [*self.durees.items(), ("total", total)])
+
+
+_chronos: contextvars.ContextVar[Optional[Chronos]] = contextvars.ContextVar("chronos", default=None)
+
+
+def demarrer_requete() -> Tuple[Chronos, contextvars.Token]:
+    chronos = Chronos()
+    return chronos, _chronos.set(chronos)
+
+
+def terminer_requete(jeton: contextvars.Token):
+    _chronos.reset(jeton)
+
+
+def chronos_courant() -> Optional[Chronos]:
+    return _chronos.get()
+
+
+class _Rien:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_RIEN = _Rien()
+
+
+class _Etape:
+    __slots__ = ("nom", "chronos", "debut")
+
+    def __init__(self, nom: str, chronos: Optional[Chronos]):
+        self.nom, self.chronos = nom, chronos
+
+    def __enter__(self):
+        self.debut = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        duree = time.perf_counter() - self.debut
+        if self.chronos is not None:
+            self.chronos.ajouter(self.nom, duree)
+        ETAPES.observer(duree, etape=self.nom)
+        return False
+
+
+def chronometrer_appel(fonction):
+    """Enveloppe une fonction de route : le temps écoulé depuis `Chronos.debut_route` devient l'étape « validation »
+    (lecture du corps, validation pydantic, dépendances), et la fin de l'appel est notée pour la sérialisation."""
+    def debut():
+        chronos = _chronos.get()
+        if chronos is not None and chronos.debut_route is not None:
+            chronos.ajouter("validation", time.perf_counter() - chronos.debut_route)
+        return chronos
+
+    def fin(chronos):
+        if chronos is not None:
+            chronos.fin_appel = time.perf_counter()
+
+    if inspect.iscoroutinefunction(fonction):
+        @functools.wraps(fonction)
+        async def appel(*args, **kwargs):
+            chronos = debut()
+            try:
+                return await fonction(*args, **kwargs)
+            finally:
+                fin(chronos)
+    else:
+        @functools.wraps(fonction)
+        def appel(*args, **kwargs):
+            chronos = debut()
+            try:
+                return fonction(*args, **kwargs)
+            finally:
+                fin(chronos)
+    return appel
+
+
+def etape(nom: str):
+    """`with etape("calcul"):` chronomètre un bloc pour la requête en cours et l'histogramme des étapes."""
+    if not ACTIVES:
+        return _RIEN
+    return _Etape(nom, _chronos.get())
+
+
+# --- SÉRIES AU FORMAT PROMETHEUS ---
+# Format texte 0.0.4, sans dépendance. Chaque worker uvicorn a ses propres séries.
+
+def _echapper(valeur: str) -> str:
+    return str(valeur).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquettes(noms: Sequence[str], valeurs: Sequence[str], le: Optional[str] = None) -> str:
+    paires = [f'{nom}="{_echapper(valeur)}"' for nom, valeur in zip(noms, valeurs)]
+    if le is not None:
+        paires.append(f'le="{le}"')
+    return "{" + ",".join(paires) + "}" if paires else ""
+
+
+def _nombre(valeur: float) -> str:
+    return "+Inf" if valeur == float("inf") else repr(float(valeur))
+
+
+class Compteur:
+    def __init__(self, nom: str, aide: str, etiquettes: Sequence[str] = ()):
+        self.nom, self.aide, self.etiquettes = nom, aide, tuple(etiquettes)
+        self._valeurs: Dict[tuple, float] = {}
+        self._verrou = threading.Lock()
+        REGISTRE.append(self)
+
+    def incrementer(self, valeur: float = 1, **etiquettes):
+        if not ACTIVES:
+            return
+        cle = tuple(etiquettes[e] for e in self.etiquettes)
+        with self._verrou:
+            self._valeurs[cle] = self._valeurs.get(cle, 0) + valeur
+
+    def exposer(self) -> List[str]:
+        lignes = [f"# HELP {self.nom} {self.aide}", f"# TYPE {self.nom} counter"]
+        with self._verrou:
+            lignes += [f"{self.nom}{_etiquettes(self.etiquettes, cle)} {v}" for cle, v in self._valeurs.items()]
+        return lignes
+
+
+class Histogramme:
+    def __init__(self, nom: str, aide: str, bornes: Sequence[float], etiquettes: Sequence[str] = ()):
+        self.nom, self.aide, self.etiquettes = nom, aide, tuple(etiquettes)
+        self.bornes = sorted(bornes)
+        # Par série : effectifs par tranche (la dernière au-delà de la plus grande borne), somme, nombre.
+        self._series: Dict[tuple, list] = {}
+        self._verrou = threading.Lock()
+        REGISTRE.append(self)
+
+    def observer(self, valeur: float, **etiquettes):
+        if not ACTIVES:
+            return
+        cle = tuple(etiquettes[e] for e in self.etiquettes)
+        with self._verrou:
+            serie = self._series.get(cle)
+            if serie is None:
+                serie = self._series[cle] = [[0] * (len(self.bornes) + 1), 0.0, 0]
+            serie[0][bisect.bisect_left(self.bornes, valeur)] += 1
+            serie[1] += valeur
+            serie[2] += 1
+
+    def exposer(self) -> List[str]:
+        lignes = [f"# HELP {self.nom} {self.aide}", f"# TYPE {self.nom} histogram"]
+        with self._verrou:
+            for cle, (effectifs, somme, nombre) in self._series.items():
+                cumul = 0
+                for borne, effectif in zip([*self.bornes, float("inf")], effectifs):
+                    cumul += effectif
+                    lignes.append(f"{self.nom}_bucket{_etiquettes(self.etiquettes, cle, _nombre(borne))} {cumul}")
+                lignes.append(f"{self.nom}_sum{_etiquettes(self.etiquettes, cle)} {_nombre(somme)}")
+                lignes.append(f"{self.nom}_count{_etiquettes(self.etiquettes, cle)} {nombre}")
+        return lignes
+
+
+REGISTRE: list = []
+
+BORNES_SECONDES = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BORNES_NOMBRE = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000)
+
+REQUETES = Histogramme("garde_corps_requete_duree_secondes", "Durée des requêtes HTTP.", BORNES_SECONDES, ("route", "methode"))
+REPONSES = Compteur("garde_corps_requetes_total", "Requêtes HTTP par statut.", ("route", "methode", "statut"))
+ETAPES = Histogramme("garde_corps_etape_duree_secondes", "Durée des étapes internes (validation, calcul, pages, pdf_output...).", BORNES_SECONDES, ("etape",))
+TAILLE_PDF = Histogramme("garde_corps_pdf_taille_octets", "Taille des PDF servis.", (10_000, 25_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 2_500_000, 5_000_000))
+SECTIONS_PLAN = Histogramme("garde_corps_plan_sections", "Nombre de sections par plan calculé.", BORNES_NOMBRE)
+BARREAUX_PLAN = Histogramme("garde_corps_plan_barreaux", "Nombre de barreaux par plan calculé.", BORNES_NOMBRE)
+GEMINI = Histogramme("garde_corps_gemini_duree_secondes", "Durée des appels au modèle Gemini.", BORNES_SECONDES)
+ERREURS_GEMINI = Compteur("garde_corps_gemini_erreurs_total", "Appels au modèle Gemini en échec, par cause.", ("cause",))
+
+
+def exposition() -> str:
+    """Toutes les séries, au format texte de Prometheus."""
+    return "\n".join(ligne for serie in REGISTRE for ligne in serie.exposer()) + "\n"
@@ -0,0 +1,412 @@
+# moteur.py
+
+import copy
+import itertools
+import math
+import re
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import mesures
+from chargement import ModuleDiffere
+from profils import get_deduction_dimension, get_thickness_dimension
+
+# --- MODULES LOURDS, IMPORTÉS AU PREMIER USAGE ---
+np = ModuleDiffere("numpy")
+
+# --- MODÈLE INTERNE DU PLAN ---
+# Le calcul manipule des dataclasses à `__slots__`, sans validation : pydantic n'intervient
+# qu'à la frontière HTTP (lecture du projet, plans renvoyés par le client). `en_dict()`
+# produit exactement le JSON des modèles pydantic de main.py (mêmes clés, même ordre, mêmes types).
+
+@dataclass(slots=True)
+class Repartition:
+    nombre_barreaux: int
+    vide_entre_barreaux_mm: float
+    jeu_depart_mm: float
+
+    def en_dict(self) -> Dict[str, Any]:
+        return {"nombre_barreaux": self.nombre_barreaux, "vide_entre_barreaux_mm": float(self.vide_entre_barreaux_mm), "jeu_depart_mm": float(self.jeu_depart_mm)}
+
+@dataclass(slots=True)
+class Section:
+    longueur_section: float
+    longueur_libre: float
+    nombre_barreaux: int
+    vide_entre_barreaux_mm: float
+    jeu_depart_mm: float
+
+    def en_dict(self) -> Dict[str, Any]:
+        return {"longueur_section": float(self.longueur_section), "longueur_libre": float(self.longueur_libre), "nombre_barreaux": self.nombre_barreaux,
+                "vide_entre_barreaux_mm": float(self.vide_entre_barreaux_mm), "jeu_depart_mm": float(self.jeu_depart_mm)}
+
+@dataclass(slots=True)
+class Morceau:
+    id: int
+    longueur_totale: float
+    structure: List[Tuple[str, Optional[int]]]
+    sections_details: List[Section]
+
+    def en_dict(self) -> Dict[str, Any]:
+        return {"id": self.id, "longueur_totale": float(self.longueur_totale), "structure": [{"type": t, "longueur": l} for t, l in self.structure],
+                "sections_details": [s.en_dict() for s in self.sections_details]}
+
+@dataclass(slots=True)
+class LigneNomenclature:
+    item: str
+    details: str
+    quantite: int
+    longueur_unitaire_mm: int
+
+    def en_dict(self) -> Dict[str, Any]:
+        return {"item": self.item, "details": self.details, "quantite": self.quantite, "longueur_unitaire_mm": self.longueur_unitaire_mm}
+
+@dataclass(slots=True)
+class Platine:
+    longueur: float
+    largeur: float
+    epaisseur: float
+    nombre_trous: int
+    diametre_trous: float
+    entraxe_longueur: float
+    entraxe_largeur: float
+
+    def en_dict(self) -> Dict[str, Any]:
+        return {"longueur": self.longueur, "largeur": self.largeur, "epaisseur": self.epaisseur, "nombre_trous": self.nombre_trous,
+                "diametre_trous": self.diametre_trous, "entraxe_longueur": self.entraxe_longueur, "entraxe_largeur": self.entraxe_largeur}
+
+@dataclass(slots=True)
+class Dimensions:
+    """Paramètres du projet dont dépend la nomenclature ; `replace()` en donne une variante sans revalidation."""
+    hauteur_totale: int
+    hauteur_lisse_basse: int
+    poteau_dims: str
+    liaison_dims: str
+    lissehaute_dims: str
+    lissebasse_dims: str
+    barreau_dims: str
+    ecart_barreaux: int
+    remplissage_type: str
+
+    @staticmethod
+    def depuis_projet(data) -> "Dimensions":
+        return Dimensions(data.hauteur_totale, data.hauteur_lisse_basse, data.poteau_dims, data.liaison_dims, data.lissehaute_dims,
+                          data.lissebasse_dims, data.barreau_dims, data.ecart_barreaux, data.remplissage_type)
+
+@dataclass(slots=True)
+class Plan:
+    description_projet: str
+    nomenclature: List[LigneNomenclature]
+    morceaux: List[Morceau]
+    hauteur_totale: int
+    hauteur_lisse_basse: int
+    poteau_dims: str
+    liaison_dims: str
+    lissehaute_dims: str
+    lissebasse_dims: str
+    barreau_dims: str
+    platine_details: Optional[Platine]
+    remplissage_type: str
+    remplissage_details: Optional[Repartition]
+    groupes_morceaux: List[List[int]]
+
+    def en_dict(self) -> Dict[str, Any]:
+        return {
+            "description_projet": self.description_projet,
+            "nomenclature": [n.en_dict() for n in self.nomenclature],
+            "morceaux": [m.en_dict() for m in self.morceaux],
+            "hauteur_totale": self.hauteur_totale, "hauteur_lisse_basse": self.hauteur_lisse_basse,
+            "poteau_dims": self.poteau_dims, "liaison_dims": self.liaison_dims,
+            "lissehaute_dims": self.lissehaute_dims, "lissebasse_dims": self.lissebasse_dims, "barreau_dims": self.barreau_dims,
+            "platine_details": self.platine_details.en_dict() if self.platine_details else None,
+            "remplissage_type": self.remplissage_type,
+            "remplissage_details": self.remplissage_details.en_dict() if self.remplissage_details else None,
+            "groupes_morceaux": [list(g) for g in self.groupes_morceaux],
+        }
+
+# --- CALCULS ---
+
+def repartition(longueur_libre: float, epaisseur_barreau: float, ecart_maximal: float) -> Repartition:
+    if longueur_libre <= 0 or epaisseur_barreau <= 0 or ecart_maximal <= 0:
+        return Repartition(nombre_barreaux=0, vide_entre_barreaux_mm=0, jeu_depart_mm=longueur_libre)
+    nombre_blocs = longueur_libre / (epaisseur_barreau + ecart_maximal)
+    nombre_barreaux = math.ceil(nombre_blocs - 1)
+    if nombre_barreaux < 0: nombre_barreaux = 0
+    nombre_espaces = nombre_barreaux + 1
+    longueur_totale_barreaux = nombre_barreaux * epaisseur_barreau
+    espacement_reel = (longueur_libre - longueur_totale_barreaux) / nombre_espaces
+    if espacement_reel > (ecart_maximal + 1e-9):
+        nombre_barreaux += 1
+        nombre_espaces = nombre_barreaux + 1
+        longueur_totale_barreaux = nombre_barreaux * epaisseur_barreau
+        espacement_reel = (longueur_libre - longueur_totale_barreaux) / nombre_espaces
+    if nombre_barreaux <= 0:
+        return Repartition(nombre_barreaux=0, vide_entre_barreaux_mm=0, jeu_depart_mm=longueur_libre)
+    return Repartition(nombre_barreaux=nombre_barreaux, vide_entre_barreaux_mm=espacement_reel, jeu_depart_mm=espacement_reel)
+
+def repartition_batch(longueurs_libres, epaisseur_barreau, ecart_maximal):
+    """Version vectorisée de `repartition` sur un tableau de sections.
+
+    Les trois arguments sont des tableaux (ou scalaires) diffusables entre eux. Retourne
+    `(nombre_barreaux, vide_entre_barreaux_mm, jeu_depart_mm)` sous forme de tableaux NumPy,
+    identiques valeur par valeur aux résultats de la fonction scalaire.
+    """
+    longueur_libre, epaisseur, ecart = np.broadcast_arrays(
+        np.asarray(longueurs_libres, dtype=np.float64),
+        np.asarray(epaisseur_barreau, dtype=np.float64),
+        np.asarray(ecart_maximal, dtype=np.float64),
+    )
+    invalide = (longueur_libre <= 0) | (epaisseur <= 0) | (ecart <= 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        nombre_barreaux = np.maximum(np.ceil(longueur_libre / (epaisseur + ecart) - 1), 0)
+        espacement_reel = (longueur_libre - nombre_barreaux * epaisseur) / (nombre_barreaux + 1)
+        trop_large = espacement_reel > (ecart + 1e-9)
+        nombre_barreaux = np.where(trop_large, nombre_barreaux + 1, nombre_barreaux)
+        espacement_reel = np.where(trop_large, (longueur_libre - nombre_barreaux * epaisseur) / (nombre_barreaux + 1), espacement_reel)
+    vide = invalide | (nombre_barreaux <= 0)
+    nombre_barreaux = np.where(vide, 0, nombre_barreaux).astype(np.int64)
+    vide_entre_barreaux = np.where(vide, 0.0, espacement_reel)
+    jeu_depart = np.where(vide, longueur_libre, espacement_reel)
+    return nombre_barreaux, vide_entre_barreaux, jeu_depart
+
+def lire_platine(platine_string: str) -> Optional[Platine]:
+    if not platine_string: return None
+    try:
+        parts = {p.split(':')[0].strip().lower(): p.split(':')[1].strip() for p in platine_string.split('/') if ':' in p}
+        dims_part = next((p.strip() for p in platine_string.split('/') if ':' not in p), "")
+        dims = [float(d) for d in re.findall(r'(\d+\.?\d*)', dims_part)]
+        trous = [float(t) for t in re.findall(r'(\d+\.?\d*)', parts.get('trous', ''))]
+        entraxes = [float(e) for e in re.findall(r'(\d+\.?\d*)', parts.get('entraxes', ''))]
+        return Platine(longueur=dims[0], largeur=dims[1], epaisseur=dims[2], nombre_trous=int(trous[0]), diametre_trous=trous[1], entraxe_longueur=entraxes[0], entraxe_largeur=entraxes[1])
+    except (IndexError, ValueError, KeyError): return None
+
+def analyser_sections(morceaux) -> List[tuple]:
+    """Parcourt la structure des morceaux et décrit chaque section.
+
+    Retourne pour chaque section `(index_morceau, longueur_section, jonction_gauche, diviseur_gauche,
+    jonction_droite, diviseur_droite)` : une jonction d'extrémité est déduite en entier de sa section,
+    une jonction intermédiaire est partagée entre ses deux voisines. Ne dépend d'aucune dimension.
+    """
+    sections = []
+    for i, morceau_data in enumerate(morceaux):
+        structure_items = [item for item in morceau_data.structure if item.type != 'rien']
+        section_indices = [idx for idx, item in enumerate(structure_items) if item.type == 'section']
+        for sec_idx in section_indices:
+            jonction_gauche = structure_items[sec_idx - 1]
+            jonction_droite = structure_items[sec_idx + 1]
+            is_extremite_gauche = (sec_idx == 1)
+            is_extremite_droite = (sec_idx == len(structure_items) - 2)
+            sections.append((i, structure_items[sec_idx].longueur, jonction_gauche.type, 1 if is_extremite_gauche else 2, jonction_droite.type, 1 if is_extremite_droite else 2))
+    return sections
+
+def calculer_longueurs_libres(sections: List[tuple], dims_map: Dict[str, float]) -> List[float]:
+    return [longueur_section - dims_map.get(jonction_gauche, 0) / diviseur_gauche - dims_map.get(jonction_droite, 0) / diviseur_droite
+            for _, longueur_section, jonction_gauche, diviseur_gauche, jonction_droite, diviseur_droite in sections]
+
+def signature_morceau(structure) -> tuple:
+    """Empreinte canonique de la structure d'un morceau (`StructureItem` ou dict) : deux morceaux de même signature ont le même plan."""
+    return tuple((item.get('type'), item.get('longueur')) if isinstance(item, dict) else (item.type, item.longueur) for item in structure)
+
+def grouper_morceaux(morceaux, identiques: bool = False) -> List[List[int]]:
+    """Indices des morceaux regroupés par structure identique, dans l'ordre de première apparition.
+
+    `identiques` (réponse « tous les morceaux sont identiques » du formulaire) n'est qu'une indication :
+    on vérifie chaque morceau contre le premier avant de tout regrouper sans passer par le dictionnaire.
+    """
+    if identiques and morceaux:
+        premiere = signature_morceau(morceaux[0].structure)
+        if all(signature_morceau(m.structure) == premiere for m in morceaux[1:]):
+            return [list(range(len(morceaux)))]
+    groupes: Dict[tuple, List[int]] = {}
+    for i, morceau in enumerate(morceaux):
+        groupes.setdefault(signature_morceau(morceau.structure), []).append(i)
+    return list(groupes.values())
+
+def compter_jonctions(morceaux) -> Tuple[int, int]:
+    total_poteaux, total_liaisons = 0, 0
+    for m in morceaux:
+        for s_item in m.structure:
+            if s_item.type == 'poteau': total_poteaux +=1
+            elif s_item.type == 'liaison': total_liaisons +=1
+    return total_poteaux, total_liaisons
+
+def grouper_longueurs(longueurs_libres: List[float]) -> Dict[int, int]:
+    """Nombre de sections par longueur libre arrondie (barreaudage horizontal)."""
+    barreaux_par_longueur = {}
+    for longueur_libre in longueurs_libres:
+        longueur = round(longueur_libre)
+        if longueur > 0: barreaux_par_longueur[longueur] = barreaux_par_longueur.get(longueur, 0) + 1
+    return barreaux_par_longueur
+
+def construire_nomenclature(dims: Dimensions, total_poteaux: int, total_liaisons: int, total_longueur_lisses: float, total_barreaux: int, barreaux_par_longueur: Dict[int, int]) -> Tuple[List[LigneNomenclature], Optional[Repartition]]:
+    nomenclature = []
+    if total_poteaux > 0: nomenclature.append(LigneNomenclature(item="Poteaux", details=dims.poteau_dims, quantite=total_poteaux, longueur_unitaire_mm=dims.hauteur_totale))
+    if total_liaisons > 0: nomenclature.append(LigneNomenclature(item="Liaisons", details=dims.liaison_dims, quantite=total_liaisons, longueur_unitaire_mm=dims.hauteur_totale))
+    if total_longueur_lisses > 0:
+        nomenclature.append(LigneNomenclature(item="Lisse Haute", details=dims.lissehaute_dims, quantite=1, longueur_unitaire_mm=round(total_longueur_lisses)))
+        nomenclature.append(LigneNomenclature(item="Lisse Basse", details=dims.lissebasse_dims, quantite=1, longueur_unitaire_mm=round(total_longueur_lisses)))
+
+    remplissage_details = None
+    if dims.remplissage_type == 'barreaudage_vertical':
+        if total_barreaux > 0:
+            epaisseur_lisse_haute = get_thickness_dimension(dims.lissehaute_dims)
+            epaisseur_lisse_basse = get_thickness_dimension(dims.lissebasse_dims)
+            longueur_unitaire_barreau = dims.hauteur_totale - dims.hauteur_lisse_basse - epaisseur_lisse_haute - epaisseur_lisse_basse
+            nomenclature.append(LigneNomenclature(item="Barreaux", details=dims.barreau_dims, quantite=total_barreaux, longueur_unitaire_mm=round(longueur_unitaire_barreau)))
+    elif dims.remplissage_type == 'barreaudage_horizontal':
+        hauteur_disponible = dims.hauteur_totale - dims.hauteur_lisse_basse - get_thickness_dimension(dims.lissehaute_dims) - get_thickness_dimension(dims.lissebasse_dims)
+        epaisseur_barreau_horizontal = get_thickness_dimension(dims.barreau_dims)
+        remplissage_details = repartition(hauteur_disponible, epaisseur_barreau_horizontal, dims.ecart_barreaux)
+        if remplissage_details and remplissage_details.nombre_barreaux > 0:
+            for longueur, nb_sections in barreaux_par_longueur.items():
+                nomenclature.append(LigneNomenclature(item=f"Barreaux L={longueur}mm", details=dims.barreau_dims, quantite=remplissage_details.nombre_barreaux * nb_sections, longueur_unitaire_mm=longueur))
+    return nomenclature, remplissage_details
+
+def calculer_plan(data) -> Plan:
+    """Calcule le plan complet (répartition, nomenclature, platine) d'un projet déjà validé (`ProjectData`).
+
+    Les morceaux de structure identique ne sont calculés qu'une fois (un représentant par groupe),
+    et la répartition une fois par longueur libre distincte : 200 balcons identiques coûtent un balcon.
+    Le calcul est chronométré (étape « calcul ») et la taille du plan alimente /metrics.
+    """
+    with mesures.etape("calcul"):
+        plan = _calculer_plan(data)
+    if mesures.ACTIVES:
+        mesures.SECTIONS_PLAN.observer(sum(len(m.sections_details) for m in plan.morceaux))
+        mesures.BARREAUX_PLAN.observer(sum(l.quantite for l in plan.nomenclature if l.item.startswith("Barreaux")))
+    return plan
+
+def _calculer_plan(data) -> Plan:
+    dims_map = {"poteau": get_deduction_dimension(data.poteau_dims), "liaison": get_deduction_dimension(data.liaison_dims), "rien": 0}
+    barreau_epaisseur_deduction = get_deduction_dimension(data.barreau_dims)
+    groupes = grouper_morceaux(data.morceaux, data.morceaux_identiques == 'oui')
+    representants = [data.morceaux[g[0]] for g in groupes]
+    sections = analyser_sections(representants)
+    longueurs_libres = calculer_longueurs_libres(sections, dims_map)
+
+    # Répartition de toutes les longueurs libres distinctes du projet en une seule passe.
+    if data.remplissage_type == 'barreaudage_vertical' and sections:
+        distinctes, inverse = np.unique(np.asarray(longueurs_libres, dtype=np.float64), return_inverse=True)
+        nombres, vides, jeux = (a[inverse].tolist() for a in repartition_batch(distinctes, barreau_epaisseur_deduction, data.ecart_barreaux))
+    else:
+        nombres, vides, jeux = [0] * len(sections), [0] * len(sections), [0] * len(sections)
+    sections_par_groupe = [[] for _ in groupes]
+    libres_par_groupe = [[] for _ in groupes]
+    for k, section in enumerate(sections):
+        sections_par_groupe[section[0]].append(Section(section[1], longueurs_libres[k], nombres[k], vides[k], jeux[k]))
+        libres_par_groupe[section[0]].append(longueurs_libres[k])
+    # Chaque morceau a ses propres listes (une session d'édition les modifie morceau par morceau) ;
+    # les sections, jamais modifiées en place, sont partagées au sein d'un groupe.
+    final_morceaux: List[Optional[Morceau]] = [None] * len(data.morceaux)
+    total_poteaux, total_liaisons, total_barreaux = 0, 0, 0
+    for g, indices in enumerate(groupes):
+        structure = [(s.type, s.longueur) for s in representants[g].structure]
+        longueur_totale = sum(l for t, l in structure if t == 'section' and l is not None)
+        for i in indices:
+            final_morceaux[i] = Morceau(i, longueur_totale, list(structure), list(sections_par_groupe[g]))
+        poteaux, liaisons = compter_jonctions([representants[g]])
+        total_poteaux += poteaux * len(indices)
+        total_liaisons += liaisons * len(indices)
+        total_barreaux += sum(s.nombre_barreaux for s in sections_par_groupe[g]) * len(indices)
+
+    dims = Dimensions.depuis_projet(data)
+    barreaux_par_longueur = {}
+    if data.remplissage_type == 'barreaudage_horizontal':
+        # Les groupes sont rangés par première apparition : l'ordre des longueurs est celui du projet complet.
+        for g, indices in enumerate(groupes):
+            for longueur, nb_sections in grouper_longueurs(libres_par_groupe[g]).items():
+                barreaux_par_longueur[longueur] = barreaux_par_longueur.get(longueur, 0) + nb_sections * len(indices)
+    # Somme dans l'ordre des morceaux, comme sur le projet développé : le total arrondi est identique.
+    groupe_de = [0] * len(data.morceaux)
+    for g, indices in enumerate(groupes):
+        for i in indices:
+            groupe_de[i] = g
+    total_longueur_lisses = sum(itertools.chain.from_iterable(libres_par_groupe[g] for g in groupe_de))
+    nomenclature, remplissage_details = construire_nomenclature(dims, total_poteaux, total_liaisons, total_longueur_lisses, total_barreaux, barreaux_par_longueur)
+
+    platine_details = None
+    if data.type_fixation == 'platine' and data.platine_dimensions and data.platine_trous and data.platine_entraxes:
+        full_platine_string = f"{data.platine_dimensions} / Trous:{data.platine_trous} / Entraxes:{data.platine_entraxes}"
+        platine_details = lire_platine(full_platine_string)
+
+    return Plan(f"Garde-corps détaillé en {data.nombre_morceaux} morceau(x).", nomenclature, final_morceaux, data.hauteur_totale, data.hauteur_lisse_basse,
+                data.poteau_dims, data.liaison_dims, data.lissehaute_dims, data.lissebasse_dims, data.barreau_dims, platine_details, data.remplissage_type, remplissage_details,
+                groupes)
+
+# Nombre maximal de variantes évaluées par /api/sweep
+MAX_VARIANTES_SWEEP = 20000
+# Taille maximale (écarts × sections) d'un bloc de répartition vectorisée du sweep
+CELLULES_BLOC_SWEEP = 1 << 18
+
+def calculer_sweep(projet, ecarts: Sequence[int], barreaux: List[str], poteaux: List[str]) -> List[Dict[str, Any]]:
+    """Évalue toutes les combinaisons de paramètres demandées sur un même projet.
+
+    Le type de fixation n'intervient pas dans la nomenclature (seulement dans le détail de
+    platine du plan) : ce n'est pas un axe du balayage, il ne ferait que dupliquer les lignes.
+
+    Le parcours de la structure et le comptage des jonctions sont faits une fois ;
+    les longueurs libres une fois par profil de poteau ; la répartition de toutes
+    les sections pour tous les écarts en calculs vectorisés par profil de barreau, par blocs
+    d'écarts bornés à `CELLULES_BLOC_SWEEP` cellules (20 000 écarts × 2 000 sections tiennent en mémoire).
+    """
+    nombre_variantes = len(ecarts) * len(barreaux) * len(poteaux)
+    if nombre_variantes > MAX_VARIANTES_SWEEP:
+        raise ValueError(f"{nombre_variantes} variantes demandées (maximum {MAX_VARIANTES_SWEEP}).")
+
+    sections = analyser_sections(projet.morceaux)
+    total_poteaux, total_liaisons = compter_jonctions(projet.morceaux)
+    liaison_deduction = get_deduction_dimension(projet.liaison_dims)
+    vertical = projet.remplissage_type == 'barreaudage_vertical'
+    dims = Dimensions.depuis_projet(projet)
+    ecarts_par_bloc = max(1, CELLULES_BLOC_SWEEP // max(1, len(sections)))
+    resultats = []
+    for poteau_dims in poteaux:
+        dims_map = {"poteau": get_deduction_dimension(poteau_dims), "liaison": liaison_deduction, "rien": 0}
+        longueurs_libres = calculer_longueurs_libres(sections, dims_map)
+        total_longueur_lisses = sum(longueurs_libres)
+        barreaux_par_longueur = grouper_longueurs(longueurs_libres) if projet.remplissage_type == 'barreaudage_horizontal' else {}
+        libres = np.asarray(longueurs_libres)[np.newaxis, :]
+        for barreau_dims in barreaux:
+            if vertical and sections:
+                deduction = get_deduction_dimension(barreau_dims)
+                totaux_barreaux = []
+                for debut in range(0, len(ecarts), ecarts_par_bloc):
+                    bloc = np.asarray(ecarts[debut:debut + ecarts_par_bloc], dtype=np.float64)[:, np.newaxis]
+                    nombres, _, _ = repartition_batch(libres, deduction, bloc)
+                    totaux_barreaux += nombres.sum(axis=1).tolist()
+            else:
+                totaux_barreaux = [0] * len(ecarts)
+            for ecart, total_barreaux in zip(ecarts, totaux_barreaux):
+                variante = replace(dims, poteau_dims=poteau_dims, barreau_dims=barreau_dims, ecart_barreaux=ecart)
+                nomenclature, _ = construire_nomenclature(variante, total_poteaux, total_liaisons, total_longueur_lisses, total_barreaux, barreaux_par_longueur)
+                lignes = [n.en_dict() for n in nomenclature]
+                resultats.append({
+                    "parametres": {"ecart_barreaux": ecart, "barreau_dims": barreau_dims, "poteau_dims": poteau_dims},
+                    "nombre_barreaux": sum(n.quantite for n in nomenclature if n.item.startswith("Barreaux")),
+                    "longueur_totale_lisses_mm": round(total_longueur_lisses) if total_longueur_lisses > 0 else 0,
+                    "nombre_pieces": sum(n.quantite for n in nomenclature),
+                    "longueur_totale_mm": sum(n.quantite * n.longueur_unitaire_mm for n in nomenclature),
+                    "nomenclature": lignes,
+                })
+    return resultats
+
+# Articles dont la nomenclature cumule une longueur totale (quantité 1) plutôt qu'un nombre de pièces.
+ARTICLES_LONGUEUR_CUMULEE = {"Lisse Haute", "Lisse Basse"}
+
+def fusionner_nomenclatures(nomenclatures: List[List[LigneNomenclature]]) -> List[LigneNomenclature]:
+    """Fusionne les nomenclatures de plusieurs projets en une seule, dans l'ordre d'apparition."""
+    fusion: Dict[tuple, LigneNomenclature] = {}
+    for nomenclature in nomenclatures:
+        for n in nomenclature:
+            if n.item in ARTICLES_LONGUEUR_CUMULEE:
+                cle = (n.item, n.details)
+                if cle in fusion:
+                    fusion[cle].longueur_unitaire_mm += n.longueur_unitaire_mm
+                    continue
+            else:
+                cle = (n.item, n.details, n.longueur_unitaire_mm)
+                if cle in fusion:
+                    fusion[cle].quantite += n.quantite
+                    continue
+            fusion[cle] = copy.copy(n)
+    return list(fusion.values())
@@ -0,0 +1,85 @@
+# profils.py
+
+import functools
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+
+class ProfilInvalideError(ValueError):
+    """Levée quand une désignation de profilé ne contient pas de dimension exploitable."""
+
+
+@dataclass(frozen=True, slots=True)
+class ProfileSpec:
+    """Dimensions d'un profilé lues depuis sa désignation ("40x20", "50x8x2", "Ø20"...).
+
+    - `largeur` : 1ère dimension, épaisseur vue en élévation pour les lisses et barreaux horizontaux ;
+    - `profondeur` : 2ème dimension (ou la 1ère s'il n'y en a qu'une) ;
+    - `epaisseur_paroi` : 3ème dimension éventuelle (tube) ;
+    - `forme` : "vide", "rond", "plat", "carre" ou "rectangulaire".
+
+    Pour un rond ("Ø42.4x2"), largeur et profondeur valent le diamètre et le 2ème nombre est
+    l'épaisseur de paroi.
+    """
+    largeur: float
+    profondeur: float
+    epaisseur_paroi: Optional[float]
+    forme: str
+
+    @property
+    def deduction(self) -> float:
+        """Dimension déduite des longueurs libres et utilisée pour le dessin.
+
+        C'est la profondeur, sauf pour un rond à paroi où les plans ont toujours pris le 2ème
+        nombre de la désignation (l'épaisseur) : conservé pour ne pas changer les plans existants.
+        """
+        if self.forme == "rond" and self.epaisseur_paroi is not None:
+            return self.epaisseur_paroi
+        return self.profondeur
+
+    @staticmethod
+    def depuis_texte(dim_string: str) -> "ProfileSpec":
+        """Version stricte : lève ProfilInvalideError pour une désignation non vide mais illisible."""
+        return _lire(dim_string or "")
+
+
+PROFIL_VIDE = ProfileSpec(largeur=0.0, profondeur=0.0, epaisseur_paroi=None, forme="vide")
+
+_NOMBRES = re.compile(r'(\d+\.?\d*)')
+_ROND = re.compile(r'ø|⌀|\brond|\bdiam', re.IGNORECASE)
+_PLAT = re.compile(r'\bplat', re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=512)
+def _lire(dim_string: str) -> ProfileSpec:
+    if not dim_string:
+        return PROFIL_VIDE
+    numbers = [float(n) for n in _NOMBRES.findall(dim_string)]
+    if not numbers:
+        raise ProfilInvalideError(f"Profilé {dim_string!r} : aucune dimension trouvée (attendu par exemple '40x40' ou '50x8x2').")
+    largeur = numbers[0]
+    if _ROND.search(dim_string):
+        return ProfileSpec(largeur=largeur, profondeur=largeur, epaisseur_paroi=numbers[1] if len(numbers) >= 2 else None, forme="rond")
+    profondeur = numbers[1] if len(numbers) >= 2 else numbers[0]
+    if _PLAT.search(dim_string):
+        forme = "plat"
+    else:
+        forme = "carre" if largeur == profondeur else "rectangulaire"
+    return ProfileSpec(largeur=largeur, profondeur=profondeur, epaisseur_paroi=numbers[2] if len(numbers) >= 3 else None, forme=forme)
+
+
+def lire_profil(dim_string: str) -> ProfileSpec:
+    """Version tolérante : une désignation illisible donne un profilé de dimensions nulles."""
+    try:
+        return _lire(dim_string or "")
+    except ProfilInvalideError:
+        return PROFIL_VIDE
+
+
+def get_deduction_dimension(dim_string: str) -> float:
+    return lire_profil(dim_string).deduction
+
+
+def get_thickness_dimension(dim_string: str) -> float:
+    return lire_profil(dim_string).largeur
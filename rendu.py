@@ -0,0 +1,248 @@
+# rendu.py
+
+import asyncio
+import concurrent.futures
+import contextvars
+import functools
+import io
+import itertools
+import multiprocessing
+import os
+import threading
+import zipfile
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class PoolSatureError(Exception):
+    """Levée quand tous les workers sont occupés et que la file d'attente est pleine."""
+
+
+class RenduInterrompu(Exception):
+    """Levée par un rappel de progression pour arrêter un rendu en cours ; `creer_plan_pdf` la laisse remonter."""
+
+
+class ProgressionRelayee:
+    """Rappel de progression transmis à un worker en mode process.
+
+    Le worker écrit (pages faites, total) dans une liste partagée par le gestionnaire du pool,
+    et y lit l'annulation demandée par le processus principal.
+    """
+
+    def __init__(self, etat):
+        self.etat = etat
+
+    def __call__(self, faites: int, total: int):
+        if self.etat[2]:
+            raise RenduInterrompu("Rendu annulé.")
+        self.etat[0:2] = [faites, total]
+
+
+# Intervalle de relève de la progression d'un rendu en mode process.
+INTERVALLE_RELAIS_S = 0.05
+
+
+class PoolRendu:
+    """Exécute les rendus (fpdf2, CPU) hors de la boucle d'événements d'uvicorn.
+
+    Le nombre de rendus acceptés en même temps est borné à `workers + file_max` :
+    au-delà, `executer` lève `PoolSatureError` au lieu d'empiler les demandes.
+    Les rendus en arrière-plan (`executer_bloquant`) passent par le même pool et comptent
+    dans cette limite, comme les places retenues par une série de rendus (`reserver`).
+
+    En mode thread (défaut, rien à démarrer), les rendus se partagent le GIL : un seul cœur
+    dessine à la fois. En mode process, chaque worker a son cœur ; c'est le mode à déployer
+    sur une machine multicœur (PDF_POOL_MODE=process, posé dans le Dockerfile).
+    """
+
+    def __init__(self, mode: str = "thread", workers: Optional[int] = None, file_max: int = 8, retry_after: int = 5):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Mode de pool inconnu : {mode!r} (attendu 'thread' ou 'process').")
+        self.mode = mode
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.file_max = max(0, file_max)
+        self.retry_after = retry_after
+        self.en_cours = 0
+        self._executor: Optional[Executor] = None
+        self._gestionnaire = None
+        # `en_cours` est modifié par la boucle d'événements et par les threads des travaux.
+        self._verrou = threading.Lock()
+
+    @property
+    def limite(self) -> int:
+        return self.workers + self.file_max
+
+    @property
+    def executor(self) -> Executor:
+        # Créé au premier rendu : un import de main.py ne démarre aucun processus.
+        if self._executor is None:
+            if self.mode == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="rendu")
+        return self._executor
+
+    def sature(self) -> bool:
+        return self.en_cours >= self.limite
+
+    async def executer(self, fn: Callable[..., Any], *args: Any) -> Any:
+        with self._verrou:
+            if self.sature():
+                raise PoolSatureError(f"{self.en_cours} rendus en cours (limite {self.limite}).")
+            self.en_cours += 1
+        try:
+            return await self._lancer(fn, *args)
+        finally:
+            with self._verrou:
+                self.en_cours -= 1
+
+    async def _lancer(self, fn: Callable[..., Any], *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        appel = functools.partial(fn, *args)
+        if self.mode == "thread":
+            # Le thread hérite du contexte de la requête : les étapes du rendu remontent dans Server-Timing.
+            # En mode process, elles restent dans le processus du worker.
+            appel = functools.partial(contextvars.copy_context().run, appel)
+        return await loop.run_in_executor(self.executor, appel)
+
+    def reserver(self, places: int) -> "Reservation":
+        """Retient jusqu'à `places` places libres pour une série de rendus (export ZIP).
+
+        Lève PoolSatureError s'il n'en reste aucune. Les places restent comptées dans la limite
+        jusqu'à `Reservation.liberer()` ; la série ne doit pas lancer plus de rendus à la fois.
+        """
+        with self._verrou:
+            places = min(places, self.limite - self.en_cours)
+            if places <= 0:
+                raise PoolSatureError(f"{self.en_cours} rendus en cours (limite {self.limite}).")
+            self.en_cours += places
+        return Reservation(self, places)
+
+    def executer_bloquant(self, fn: Callable[..., Any], *args: Any, progression: Optional[Callable[[int, int], None]] = None) -> Any:
+        """Attend `fn(*args, progression=...)` depuis un thread hors de la boucle (travaux en arrière-plan).
+
+        Le rendu compte dans la limite du pool sans jamais être refusé : il a déjà été admis
+        par la file des travaux. En mode process, la progression est relevée toutes les
+        INTERVALLE_RELAIS_S secondes et transmise à `progression` ; si celle-ci lève
+        RenduInterrompu, le worker s'arrête à la page suivante.
+        """
+        with self._verrou:
+            self.en_cours += 1
+        try:
+            if self.mode == "thread" or progression is None:
+                return self.executor.submit(functools.partial(fn, *args, progression=progression)).result()
+            return self._executer_relaye(fn, args, progression)
+        finally:
+            with self._verrou:
+                self.en_cours -= 1
+
+    def _executer_relaye(self, fn: Callable[..., Any], args: Tuple[Any, ...], progression: Callable[[int, int], None]) -> Any:
+        if self._gestionnaire is None:
+            self._gestionnaire = multiprocessing.get_context("spawn").Manager()
+        etat = self._gestionnaire.list([0, 0, False])
+        futur = self.executor.submit(functools.partial(fn, *args, progression=ProgressionRelayee(etat)))
+        transmis = None
+        while True:
+            try:
+                resultat, termine = futur.result(timeout=INTERVALLE_RELAIS_S), True
+            except concurrent.futures.TimeoutError:
+                termine = False
+            faites, total, annule = etat[:]
+            if total and (faites, total) != transmis and not annule:
+                transmis = (faites, total)
+                try:
+                    progression(faites, total)
+                except RenduInterrompu:
+                    etat[2] = True
+            if termine:
+                return resultat
+
+    def fermer(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._gestionnaire is not None:
+            self._gestionnaire.shutdown()
+            self._gestionnaire = None
+
+
+class Reservation:
+    """Places du pool retenues par `PoolRendu.reserver` : ses rendus sont déjà admis et ne sont jamais refusés."""
+
+    def __init__(self, pool: PoolRendu, places: int):
+        self.pool = pool
+        self.places = places
+
+    async def executer(self, fn: Callable[..., Any], *args: Any) -> Any:
+        return await self.pool._lancer(fn, *args)
+
+    def liberer(self):
+        with self.pool._verrou:
+            self.pool.en_cours -= self.places
+        self.places = 0
+
+
+def pool_depuis_env() -> PoolRendu:
+    """Construit le pool à partir des variables d'environnement PDF_POOL_*."""
+    workers = os.getenv("PDF_POOL_WORKERS")
+    return PoolRendu(
+        mode=os.getenv("PDF_POOL_MODE", "thread"),
+        workers=int(workers) if workers else None,
+        file_max=int(os.getenv("PDF_POOL_FILE_MAX", "8")),
+        retry_after=int(os.getenv("PDF_POOL_RETRY_AFTER", "5")),
+    )
+
+
+class _TamponZip(io.RawIOBase):
+    """Flux non positionnable : zipfile y écrit, `vider` récupère ce qui a été produit depuis le dernier appel."""
+
+    def __init__(self):
+        super().__init__()
+        self._morceaux: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._morceaux.append(bytes(b))
+        return len(b)
+
+    def vider(self) -> bytes:
+        contenu = b"".join(self._morceaux)
+        self._morceaux.clear()
+        return contenu
+
+
+async def flux_zip(elements: Iterable[Tuple[str, Any]], rendre: Callable[[Any], Awaitable[bytes]], fenetre: int) -> AsyncIterator[bytes]:
+    """Produit une archive ZIP au fil des rendus.
+
+    `rendre` est appelé sur chaque élément, au plus `fenetre` à la fois ; chaque fichier
+    est ajouté à l'archive (et envoyé) dès qu'il est prêt, dans l'ordre de fin de rendu.
+    Seuls les fichiers en cours de rendu sont gardés en mémoire.
+    """
+    tampon = _TamponZip()
+    iterateur = iter(elements)
+    en_cours: Dict["asyncio.Future[bytes]", str] = {}
+
+    def lancer():
+        for nom, element in itertools.islice(iterateur, max(1, fenetre) - len(en_cours)):
+            en_cours[asyncio.ensure_future(rendre(element))] = nom
+
+    try:
+        # Les PDF sont déjà compressés : on les stocke tels quels.
+        with zipfile.ZipFile(tampon, "w", compression=zipfile.ZIP_STORED) as archive:
+            lancer()
+            while en_cours:
+                termines, _ = await asyncio.wait(en_cours, return_when=asyncio.FIRST_COMPLETED)
+                for tache in termines:
+                    nom = en_cours.pop(tache)
+                    try:
+                        archive.writestr(nom, tache.result())
+                    except Exception as e:
+                        archive.writestr(f"{nom}.erreur.txt", f"Erreur lors du dessin: {str(e)}")
+                lancer()
+                yield tampon.vider()
+        yield tampon.vider()
+    finally:
+        for tache in en_cours:
+            tache.cancel()
@@ -0,0 +1,183 @@
+# sessions_plan.py
+
+import bisect
+import os
+import threading
+from typing import Any, Dict, List, Tuple
+
+from cache_plans import StockPlans
+from moteur import Dimensions, Plan, Section, analyser_sections, calculer_plan, construire_nomenclature, grouper_longueurs, repartition, repartition_batch
+from profils import get_deduction_dimension
+
+# Opérations acceptées par `SessionPlan.appliquer`.
+OPERATIONS_PATCH = ("section", "ecart_barreaux")
+
+
+class SessionPlan:
+    """Plan d'un projet en cours d'édition, recalculé localement à chaque modification.
+
+    La session garde, pour chaque section, ses déductions de jonctions et sa longueur libre :
+    changer la longueur d'une section ne recalcule que cette section, son morceau et la
+    nomenclature ; changer l'écart recalcule les répartitions en une passe vectorisée, sans
+    reparcourir la structure. Chaque modification renvoie un diff (opérations `replace` de
+    JSON Patch, RFC 6902) à appliquer au plan complet déjà reçu par le client.
+    """
+
+    def __init__(self, data):
+        self.plan: Plan = calculer_plan(data)
+        self.dims = Dimensions.depuis_projet(data)
+        self.version = 0
+        self.verrou = threading.Lock()
+        self._epaisseur_barreau = get_deduction_dimension(data.barreau_dims)
+        dims_map = {"poteau": get_deduction_dimension(data.poteau_dims), "liaison": get_deduction_dimension(data.liaison_dims), "rien": 0}
+        # Sections à plat, dans l'ordre d'analyser_sections : (index_morceau, index_dans_le_morceau, position_dans_la_structure).
+        self._sections: List[Tuple[int, int, int]] = []
+        self._deductions: List[Tuple[float, int, float, int]] = []
+        self._index: Dict[Tuple[int, int], int] = {}
+        positions = [[j for j, (t, _) in enumerate(m.structure) if t == 'section'] for m in self.plan.morceaux]
+        for _, _, gauche, div_gauche, droite, div_droite in analyser_sections(data.morceaux):
+            self._deductions.append((dims_map.get(gauche, 0), div_gauche, dims_map.get(droite, 0), div_droite))
+        for i, morceau in enumerate(self.plan.morceaux):
+            for k in range(len(morceau.sections_details)):
+                self._index[(i, k)] = len(self._sections)
+                self._sections.append((i, k, positions[i][k]))
+        self._longueurs_libres = [s.longueur_libre for m in self.plan.morceaux for s in m.sections_details]
+        self._total_barreaux = sum(s.nombre_barreaux for m in self.plan.morceaux for s in m.sections_details)
+        self._total_poteaux = sum(1 for m in self.plan.morceaux for t, _ in m.structure if t == 'poteau')
+        self._total_liaisons = sum(1 for m in self.plan.morceaux for t, _ in m.structure if t == 'liaison')
+        # Groupes de morceaux identiques, indexés par structure, tenus à jour quand un morceau change.
+        self._groupes: Dict[tuple, List[int]] = {}
+        self._signatures: List[tuple] = [()] * len(self.plan.morceaux)
+        for groupe in self.plan.groupes_morceaux:
+            signature = tuple(self.plan.morceaux[groupe[0]].structure)
+            self._groupes[signature] = list(groupe)
+            for i in groupe:
+                self._signatures[i] = signature
+
+    def en_dict(self) -> Dict[str, Any]:
+        return self.plan.en_dict()
+
+    def appliquer(self, patches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Applique une liste de modifications et renvoie le diff du plan.
+
+        Toutes les modifications sont vérifiées avant la première écriture : une liste
+        invalide (ValueError) laisse la session intacte.
+        """
+        for patch in patches:
+            self._verifier(patch)
+        # Dictionnaires utilisés comme ensembles ordonnés : une section modifiée deux fois n'apparaît qu'une fois dans le diff.
+        longueurs_modifiees: Dict[int, None] = {}
+        sections_modifiees: Dict[int, None] = {}
+        for patch in patches:
+            if patch["op"] == "section":
+                n = self._index[(patch["morceau"], patch["section"])]
+                self._modifier_section(n, patch["longueur"])
+                longueurs_modifiees[n] = sections_modifiees[n] = None
+            else:
+                sections_modifiees.update(dict.fromkeys(self._modifier_ecart(patch["valeur"])))
+
+        diff = []
+        morceaux_modifies = list(dict.fromkeys(self._sections[n][0] for n in longueurs_modifiees))
+        for i in morceaux_modifies:
+            morceau = self.plan.morceaux[i]
+            morceau.longueur_totale = sum(l for t, l in morceau.structure if t == 'section' and l is not None)
+            diff.append({"op": "replace", "path": f"/morceaux/{i}/longueur_totale", "value": float(morceau.longueur_totale)})
+        for n in longueurs_modifiees:
+            i, _, j = self._sections[n]
+            diff.append({"op": "replace", "path": f"/morceaux/{i}/structure/{j}/longueur", "value": self.plan.morceaux[i].structure[j][1]})
+        for n in sections_modifiees:
+            i, k, _ = self._sections[n]
+            diff.append({"op": "replace", "path": f"/morceaux/{i}/sections_details/{k}", "value": self.plan.morceaux[i].sections_details[k].en_dict()})
+        diff += self._recalculer_nomenclature()
+        if morceaux_modifies and self._regrouper(morceaux_modifies):
+            diff.append({"op": "replace", "path": "/groupes_morceaux", "value": [list(g) for g in self.plan.groupes_morceaux]})
+        if patches:
+            self.version += 1
+        return diff
+
+    def _verifier(self, patch: Dict[str, Any]):
+        op = patch.get("op")
+        if op not in OPERATIONS_PATCH:
+            raise ValueError(f"Opération inconnue : {op!r} (attendu : {', '.join(OPERATIONS_PATCH)}).")
+        if op == "section":
+            if (patch.get("morceau"), patch.get("section")) not in self._index:
+                raise ValueError(f"Section {patch.get('section')!r} du morceau {patch.get('morceau')!r} inexistante.")
+            if not isinstance(patch.get("longueur"), int):
+                raise ValueError("La longueur d'une section doit être un entier (mm).")
+        elif not isinstance(patch.get("valeur"), int):
+            raise ValueError("L'écart entre barreaux doit être un entier (mm).")
+
+    def _modifier_section(self, n: int, longueur: int):
+        i, k, j = self._sections[n]
+        morceau = self.plan.morceaux[i]
+        deduction_gauche, div_gauche, deduction_droite, div_droite = self._deductions[n]
+        longueur_libre = longueur - deduction_gauche / div_gauche - deduction_droite / div_droite
+        ancienne = morceau.sections_details[k]
+        if self.dims.remplissage_type == 'barreaudage_vertical':
+            r = repartition(longueur_libre, self._epaisseur_barreau, self.dims.ecart_barreaux)
+            nombre, vide, jeu = r.nombre_barreaux, r.vide_entre_barreaux_mm, r.jeu_depart_mm
+        else:
+            nombre, vide, jeu = 0, 0, 0
+        self._total_barreaux += nombre - ancienne.nombre_barreaux
+        self._longueurs_libres[n] = longueur_libre
+        morceau.structure[j] = ('section', longueur)
+        morceau.sections_details[k] = Section(longueur, longueur_libre, nombre, vide, jeu)
+
+    def _modifier_ecart(self, ecart: int) -> List[int]:
+        """Change l'écart maximal ; renvoie les sections dont la répartition a changé."""
+        self.dims.ecart_barreaux = ecart
+        if self.dims.remplissage_type != 'barreaudage_vertical' or not self._sections:
+            return []
+        nombres, vides, jeux = (a.tolist() for a in repartition_batch(self._longueurs_libres, self._epaisseur_barreau, ecart))
+        modifiees = []
+        for n, (i, k, _) in enumerate(self._sections):
+            details = self.plan.morceaux[i].sections_details
+            section = details[k]
+            if (section.nombre_barreaux, section.vide_entre_barreaux_mm, section.jeu_depart_mm) != (nombres[n], vides[n], jeux[n]):
+                # Les sections sont partagées entre morceaux identiques : on les remplace, sans les modifier en place.
+                details[k] = Section(section.longueur_section, section.longueur_libre, nombres[n], vides[n], jeux[n])
+                modifiees.append(n)
+        self._total_barreaux = sum(nombres)
+        return modifiees
+
+    def _regrouper(self, morceaux_modifies: List[int]) -> bool:
+        """Déplace les morceaux modifiés vers le groupe de leur nouvelle structure ; vrai si les groupes ont changé."""
+        for i in morceaux_modifies:
+            ancienne, nouvelle = self._signatures[i], tuple(self.plan.morceaux[i].structure)
+            if nouvelle == ancienne:
+                continue
+            groupe = self._groupes[ancienne]
+            groupe.remove(i)
+            if not groupe:
+                del self._groupes[ancienne]
+            bisect.insort(self._groupes.setdefault(nouvelle, []), i)
+            self._signatures[i] = nouvelle
+        groupes = sorted(self._groupes.values(), key=lambda g: g[0])
+        if groupes == self.plan.groupes_morceaux:
+            return False
+        self.plan.groupes_morceaux = [list(g) for g in groupes]
+        return True
+
+    def _recalculer_nomenclature(self) -> List[Dict[str, Any]]:
+        # Les totaux sont tenus à jour ; seul le regroupement par longueur (horizontal) reparcourt les sections.
+        barreaux_par_longueur = grouper_longueurs(self._longueurs_libres) if self.dims.remplissage_type == 'barreaudage_horizontal' else {}
+        nomenclature, remplissage_details = construire_nomenclature(self.dims, self._total_poteaux, self._total_liaisons, sum(self._longueurs_libres),
+                                                                    self._total_barreaux, barreaux_par_longueur)
+        diff = []
+        lignes = [n.en_dict() for n in nomenclature]
+        if lignes != [n.en_dict() for n in self.plan.nomenclature]:
+            diff.append({"op": "replace", "path": "/nomenclature", "value": lignes})
+        avant = self.plan.remplissage_details.en_dict() if self.plan.remplissage_details else None
+        apres = remplissage_details.en_dict() if remplissage_details else None
+        if apres != avant:
+            diff.append({"op": "replace", "path": "/remplissage_details", "value": apres})
+        self.plan.nomenclature, self.plan.remplissage_details = nomenclature, remplissage_details
+        return diff
+
+
+def sessions_depuis_env() -> StockPlans:
+    """Stock des sessions d'édition, à partir de SESSIONS_TTL_SECONDES et SESSIONS_MAX."""
+    return StockPlans(
+        ttl=float(os.getenv("SESSIONS_TTL_SECONDES", "1800")),
+        max_plans=int(os.getenv("SESSIONS_MAX", "200")),
+    )
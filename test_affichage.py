@@ -0,0 +1,46 @@
+# test_affichage.py
+from affichage import Cote, Rangee, Rect, affichage_plan, construire_affichage
+
+# --- Tests pour construire_affichage ---
+
+def test_pages_du_plan(plan_data):
+    """Page d'ensemble, une page par morceau distinct, puis la platine."""
+    pages = construire_affichage(plan_data).pages
+    assert [p.type for p in pages] == ["ensemble", "morceau", "morceau", "platine"]
+    assert pages[0].tableau["lignes"][0] == ["Poteaux", "40x40", "4", "1020 mm"]
+    assert [v.id for v in pages[3].vues] == ["platine_dessus", "platine_cote"]
+
+def test_morceaux_identiques_partagent_une_page(plan_data):
+    plan = dict(plan_data, morceaux=[plan_data["morceaux"][1], dict(plan_data["morceaux"][1], id=1)])
+    pages = construire_affichage(plan).pages
+    assert [(p.type, p.repetition) for p in pages] == [("ensemble", 1), ("morceau", 2), ("platine", 1)]
+
+def test_groupes_du_moteur_verifies(plan_data):
+    """Le regroupement transmis par le moteur est repris, mais un regroupement faux est refait."""
+    plan = dict(plan_data, morceaux=[plan_data["morceaux"][1]] * 3)
+    for groupes in ([[0, 1, 2]], [[0], [1, 2]], [[0, 1]], [[0, 1, 2, 5]], None):
+        pages = construire_affichage(dict(plan, groupes_morceaux=groupes)).pages
+        assert [p.repetition for p in pages if p.type == "morceau"] == [3]
+
+def test_rangee_de_barreaux(plan_data):
+    """Les barreaux verticaux d'une section forment une seule rangée, développable en rectangles."""
+    section = plan_data["morceaux"][1]["sections_details"][0]
+    elements = construire_affichage(plan_data).pages[2].vues[0].elements
+    rangees = [e for e in elements if isinstance(e, Rangee)]
+    assert len(rangees) == 1 and rangees[0].nombre == section["nombre_barreaux"]
+    rects = rangees[0].rects()
+    assert rects[0].x == 40 + section["jeu_depart_mm"]
+    assert abs(rects[1].x - rects[0].x - rects[0].w - section["vide_entre_barreaux_mm"]) < 1e-9
+    assert [e.texte for e in elements if isinstance(e, Cote)][-1] == "Section: 1000"
+    assert all(r.calque in ("poteau", "lisse") for r in elements if isinstance(r, Rect))
+
+def test_affichage_en_cache(plan_data):
+    """Même plan, même liste d'affichage ; un plan modifié est recalculé."""
+    assert affichage_plan(plan_data) is affichage_plan(dict(plan_data))
+    assert affichage_plan(plan_data) is not affichage_plan(dict(plan_data, hauteur_totale=1100))
+
+def test_en_dict(plan_data):
+    donnees = construire_affichage(plan_data).en_dict()
+    assert donnees["calques"]["poteau"] == "#d91e18"
+    formes = {e["forme"] for p in donnees["pages"] for v in p["vues"] for e in v["elements"]}
+    assert formes == {"rect", "rangee", "cercle", "cote"}
@@ -0,0 +1,196 @@
+# test_analyse_texte.py
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from analyse_texte import AnalyseDelaiDepasseError, AnalyseSatureeError, AnalyseurTexte, StatistiquesAnalyse, analyser_par_regles, normaliser_description
+from chargement import ModuleDiffere
+
+REPONSE = {"nombre_morceaux": 1, "morceaux": [{"nombre_sections": 1, "structure": [
+    {"type": "poteau"}, {"type": "section", "longueur": 3000}, {"type": "poteau"}]}]}
+
+
+class FauxGenai:
+    """Remplace google.generativeai : latence configurable, compte les modèles créés et les appels."""
+
+    def __init__(self, latence=0.0, texte=None):
+        self.latence = latence
+        self.texte = texte or f"```json\n{json.dumps(REPONSE)}\n```"
+        self.modeles_crees = 0
+        self.appels = 0
+
+    def GenerativeModel(self, nom):
+        self.modeles_crees += 1
+        faux = self
+
+        class Modele:
+            async def generate_content_async(self, prompt):
+                faux.appels += 1
+                await asyncio.sleep(faux.latence)
+                return type("Reponse", (), {"text": faux.texte})()
+
+        return Modele()
+
+
+def _analyseur(faux, **kwargs):
+    return AnalyseurTexte(faux, "{user_text}", lambda d: main.ParsedFormData(**d).model_dump(), **kwargs)
+
+# --- Tests pour normaliser_description ---
+
+def test_normaliser_description():
+    """Casse et espaces sont ignorés."""
+    assert normaliser_description("  Poteaux  40x40\n tous les 110 ") == normaliser_description("poteaux 40X40 tous les 110")
+
+# --- Tests pour analyser_par_regles ---
+
+def test_regles_description_type():
+    """Le modèle de description de l'équipe commerciale est extrait entièrement."""
+    resultat = analyser_par_regles("2 morceaux de 3000 et 4000, poteaux 40x40, barreaux 20x20 tous les 110")
+    assert resultat["nombre_morceaux"] == 2
+    assert resultat["poteau_dims"] == "40x40"
+    assert resultat["barreau_dims"] == "20x20"
+    assert resultat["ecart_barreaux"] == 110
+    assert [m["structure"] for m in resultat["morceaux"]][1] == [{"type": "poteau"}, {"type": "section", "longueur": 4000}, {"type": "poteau"}]
+    main.ParsedFormData(**resultat)
+
+def test_regles_identiques_en_metres():
+    """Morceaux identiques, longueurs en mètres, lisses et hauteur."""
+    resultat = analyser_par_regles("Trois morceaux identiques de 2,5 m, lisses 40x20, hauteur 1100")
+    assert resultat["morceaux_identiques"] == "oui"
+    assert [m["structure"][1]["longueur"] for m in resultat["morceaux"]] == [2500] * 3
+    assert resultat["lissehaute_dims"] == resultat["lissebasse_dims"] == "40x20"
+    assert resultat["hauteur_totale"] == 1100
+
+@pytest.mark.parametrize("description", [
+    "2 morceaux de 3000 et 4000 avec un angle à 90°",
+    "2 morceaux de 3000, poteaux 40x40",
+    "garde-corps en L le long de la terrasse",
+])
+def test_regles_pas_sur(description):
+    """Nombre inconnu, longueurs manquantes ou texte libre : on laisse la main au modèle."""
+    assert analyser_par_regles(description) is None
+
+@pytest.mark.parametrize("description", [
+    "1 morceau de 4000 fixé entre deux murs, sans poteaux",
+    "2 morceaux de 3 m et 4 m, chacun en deux sections reliées par une liaison",
+    "2 morceaux de 3 m et 4 m, avec une liaison au milieu du premier, sans poteau contre le mur",
+])
+def test_regles_structure_non_representable(description):
+    """Murs, liaisons, sections multiples ou poteaux absents : les règles ne savent pas le décrire."""
+    assert analyser_par_regles(description) is None
+
+# --- Tests pour AnalyseurTexte ---
+
+def test_analyseur_cache_et_modele_unique():
+    """Une description déjà analysée est servie depuis le cache ; le modèle n'est créé qu'une fois."""
+    faux = FauxGenai()
+    analyseur = _analyseur(faux)
+
+    async def scenario():
+        premier = await analyseur.analyser("2 morceaux de 3000")
+        second = await analyseur.analyser("2  MORCEAUX de 3000")
+        await analyseur.analyser("autre projet")
+        return premier, second
+
+    premier, second = asyncio.run(scenario())
+    assert premier == second
+    assert premier["morceaux"][0]["structure"][1]["longueur"] == 3000
+    assert faux.appels == 2
+    assert faux.modeles_crees == 1
+
+def test_analyseur_coalescence():
+    """Des demandes identiques simultanées partagent un seul appel au modèle."""
+    faux = FauxGenai(latence=0.05)
+    analyseur = _analyseur(faux)
+
+    async def scenario():
+        return await asyncio.gather(*(analyseur.analyser("même texte") for _ in range(10)))
+
+    resultats = asyncio.run(scenario())
+    assert faux.appels == 1
+    assert all(r == resultats[0] for r in resultats)
+
+def test_analyseur_coalescence_premier_annule():
+    """Annuler la première demande n'annule pas l'appel partagé : les suivantes reçoivent le résultat."""
+    faux = FauxGenai(latence=0.05)
+    analyseur = _analyseur(faux)
+
+    async def scenario():
+        premiere = asyncio.ensure_future(analyseur.analyser("même texte"))
+        await asyncio.sleep(0.01)
+        suivantes = [asyncio.ensure_future(analyseur.analyser("même texte")) for _ in range(3)]
+        await asyncio.sleep(0)
+        premiere.cancel()
+        resultats = await asyncio.gather(*suivantes)
+        assert premiere.cancelled()
+        return resultats
+
+    resultats = asyncio.run(scenario())
+    assert faux.appels == 1
+    assert all(r["morceaux"][0]["structure"][1]["longueur"] == 3000 for r in resultats)
+
+def test_analyseur_delai_depasse():
+    """Un modèle trop lent est abandonné."""
+    analyseur = _analyseur(FauxGenai(latence=1), timeout_s=0.01)
+    with pytest.raises(AnalyseDelaiDepasseError):
+        asyncio.run(analyseur.analyser("texte"))
+
+def test_analyseur_sature():
+    """Au-delà de concurrence_max appels en cours, la demande est refusée."""
+    analyseur = _analyseur(FauxGenai(latence=0.05), concurrence_max=1)
+
+    async def scenario():
+        return await asyncio.gather(analyseur.analyser("a"), analyseur.analyser("b"), return_exceptions=True)
+
+    resultats = asyncio.run(scenario())
+    assert isinstance(resultats[1], AnalyseSatureeError)
+
+def test_analyseur_erreur_non_cachee():
+    """Une réponse invalide n'est pas mise en cache."""
+    faux = FauxGenai(texte="pas du json")
+    analyseur = _analyseur(faux)
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            asyncio.run(analyseur.analyser("texte"))
+    assert faux.appels == 2
+
+# --- Tests pour /api/parse-text ---
+
+def test_parse_text(monkeypatch):
+    """Une description non reconnue par les règles passe par l'analyseur partagé."""
+    faux = FauxGenai()
+    monkeypatch.setattr(main, "analyseur_texte", _analyseur(faux))
+    response = TestClient(main.app).post("/api/parse-text", json={"description": "garde-corps en L le long de la terrasse"})
+    assert response.status_code == 200
+    assert response.headers["x-analyse-source"] == "modele"
+    assert response.json()["nombre_morceaux"] == 1
+    assert faux.appels == 1
+
+def test_parse_text_regles(monkeypatch):
+    """Une description courante est analysée localement, même sans modèle configuré."""
+    monkeypatch.setattr(main, "analyseur_texte", None)
+    monkeypatch.setattr(main, "statistiques_analyse", StatistiquesAnalyse())
+    client = TestClient(main.app)
+    response = client.post("/api/parse-text", json={"description": "2 morceaux de 3000 et 4000, poteaux 40x40"})
+    assert response.status_code == 200
+    assert response.headers["x-analyse-source"] == "regles"
+    assert [m["structure"][1]["longueur"] for m in response.json()["morceaux"]] == [3000, 4000]
+    assert client.get("/api/parse-text/stats").json() == {"regles": 1, "modele": 0, "taux_regles": 1.0}
+
+def test_parse_text_configuration_en_echec(monkeypatch):
+    """Si la configuration du client échoue au premier usage, l'assistant est désactivé : 503, pas 500."""
+    client_gemini = ModuleDiffere("json", apres_import=main.configurer_gemini)  # json n'a pas de configure()
+    monkeypatch.setattr(main, "analyseur_texte", _analyseur(client_gemini))
+    client = TestClient(main.app)
+    for _ in range(2):
+        response = client.post("/api/parse-text", json={"description": "garde-corps en L le long de la terrasse"})
+        assert response.status_code == 503
+    assert main.analyseur_texte is None
+
+def test_parse_text_non_configure(monkeypatch):
+    """Sans clé Gemini, la route répond 503."""
+    monkeypatch.setattr(main, "analyseur_texte", None)
+    assert TestClient(main.app).post("/api/parse-text", json={"description": "x"}).status_code == 503
@@ -0,0 +1,51 @@
+# test_apercu.py
+import xml.etree.ElementTree as ET
+
+from fastapi.testclient import TestClient
+
+from affichage import construire_affichage
+from apercu import APERCU_MAX_BARREAUX, apercu_svg
+from main import app
+
+client = TestClient(app)
+SVG = "{http://www.w3.org/2000/svg}"
+
+# --- Tests pour apercu_svg ---
+
+def test_apercu_svg_bien_forme(plan_data):
+    """Un SVG par vue : ensemble, deux morceaux, platine de dessus et de côté."""
+    racine = ET.fromstring(apercu_svg(construire_affichage(plan_data)))
+    assert racine.tag == f"{SVG}svg"
+    assert [v.get("id") for v in racine.findall(f"{SVG}svg")] == ["ensemble", "morceau_0", "morceau_1", "platine_dessus", "platine_cote"]
+
+def test_apercu_resume_les_rangees_denses(plan_data):
+    """Au-delà du seuil, chaque rangée de barreaux devient deux barreaux et une zone."""
+    morceau = plan_data["morceaux"][0]
+    section = dict(morceau["sections_details"][0], nombre_barreaux=APERCU_MAX_BARREAUX + 1)
+    plan = dict(plan_data, morceaux=[dict(morceau, sections_details=[section] + morceau["sections_details"][1:])])
+    vue = ET.fromstring(apercu_svg(construire_affichage(plan))).find(f"{SVG}svg[@id='morceau_0']")
+    classes = [r.get("class") for r in vue.findall(f"{SVG}rect")]
+    assert classes.count("barreaux_groupes") == 2
+    assert classes.count("barreau") == 4
+
+# --- Tests pour /api/preview ---
+
+def test_preview_svg_compresse(projet_data):
+    """Le SVG est compressé quand le client accepte gzip."""
+    response = client.post("/api/preview", json=projet_data, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/svg+xml"
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text.startswith("<svg")
+
+def test_preview_json(projet_data):
+    """Le format JSON est la liste d'affichage du plan."""
+    response = client.post("/api/preview?format=json", json=projet_data, headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert [p["type"] for p in response.json()["pages"]] == ["ensemble", "morceau", "morceau", "platine"]
+
+def test_preview_projet_incomplet(projet_data):
+    """Un formulaire en cours de saisie (section sans jonction) donne une 422, pas une 500."""
+    projet_data["morceaux"][1]["structure"] = [{"type": "poteau"}, {"type": "section", "longueur": 1000}]
+    assert client.post("/api/preview", json=projet_data).status_code == 422
@@ -0,0 +1,29 @@
+# test_bench_plans.py
+from bench_plans import comparer, executer, generer_projet
+from main import ProjectData
+
+# --- Tests pour generer_projet ---
+
+def test_generateur_reproductible_et_valide():
+    """Même graine, même projet ; le projet passe la validation de /api/process-data."""
+    projet = generer_projet(42, 30)
+    assert projet == generer_projet(42, 30)
+    assert projet != generer_projet(43, 30)
+    assert len(ProjectData(**projet).morceaux) == 30
+    sans_platine = generer_projet(42, 3, "barreaudage_horizontal", platine=False)
+    assert sans_platine["type_fixation"] == "scellement" and sans_platine["platine_dimensions"] is None
+
+# --- Tests pour executer et comparer ---
+
+def test_executer_mesure_chaque_etape():
+    resultats = executer(["petit_vertical"], repetitions=1)
+    etapes = resultats["scenarios"]["petit_vertical"]["etapes"]
+    assert set(etapes) == {"process_data", "construire_affichage", "creer_plan_pdf", "dessiner_page_1", "dessiner_page_morceau", "dessiner_page_platine", "pdf.output"}
+
+def test_comparer_signale_les_regressions():
+    """Seules les hausses au-delà du seuil relatif et du plancher absolu sont signalées."""
+    def resultats(**minimums):
+        return {"scenarios": {"s": {"etapes": {e: {"min_ms": v, "mediane_ms": 2 * v} for e, v in minimums.items()}}}}
+    ancien = resultats(process_data=10.0, creer_plan_pdf=1.0, pdf_output=100.0)
+    nouveau = resultats(process_data=12.0, creer_plan_pdf=1.3, pdf_output=105.0, etape_nouvelle=5.0)
+    assert [(r["etape"], round(r["ecart"], 2)) for r in comparer(ancien, nouveau)] == [("process_data", 0.2)]
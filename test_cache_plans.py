@@ -0,0 +1,137 @@
+# test_cache_plans.py
+import os
+import time
+
+from fastapi.testclient import TestClient
+
+import dessin_pdf
+import main
+from cache_plans import CachePDF, StockPlans, cle_plan, etag_correspond
+
+# --- Tests pour cle_plan ---
+
+def test_cle_plan_independante_de_l_ordre():
+    """L'ordre des clés du dictionnaire ne change pas l'empreinte."""
+    assert cle_plan({"a": 1, "b": [1, 2]}) == cle_plan({"b": [1, 2], "a": 1})
+
+def test_cle_plan_sensible_au_contenu():
+    """Deux plans différents ont deux empreintes différentes."""
+    assert cle_plan({"a": 1}) != cle_plan({"a": 2})
+
+# --- Tests pour etag_correspond ---
+
+def test_etag_correspond():
+    """Gère les listes, les ETag faibles et le joker."""
+    assert etag_correspond('"x", "abc"', '"abc"')
+    assert etag_correspond('W/"abc"', '"abc"')
+    assert etag_correspond('*', '"abc"')
+    assert not etag_correspond('"x"', '"abc"')
+    assert not etag_correspond(None, '"abc"')
+
+# --- Tests pour CachePDF ---
+
+def test_cache_lru_borne_en_taille():
+    """Les entrées les moins récemment utilisées sont évincées au-delà de la taille maximale."""
+    cache = CachePDF(taille_max_octets=10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    assert cache.get("a") == b"1234"
+    cache.put("c", b"1234")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1234"
+    assert cache.taille_octets == 8
+
+def test_cache_disque_partage(tmp_path):
+    """Une entrée écrite par un worker est relue par un autre via le dossier commun."""
+    CachePDF(dossier=str(tmp_path)).put("cle", b"%PDF")
+    autre_worker = CachePDF(dossier=str(tmp_path))
+    assert autre_worker.get("cle") == b"%PDF"
+    assert len(autre_worker) == 1
+    assert [p.name for p in tmp_path.iterdir()] == ["cle.pdf"]
+
+def test_cache_disque_borne_en_taille_et_en_age(tmp_path):
+    """Au-delà de la taille maximale, les fichiers les plus anciens sont supprimés ; les fichiers expirés aussi."""
+    cache = CachePDF(taille_max_octets=0, dossier=str(tmp_path), taille_max_disque_octets=12, ttl_disque=3600)
+    for age, cle in ((300, "a"), (200, "b"), (100, "c")):
+        cache.put(cle, b"1234")
+        os.utime(tmp_path / f"{cle}.pdf", (time.time() - age, time.time() - age))
+    (tmp_path / "ancienne_version.pdf").write_bytes(b"%PDF")
+    os.utime(tmp_path / "ancienne_version.pdf", (time.time() - 7200, time.time() - 7200))
+    assert cache.get("a") == b"1234"  # relu : redevient le plus récent
+    cache.put("d", b"1234")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.pdf", "c.pdf", "d.pdf"]
+    assert cache.get("b") is None
+
+def test_cache_disque_parcouru_seulement_si_necessaire(tmp_path, monkeypatch):
+    """Sous la limite, seule la première écriture parcourt le dossier ; la taille est suivie en mémoire."""
+    parcours = []
+    scandir = os.scandir
+    monkeypatch.setattr(os, "scandir", lambda chemin: parcours.append(chemin) or scandir(chemin))
+    cache = CachePDF(taille_max_octets=0, dossier=str(tmp_path), taille_max_disque_octets=20, ttl_disque=3600)
+    for cle in "abcd":
+        cache.put(cle, b"1234")
+    cache.put("a", b"123")
+    assert len(parcours) == 1
+    assert cache.taille_disque_octets == 15
+    cache.put("e", b"123456")
+    assert len(parcours) == 2
+    assert cache.taille_disque_octets <= 20
+    assert sum(p.stat().st_size for p in tmp_path.iterdir()) == cache.taille_disque_octets
+
+# --- Tests pour /api/draw-pdf ---
+
+def test_draw_pdf_cache_et_etag(plan_data, monkeypatch):
+    """Le second export sort du cache et If-None-Match renvoie 304."""
+    monkeypatch.setattr(main, "cache_pdf", CachePDF())
+    appels = []
+    original = dessin_pdf.creer_plan_pdf
+
+    def creer_plan_pdf_compte(plan):
+        appels.append(1)
+        return original(plan)
+
+    monkeypatch.setattr(dessin_pdf, "creer_plan_pdf", creer_plan_pdf_compte)
+    client = TestClient(main.app)
+    premiere = client.post("/api/draw-pdf", json=plan_data)
+    seconde = client.post("/api/draw-pdf", json=plan_data)
+    assert premiere.status_code == seconde.status_code == 200
+    assert premiere.content == seconde.content
+    assert premiere.headers["etag"] == seconde.headers["etag"]
+    assert len(appels) == 1
+    revalidation = client.post("/api/draw-pdf", json=plan_data, headers={"If-None-Match": premiere.headers["etag"]})
+    assert revalidation.status_code == 304
+    assert revalidation.content == b""
+
+# --- Tests pour StockPlans ---
+
+def test_stock_plans_ttl(monkeypatch):
+    """Un plan expire après ttl secondes sans accès."""
+    horloge = [100.0]
+    monkeypatch.setattr("cache_plans.time.monotonic", lambda: horloge[0])
+    stock = StockPlans(ttl=10)
+    plan_id = stock.ajouter({"a": 1})
+    horloge[0] = 105.0
+    assert stock.get(plan_id) == {"a": 1}
+    horloge[0] = 114.0
+    assert stock.get(plan_id) == {"a": 1}
+    horloge[0] = 125.0
+    assert stock.get(plan_id) is None
+    assert len(stock) == 0
+
+def test_stock_plans_borne():
+    """Au-delà de max_plans, les plus anciens sont évincés."""
+    stock = StockPlans(max_plans=2)
+    ids = [stock.ajouter({"i": i}) for i in range(3)]
+    assert stock.get(ids[0]) is None
+    assert stock.get(ids[2]) == {"i": 2}
+
+# --- Tests pour /api/plans/{plan_id}/pdf ---
+
+def test_plan_stocke_rendu_par_identifiant(projet_data):
+    """Le plan calculé par process-data est rendu sans être renvoyé par le client."""
+    client = TestClient(main.app)
+    resultat = client.post("/api/process-data", json=projet_data).json()
+    response = client.get(f"/api/plans/{resultat['plan_id']}/pdf")
+    assert response.status_code == 200
+    assert response.content.startswith(b"%PDF")
+    assert client.get("/api/plans/inconnu/pdf").status_code == 404
@@ -0,0 +1,30 @@
+# test_charge_http.py
+import asyncio
+
+import main
+from charge_http import centile, executer, lire_melange
+
+# --- Tests pour centile ---
+
+def test_centile_rang_le_plus_proche():
+    valeurs = list(range(1, 101))
+    assert (centile(valeurs, 50), centile(valeurs, 95), centile(valeurs, 99)) == (50, 95, 99)
+    assert centile([7.0], 99) == 7.0
+    assert centile([], 50) is None
+
+def test_lire_melange():
+    assert lire_melange("process-data=3,parse-text") == {"process-data": 3, "parse-text": 1}
+
+# --- Tests pour executer ---
+
+def test_charge_asgi_avec_gemini_simule(monkeypatch):
+    """Sans réseau ni clé : les trois routes répondent, l'analyse passe par le modèle simulé."""
+    monkeypatch.setattr(main, "analyseur_texte", main.analyseur_texte)
+    rapport = asyncio.run(executer("asgi", clients=3, duree_s=None, requetes=15, latence_ms=5, gigue_ms=0, graine=2))
+    assert rapport["requetes"] == 15
+    assert sum(r["requetes"] for r in rapport["routes"].values()) == 15
+    for route, r in rapport["routes"].items():
+        assert set(r["statuts"]) <= {"200"}, route
+        if r["requetes"]:
+            assert r["p50_ms"] <= r["p95_ms"] <= r["p99_ms"]
+    assert main.analyseur_texte.client.appels > 0
@@ -0,0 +1,53 @@
+# test_chargement.py
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+
+import main
+from chargement import TEMPS_CHARGEMENT, ModuleDiffere, module_disponible, rapport_imports
+
+# --- Tests pour ModuleDiffere ---
+
+def test_module_differe_charge_au_premier_acces():
+    """Le module n'est importé qu'au premier attribut demandé, puis configuré une seule fois."""
+    configurations = []
+    module = ModuleDiffere("colorsys", apres_import=configurations.append)
+    assert not module.charge
+    assert module.rgb_to_hsv(1, 0, 0)[0] == 0
+    assert module.charge
+    module.hsv_to_rgb(0, 0, 0)
+    assert len(configurations) == 1
+    assert "colorsys" in TEMPS_CHARGEMENT
+
+def test_module_disponible():
+    """Détecte un module installé sans l'importer."""
+    assert module_disponible("json")
+    assert not module_disponible("module_qui_n_existe_pas")
+    assert not module_disponible("paquet_absent.sous_module")
+
+# --- Tests pour le démarrage de main ---
+
+def test_import_main_sans_modules_lourds():
+    """Importer main ne charge ni fpdf, ni numpy, ni google.generativeai."""
+    code = "import sys, main; print(sorted(m for m in ('fpdf', 'numpy', 'google.generativeai') if m in sys.modules))"
+    sortie = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert sortie.strip().splitlines()[-1] == "[]"
+
+def test_rapport_imports():
+    """Le rapport liste les modules importés par main avec leur coût cumulé."""
+    rapport = rapport_imports("main")
+    assert rapport["total_ms"] > 0
+    noms = [m["module"] for m in rapport["modules"]]
+    assert "fastapi" in noms
+    assert "fpdf" not in noms and "dessin_pdf" not in noms
+
+def test_startup_report_et_prechargement(monkeypatch):
+    """Avec PRECHARGEMENT=1, les modules différés sont chargés au démarrage de l'application."""
+    monkeypatch.setenv("PRECHARGEMENT", "1")
+    with TestClient(main.app) as client:
+        rapport = client.get("/api/startup-report").json()
+    assert rapport["prechargement"]
+    assert rapport["duree_demarrage_s"] > 0
+    assert rapport["modules_differes"]["dessin_pdf"]["charge"]
+    assert rapport["modules_differes"]["numpy"]["charge"]
@@ -0,0 +1,94 @@
+# test_decoupe.py
+import random
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from decoupe import optimiser_decoupe, pieces_depuis_plan
+from main import app
+
+client = TestClient(app)
+
+
+def _barres_valides(resultat, pieces_par_profil):
+    """Toutes les pièces sont placées une fois et aucune barre ne déborde."""
+    for profil in resultat["profils"]:
+        coupees = []
+        for barre in profil["barres"]:
+            utilise = sum(c["longueur_mm"] for c in barre["coupes"]) + resultat["trait_de_scie_mm"] * (len(barre["coupes"]) - 1)
+            assert utilise <= resultat["longueur_barre_mm"] + 1e-6
+            assert barre["chute_mm"] == pytest.approx(resultat["longueur_barre_mm"] - utilise, abs=0.1)
+            coupees += [(c["longueur_mm"], c["item"]) for c in barre["coupes"]] * barre["quantite"]
+        assert sorted(coupees) == sorted(pieces_par_profil[profil["details"]])
+
+# --- Tests pour pieces_depuis_plan ---
+
+def test_pieces_depuis_plan(plan_data):
+    """Les lisses sont redécoupées par section, les autres articles développés par quantité."""
+    pieces = pieces_depuis_plan(plan_data)
+    longueurs_libres = sorted(round(s["longueur_libre"]) for m in plan_data["morceaux"] for s in m["sections_details"])
+    lisses_hautes = sorted(l for l, item in pieces["40x40"] if item == "Lisse Haute")
+    assert lisses_hautes == longueurs_libres
+    assert sum(1 for _, item in pieces["40x40"] if item == "Poteaux") == 4
+    assert len(pieces["20x20"]) == next(n["quantite"] for n in plan_data["nomenclature"] if n["item"] == "Barreaux")
+
+# --- Tests pour optimiser_decoupe ---
+
+def test_decoupe_trait_de_scie():
+    """Trois pièces de 1999 tiennent sans trait de scie, pas avec."""
+    pieces = {"40x40": [(1999, "Lisse")] * 3}
+    assert optimiser_decoupe(pieces, 6000, 0)["nombre_barres_total"] == 1
+    resultat = optimiser_decoupe(pieces, 6000, 3)
+    assert resultat["nombre_barres_total"] == 2
+    _barres_valides(resultat, pieces)
+
+def test_decoupe_piece_trop_longue():
+    """Une pièce plus longue qu'une barre est signalée à part."""
+    resultat = optimiser_decoupe({"40x40": [(7000, "Lisse Haute"), (1000, "Poteaux")]})
+    profil = resultat["profils"][0]
+    assert profil["pieces_hors_barre"] == [{"item": "Lisse Haute", "longueur_mm": 7000}]
+    assert profil["nombre_barres"] == 1
+
+def test_decoupe_optimise_pas_pire_que_rapide():
+    """Le mode optimisé n'utilise jamais plus de barres que le FFD et respecte la borne inférieure."""
+    rng = random.Random(3)
+    pieces = {"40x40": [(rng.choice([850, 1020, 1730, 2460, 3100, 4200]), "Piece") for _ in range(200)]}
+    rapide = optimiser_decoupe(pieces, mode="rapide")
+    optimise = optimiser_decoupe(pieces, mode="optimise", temps_max_s=0.2)
+    assert optimise["profils"][0]["borne_inferieure_barres"] <= optimise["nombre_barres_total"] <= rapide["nombre_barres_total"]
+    _barres_valides(rapide, pieces)
+    _barres_valides(optimise, pieces)
+
+def test_decoupe_optimise_budget_global():
+    """`temps_max_s` borne la durée totale, pas celle de chaque profil."""
+    # Une pièce par barre : la borne inférieure n'est jamais atteinte, chaque profil épuise sa part.
+    pieces = {f"{40 + i}x40": [(3100, "Piece")] * 20 for i in range(4)}
+    debut = time.perf_counter()
+    resultat = optimiser_decoupe(pieces, mode="optimise", temps_max_s=0.2)
+    assert time.perf_counter() - debut < 0.35
+    assert resultat["nombre_barres_total"] == 80
+
+def test_decoupe_milliers_de_pieces():
+    """Plusieurs milliers de pièces sont débitées en moins d'une seconde en mode rapide."""
+    rng = random.Random(7)
+    pieces = {"20x20": [(rng.randint(300, 2500), "Barreaux") for _ in range(5000)]}
+    debut = time.perf_counter()
+    resultat = optimiser_decoupe(pieces)
+    assert time.perf_counter() - debut < 1
+    _barres_valides(resultat, pieces)
+
+def test_decoupe_mode_invalide():
+    """Un mode inconnu est refusé."""
+    with pytest.raises(ValueError):
+        optimiser_decoupe({}, mode="exact")
+
+# --- Tests pour /api/cut-list ---
+
+def test_cut_list_par_plan_id(projet_data):
+    """La route débite le plan stocké."""
+    plan_id = client.post("/api/process-data", json=projet_data).json()["plan_id"]
+    response = client.post("/api/cut-list", json={"plan_id": plan_id, "mode": "optimise", "temps_max_s": 0.1})
+    assert response.status_code == 200
+    assert {p["details"] for p in response.json()["data"]["profils"]} == {"40x40", "40x20", "20x20"}
+    assert client.post("/api/cut-list", json={}).status_code == 400
@@ -0,0 +1,155 @@
+# test_dessin_pdf.py
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+
+import affichage
+import dessin_pdf
+from bench_plans import generer_projet
+from dessin_pdf import DESSIN_PAGES, PlanPDF, creer_plan_pdf, dessiner_pages_paralleles
+from main import ProjectData, app
+from moteur import calculer_plan
+
+client = TestClient(app)
+
+def _sans_horodatage(pdf: bytes) -> bytes:
+    """PDF sans sa date de création ni l'identifiant /ID qui en dépend : deux rendus identiques deviennent égaux."""
+    return re.sub(rb"/CreationDate \(D:\d+Z\)|/ID \[<[0-9A-F]+><[0-9A-F]+>\]", b"", pdf)
+
+# --- Tests pour creer_plan_pdf ---
+
+def test_creer_plan_pdf_en_memoire(plan_data, tmp_path, monkeypatch):
+    """Sans chemin, le PDF est retourné en bytes et rien n'est écrit sur le disque."""
+    monkeypatch.chdir(tmp_path)
+    pdf_bytes = creer_plan_pdf(plan_data)
+    assert isinstance(pdf_bytes, bytes)
+    assert pdf_bytes.startswith(b"%PDF")
+    assert os.listdir(tmp_path) == []
+
+def test_creer_plan_pdf_vers_fichier(plan_data, tmp_path):
+    """Avec un chemin, le PDF est écrit et le chemin retourné."""
+    filepath = str(tmp_path / "plan.pdf")
+    assert creer_plan_pdf(plan_data, filepath) == filepath
+    with open(filepath, "rb") as f:
+        assert f.read(4) == b"%PDF"
+
+def test_creer_plan_pdf_concurrent(plan_data):
+    """Des rendus simultanés restent isolés : chaque PDF est, octet pour octet, celui d'un rendu seul."""
+    plans = []
+    for i in range(20):
+        plan = dict(plan_data, poteau_dims=f"{40 + i}x40")
+        plans.append(plan)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        resultats = list(executor.map(creer_plan_pdf, plans))
+    attendus = [creer_plan_pdf(plan) for plan in plans]
+    assert all(r.startswith(b"%PDF") for r in resultats)
+    for i, (resultat, attendu) in enumerate(zip(resultats, attendus)):
+        assert _sans_horodatage(resultat) == _sans_horodatage(attendu), i
+    assert len({_sans_horodatage(a) for a in attendus}) == len(plans)
+
+def _plan_long(projet_data, longueur):
+    """Un seul morceau d'une section de `longueur` mm, en barreaudage vertical."""
+    morceau = {"nombre_sections": 1, "structure": [{"type": "poteau"}, {"type": "section", "longueur": longueur}, {"type": "poteau"}]}
+    return calculer_plan(ProjectData(**{**projet_data, "nombre_morceaux": 1, "morceaux": [morceau], "type_fixation": "scellement"})).en_dict()
+
+def _page_morceau(plan, lod=None):
+    """Contenu (non compressé) de la page du premier morceau."""
+    pdf = PlanPDF(orientation='L', unit='mm', format='A4')
+    page = next(p for p in affichage.affichage_plan(plan).pages if p.type == "morceau")
+    DESSIN_PAGES["morceau"](pdf, page, lod)
+    return bytes(pdf.pages[pdf.page].contents).decode("latin-1")
+
+def test_rangee_dessinee_en_un_seul_trace(projet_data):
+    """Tant que les barreaux restent distincts à l'impression, chacun est dessiné, mais la rangée n'a qu'un trait."""
+    plan = _plan_long(projet_data, 60000)
+    nombre = plan["morceaux"][0]["sections_details"][0]["nombre_barreaux"]
+    assert nombre > 400
+    contenu = _page_morceau(plan)
+    assert contenu == _page_morceau(plan, lod=False)
+    rangee = next(l for l in contenu.split(" S\n") if l.count(" re\n") >= nombre - 1)
+    assert rangee.count(" re") == nombre
+
+def test_lod_seulement_si_les_barreaux_se_confondent(projet_data):
+    """Un vide imprimé sous LOD_VIDE_MIN_MM passe la rangée en bloc ; le nombre de barreaux seul n'y suffit pas."""
+    lisible, dense = _plan_long(projet_data, 60000), _plan_long(projet_data, 200000)
+    assert "barreaux, vide" not in _page_morceau(lisible)
+    assert "barreaux, vide" in _page_morceau(dense)
+    assert len(_page_morceau(dense)) < len(_page_morceau(dense, lod=False)) // 10
+
+def test_lod_sans_effet_sur_un_plan_peu_dense(plan_data):
+    """Sous les seuils, le rendu automatique est le rendu exact."""
+    auto, exact = creer_plan_pdf(plan_data), creer_plan_pdf(plan_data, lod=False)
+    assert len(auto) == len(exact)
+
+# --- Tests pour le dessin parallèle ---
+
+def test_pages_paralleles_identiques_au_rendu_sequentiel():
+    """Mêmes pages, même contenu octet pour octet, même numérotation ; l'en-tête n'apparaît que sur la première page."""
+    plan = calculer_plan(ProjectData(**generer_projet(2, 20))).en_dict()
+    pages = affichage.affichage_plan(plan).pages
+    sequentiel, parallele = PlanPDF(orientation='L', unit='mm', format='A4'), PlanPDF(orientation='L', unit='mm', format='A4')
+    for page in pages:
+        sequentiel.dessiner(page)
+    progression = []
+    dessiner_pages_paralleles(parallele, pages, None, 2, lambda faites, total: progression.append(faites))
+    for pdf in (sequentiel, parallele):
+        pdf.add_page()  # écrit le pied de la dernière page
+    assert parallele.page == sequentiel.page > len(pages) // 2
+    for k in range(1, sequentiel.page):
+        assert bytes(parallele.pages[k].contents) == bytes(sequentiel.pages[k].contents), k
+        assert re.search(rb"\(Page %d\) Tj ET( Q)?\n$" % k, bytes(parallele.pages[k].contents))
+    assert progression == list(range(len(pages) + 1))
+    assert sum(b"Plan de Fabrication" in bytes(parallele.pages[k].contents) for k in range(1, parallele.page)) == 1
+    dessin_pdf.fermer_pool_pages()
+
+def test_pdf_parallele_identique_au_pdf_sequentiel():
+    """Le document complet rendu en parallèle est celui du rendu séquentiel, /ID excepté."""
+    for graine, remplissage in ((2, "barreaudage_vertical"), (3, "barreaudage_horizontal")):
+        plan = calculer_plan(ProjectData(**generer_projet(graine, 12, remplissage))).en_dict()
+        assert _sans_horodatage(creer_plan_pdf(plan, workers=2)) == _sans_horodatage(creer_plan_pdf(plan, workers=0))
+    dessin_pdf.fermer_pool_pages()
+
+def test_dessin_parallele_repli_sequentiel(plan_data, monkeypatch):
+    """Si le pool de processus est indisponible, le plan est dessiné en séquentiel."""
+    def pool_indisponible(workers):
+        raise OSError("pas de processus")
+    monkeypatch.setattr(dessin_pdf, "PAGES_MIN", 1)
+    monkeypatch.setattr(dessin_pdf, "pool_pages", pool_indisponible)
+    assert _sans_horodatage(creer_plan_pdf(plan_data, workers=4)) == _sans_horodatage(creer_plan_pdf(plan_data, workers=0))
+
+def test_internes_fpdf_presents():
+    """La recopie des pages dépend d'attributs internes de fpdf2 : ce test casse s'ils changent."""
+    assert dessin_pdf.verifier_internes_fpdf.__wrapped__() is None
+
+def test_internes_fpdf_absents_repli_sans_toucher_au_pool(plan_data, monkeypatch, capsys):
+    """Sans les attributs internes, rendu séquentiel avec un message ; le pool partagé reste en place."""
+    pool = dessin_pdf.pool_pages(2)
+    monkeypatch.setattr(dessin_pdf, "PAGES_MIN", 1)
+    monkeypatch.setattr(dessin_pdf, "verifier_internes_fpdf", lambda: "fpdf2 x : attributs internes absents (FPDF._out)")
+    assert _sans_horodatage(creer_plan_pdf(plan_data, workers=2)) == _sans_horodatage(creer_plan_pdf(plan_data, workers=0))
+    assert "attributs internes absents (FPDF._out)" in capsys.readouterr().out
+    assert dessin_pdf.pool_pages(2) is pool
+    dessin_pdf.fermer_pool_pages()
+
+def test_pool_pages_partage_et_remplace_seulement_casse():
+    """Un seul pool, lancé en spawn, quel que soit le nombre de processus demandé ; seul le pool cassé est remplacé."""
+    pool = dessin_pdf.pool_pages(2)
+    assert dessin_pdf.pool_pages(3) is pool
+    assert pool._mp_context.get_start_method() == "spawn"
+    dessin_pdf.abandonner_pool_pages(ProcessPoolExecutor(max_workers=1))
+    assert dessin_pdf.pool_pages(2) is pool
+    dessin_pdf.abandonner_pool_pages(pool)
+    assert dessin_pdf.pool_pages(2) is not pool
+    dessin_pdf.fermer_pool_pages()
+
+# --- Tests pour /api/draw-pdf ---
+
+def test_draw_pdf_retourne_le_pdf(plan_data):
+    """La route renvoie directement le contenu du PDF."""
+    response = client.post("/api/draw-pdf", json=plan_data)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/pdf"
+    assert "plan_garde_corps.pdf" in response.headers["content-disposition"]
+    assert response.content.startswith(b"%PDF")
@@ -0,0 +1,67 @@
+# test_export_dxf.py
+import collections
+
+from fastapi.testclient import TestClient
+
+from affichage import construire_affichage
+from export_dxf import flux_dxf
+from main import app
+
+client = TestClient(app)
+
+
+def _entites(dxf: str):
+    """Liste des (type, {code: [valeurs]}) de la section ENTITIES."""
+    lignes = dxf.split("\n")
+    paires = list(zip(lignes[0::2], lignes[1::2]))
+    debut = paires.index(("2", "ENTITIES"))
+    entites = []
+    for code, valeur in paires[debut + 1:]:
+        if code == "0":
+            entites.append((valeur, collections.defaultdict(list)))
+        else:
+            entites[-1][1][code].append(valeur)
+    return entites
+
+# --- Tests pour flux_dxf ---
+
+def test_dxf_structure(plan_data):
+    dxf = "".join(flux_dxf(construire_affichage(plan_data)))
+    assert dxf.startswith("0\nSECTION\n2\nHEADER\n")
+    assert dxf.endswith("0\nENDSEC\n0\nEOF\n")
+    for couche in ("POTEAU", "LISSE", "BARREAU", "PLATINE", "TROU", "COTE"):
+        assert f"2\n{couche}\n" in dxf
+
+def test_dxf_barreaux_et_trous(plan_data):
+    """Un contour fermé par barreau (rangées développées) et les quatre trous de la platine à l'entraxe."""
+    entites = _entites("".join(flux_dxf(construire_affichage(plan_data))))
+    barreaux = [e for t, e in entites if t == "POLYLINE" and e["8"] == ["BARREAU"]]
+    assert len(barreaux) == sum(s["nombre_barreaux"] for m in plan_data["morceaux"] for s in m["sections_details"])
+    assert all(e["70"] == ["1"] for _, e in entites if _ == "POLYLINE")
+    trous = [e for t, e in entites if t == "CIRCLE"]
+    assert len(trous) == 4
+    xs = sorted({float(e["10"][0]) for e in trous})
+    ys = sorted({float(e["20"][0]) for e in trous})
+    assert (xs[1] - xs[0], ys[1] - ys[0]) == (110, 110)
+    assert float(trous[0]["40"][0]) == 7
+
+def test_dxf_sans_vue_d_ensemble(plan_data):
+    """La vue d'ensemble, schématique, n'est pas exportée."""
+    titres = [e["1"][0] for t, e in _entites("".join(flux_dxf(construire_affichage(plan_data)))) if t == "TEXT" and e["8"] == ["TEXTE"]]
+    assert len(titres) == 4
+    assert titres[0].startswith("Détail du Morceau")
+    assert titres[2:] == ["Vue de dessus", "Vue de cote"]
+
+# --- Tests pour /api/export-dxf ---
+
+def test_export_dxf_par_identifiant(projet_data):
+    plan_id = client.post("/api/process-data", json=projet_data).json()["plan_id"]
+    response = client.post("/api/export-dxf", json={"plan_id": plan_id})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/dxf"
+    assert "plan_garde_corps.dxf" in response.headers["content-disposition"]
+    assert response.text.endswith("EOF\n")
+
+def test_export_dxf_plan_inconnu():
+    assert client.post("/api/export-dxf", json={"plan_id": "inconnu"}).status_code == 404
+    assert client.post("/api/export-dxf", json={}).status_code == 400
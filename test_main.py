@@ -1,7 +1,15 @@
 # test_main.py
+import time
+
 import pytest
 # On suppose que le fichier main.py est dans le même dossier ou dans le PYTHONPATH
-from main import get_deduction_dimension, get_thickness_dimension, calculate_repartition, RepartitionResult
+from fastapi.testclient import TestClient
+import main
+import moteur
+from cache_plans import StockPlans
+from main import app, get_deduction_dimension, get_thickness_dimension, calculate_repartition, calculate_repartition_batch, RepartitionResult, NomenclatureItem, fusionner_nomenclatures
+
+client = TestClient(app)
 
 # --- Tests pour get_deduction_dimension ---
 
@@ -95,3 +103,113 @@ def test_calculate_repartition_exact_fit():
     assert result.nombre_barreaux == 3
     assert result.vide_entre_barreaux_mm == pytest.approx(100)
     assert result.jeu_depart_mm == pytest.approx(100)
+
+# --- Tests pour calculate_repartition_batch ---
+
+def test_calculate_repartition_batch_identique_au_scalaire():
+    """Chaque ligne du calcul vectorisé est strictement égale au calcul scalaire."""
+    cas = [(940, 20, 110), (0, 20, 110), (-100, 20, 110), (200, 20, 110), (100, 20, 110), (460, 20, 100),
+           (1000, 0, 110), (1000, 20, 0), (1000, 20, -5), (130, 20, 110), (2999.5, 25.4, 109.9)]
+    cas += [(l / 3, e, g) for l in range(0, 6000, 97) for e in (12, 20, 25.4) for g in (90, 110, 120)]
+    nombres, vides, jeux = calculate_repartition_batch([c[0] for c in cas], [c[1] for c in cas], [c[2] for c in cas])
+    for k, (longueur, epaisseur, ecart) in enumerate(cas):
+        attendu = calculate_repartition(longueur, epaisseur, ecart)
+        assert nombres[k] == attendu.nombre_barreaux
+        assert vides[k] == attendu.vide_entre_barreaux_mm
+        assert jeux[k] == attendu.jeu_depart_mm
+
+def test_calculate_repartition_batch_scalaires_diffuses():
+    """Épaisseur et écart scalaires s'appliquent à toutes les sections."""
+    nombres, vides, jeux = calculate_repartition_batch([940, 200, 0], 20, 110)
+    assert nombres.tolist() == [7, 1, 0]
+    assert vides.tolist() == pytest.approx([100, 90, 0])
+    assert jeux.tolist() == pytest.approx([100, 90, 0])
+
+# --- Tests pour fusionner_nomenclatures ---
+
+def test_fusionner_nomenclatures():
+    """Les quantités s'additionnent par article, les longueurs de lisses se cumulent."""
+    a = [NomenclatureItem(item="Poteaux", details="40x40", quantite=2, longueur_unitaire_mm=1020),
+         NomenclatureItem(item="Lisse Haute", details="40x40", quantite=1, longueur_unitaire_mm=3000)]
+    b = [NomenclatureItem(item="Poteaux", details="40x40", quantite=3, longueur_unitaire_mm=1020),
+         NomenclatureItem(item="Poteaux", details="40x40", quantite=1, longueur_unitaire_mm=900),
+         NomenclatureItem(item="Lisse Haute", details="40x40", quantite=1, longueur_unitaire_mm=1500)]
+    fusion = fusionner_nomenclatures([a, b])
+    assert [(n.item, n.quantite, n.longueur_unitaire_mm) for n in fusion] == [
+        ("Poteaux", 5, 1020), ("Lisse Haute", 1, 4500), ("Poteaux", 1, 900)]
+    assert a[0].quantite == 2
+
+# --- Tests pour /api/process-batch ---
+
+def test_process_batch(projet_data):
+    """Chaque projet est calculé comme par process-data, les erreurs sont isolées."""
+    seul = client.post("/api/process-data", json=projet_data).json()["data"]
+    invalide = dict(projet_data)
+    del invalide["hauteur_totale"]
+    response = client.post("/api/process-batch", json=[projet_data, invalide, projet_data])
+    assert response.status_code == 200
+    resultat = response.json()
+    assert resultat["status"] == "partial"
+    assert resultat["nombre_erreurs"] == 1
+    assert [r["status"] for r in resultat["resultats"]] == ["success", "error", "success"]
+    assert resultat["resultats"][0]["data"] == seul
+    quantites = {n["item"]: n["quantite"] for n in seul["nomenclature"]}
+    quantites_globales = {n["item"]: n["quantite"] for n in resultat["nomenclature_globale"]}
+    assert quantites_globales["Poteaux"] == 2 * quantites["Poteaux"]
+    assert quantites_globales["Barreaux"] == 2 * quantites["Barreaux"]
+
+def test_process_batch_stockage_sur_demande(projet_data, monkeypatch):
+    """Sans `stocker`, un lot ne touche pas au stock partagé ; avec, chaque plan y est retrouvable."""
+    stock = StockPlans()
+    monkeypatch.setattr(main, "stock_plans", stock)
+    resultat = client.post("/api/process-batch", json=[projet_data] * 3).json()
+    assert len(stock) == 0 and all("plan_id" not in r for r in resultat["resultats"])
+    resultat = client.post("/api/process-batch?stocker=true", json=[projet_data] * 3).json()
+    assert len(stock) == 3
+    assert all(stock.get(r["plan_id"]) == r["data"] for r in resultat["resultats"])
+
+def test_process_batch_trop_de_projets(projet_data):
+    """Au-delà de MAX_PROJETS_BATCH projets, le lot est refusé sans être calculé."""
+    response = client.post("/api/process-batch", json=[projet_data] * (main.MAX_PROJETS_BATCH + 1))
+    assert response.status_code == 413
+
+# --- Tests pour /api/sweep ---
+
+def test_sweep_identique_a_process_data(projet_data):
+    """Chaque variante donne la même nomenclature qu'un appel process-data avec ces paramètres."""
+    for remplissage_type in ("barreaudage_vertical", "barreaudage_horizontal"):
+        projet = dict(projet_data, remplissage_type=remplissage_type)
+        response = client.post("/api/sweep", json={"projet": projet, "ecart_barreaux": {"debut": 90, "fin": 120, "pas": 15}, "barreau_dims": ["20x20", "12x12"], "poteau_dims": ["40x40", "50x30"]})
+        assert response.status_code == 200
+        resultat = response.json()
+        assert resultat["nombre_variantes"] == 3 * 2 * 2
+        for variante in resultat["variantes"][::2]:
+            attendu = client.post("/api/process-data", json=dict(projet, **variante["parametres"])).json()["data"]
+            assert variante["nomenclature"] == attendu["nomenclature"]
+            assert variante["nombre_barreaux"] == sum(n["quantite"] for n in attendu["nomenclature"] if n["item"].startswith("Barreaux"))
+
+def test_sweep_par_blocs_d_ecarts(projet_data, monkeypatch):
+    """Découpé en petits blocs d'écarts, le sweep donne exactement les mêmes variantes."""
+    demande = {"projet": projet_data, "ecart_barreaux": {"debut": 80, "fin": 130, "pas": 5}, "barreau_dims": ["20x20", "12x12"]}
+    attendu = client.post("/api/sweep", json=demande).json()
+    monkeypatch.setattr(moteur, "CELLULES_BLOC_SWEEP", 3)
+    assert client.post("/api/sweep", json=demande).json() == attendu
+
+def test_sweep_profil_invalide(projet_data):
+    """Un profil illisible dans les listes du sweep est refusé à la validation."""
+    for champ in ("barreau_dims", "poteau_dims"):
+        response = client.post("/api/sweep", json={"projet": projet_data, champ: ["20x20", "n'importe quoi"]})
+        assert response.status_code == 422
+
+def test_sweep_trop_de_variantes(projet_data):
+    """Un produit cartésien trop grand est refusé."""
+    response = client.post("/api/sweep", json={"projet": projet_data, "ecart_barreaux": {"debut": 1, "fin": 100000}})
+    assert response.status_code == 422
+
+def test_sweep_plage_geante_refusee_sans_allocation(projet_data):
+    """Une plage d'un milliard d'écarts est refusée d'après sa taille, sans être dépliée."""
+    debut = time.perf_counter()
+    response = client.post("/api/sweep", json={"projet": projet_data, "ecart_barreaux": {"debut": 1, "fin": 1_000_000_000}})
+    assert response.status_code == 422
+    assert "1000000000 variantes" in response.json()["detail"]
+    assert time.perf_counter() - debut < 1
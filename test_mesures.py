@@ -0,0 +1,62 @@
+# test_mesures.py
+import pytest
+from fastapi.testclient import TestClient
+
+import mesures
+from main import app
+
+client = TestClient(app)
+
+# Sans objet quand la suite tourne avec MESURES=0.
+actives = pytest.mark.skipif(not mesures.ACTIVES, reason="mesures désactivées")
+
+
+def etapes_server_timing(reponse):
+    return [element.split(";")[0].strip() for element in reponse.headers["Server-Timing"].split(",")]
+
+# --- Tests pour Server-Timing ---
+
+@actives
+def test_server_timing_du_calcul(projet_data):
+    reponse = client.post("/api/process-data", json=projet_data)
+    assert etapes_server_timing(reponse) == ["validation", "calcul", "serialisation", "total"]
+
+@actives
+def test_server_timing_du_rendu_dans_le_pool(projet_data):
+    """Les étapes du rendu, exécutées dans un thread du pool, remontent dans l'en-tête de la requête."""
+    plan = client.post("/api/process-data", json=projet_data).json()["data"]
+    plan["description_projet"] += " (server-timing)"  # évite le cache des PDF
+    etapes = etapes_server_timing(client.post("/api/draw-pdf", json=plan))
+    assert {"validation", "affichage", "page_ensemble", "page_morceau", "pdf_output", "total"} <= set(etapes)
+
+# --- Tests pour /metrics ---
+
+@actives
+def test_metrics_format_prometheus(projet_data):
+    client.post("/api/process-data", json=projet_data)
+    texte = client.get("/metrics").text
+    assert "# TYPE garde_corps_requete_duree_secondes histogram" in texte
+    assert 'garde_corps_requetes_total{route="/api/process-data",methode="POST",statut="200"}' in texte
+    assert 'garde_corps_etape_duree_secondes_bucket{etape="calcul",le="+Inf"}' in texte
+    assert "garde_corps_plan_sections_count" in texte
+
+@actives
+def test_histogramme_cumulatif():
+    histogramme = mesures.Histogramme("test_duree", "Test.", (0.1, 1), ("route",))
+    mesures.REGISTRE.remove(histogramme)
+    for valeur in (0.05, 0.1, 0.5, 3):
+        histogramme.observer(valeur, route='a"b')
+    assert histogramme.exposer()[2:] == [
+        'test_duree_bucket{route="a\\"b",le="0.1"} 2',
+        'test_duree_bucket{route="a\\"b",le="1.0"} 3',
+        'test_duree_bucket{route="a\\"b",le="+Inf"} 4',
+        'test_duree_sum{route="a\\"b"} 3.65',
+        'test_duree_count{route="a\\"b"} 4',
+    ]
+
+def test_mesures_desactivees(monkeypatch):
+    monkeypatch.setattr(mesures, "ACTIVES", False)
+    with mesures.etape("calcul") as e:
+        pass
+    assert e is mesures._RIEN
+    assert client.get("/metrics").status_code == 404
@@ -0,0 +1,172 @@
+# test_moteur.py
+import json
+
+from main import FinalPlanData, ProjectData
+from moteur import LigneNomenclature, Plan, calculer_plan
+
+# --- Tests pour le modèle interne du plan ---
+
+# Sorties de /api/process-data avant le moteur à slots (modèles pydantic), pour un morceau
+# poteau / 1500 / liaison / 1000 / poteau ; `groupes_morceaux` n'existait pas encore.
+ATTENDUS_PROCESS_DATA = {
+    "vertical_platine": {
+        "description_projet": "Garde-corps détaillé en 1 morceau(x).",
+        "nomenclature": [
+            {"item": "Poteaux", "details": "40x40", "quantite": 2, "longueur_unitaire_mm": 1020},
+            {"item": "Liaisons", "details": "40x20", "quantite": 1, "longueur_unitaire_mm": 1020},
+            {"item": "Lisse Haute", "details": "40x40", "quantite": 1, "longueur_unitaire_mm": 2400},
+            {"item": "Lisse Basse", "details": "40x40", "quantite": 1, "longueur_unitaire_mm": 2400},
+            {"item": "Barreaux", "details": "20x20", "quantite": 18, "longueur_unitaire_mm": 840},
+        ],
+        "morceaux": [
+            {
+                "id": 0,
+                "longueur_totale": 2500.0,
+                "structure": [
+                    {"type": "poteau", "longueur": None},
+                    {"type": "section", "longueur": 1500},
+                    {"type": "liaison", "longueur": None},
+                    {"type": "section", "longueur": 1000},
+                    {"type": "poteau", "longueur": None},
+                ],
+                "sections_details": [
+                    {"longueur_section": 1500.0, "longueur_libre": 1450.0, "nombre_barreaux": 11, "vide_entre_barreaux_mm": 102.5, "jeu_depart_mm": 102.5},
+                    {"longueur_section": 1000.0, "longueur_libre": 950.0, "nombre_barreaux": 7, "vide_entre_barreaux_mm": 101.25, "jeu_depart_mm": 101.25},
+                ],
+            },
+        ],
+        "hauteur_totale": 1020,
+        "hauteur_lisse_basse": 100,
+        "poteau_dims": "40x40",
+        "liaison_dims": "40x20",
+        "lissehaute_dims": "40x40",
+        "lissebasse_dims": "40x40",
+        "barreau_dims": "20x20",
+        "platine_details": {"longueur": 150.0, "largeur": 150.0, "epaisseur": 10.0, "nombre_trous": 4, "diametre_trous": 14.0, "entraxe_longueur": 110.0, "entraxe_largeur": 110.0},
+        "remplissage_type": "barreaudage_vertical",
+        "remplissage_details": None,
+    },
+    "horizontal_scellement": {
+        "description_projet": "Garde-corps détaillé en 1 morceau(x).",
+        "nomenclature": [
+            {"item": "Poteaux", "details": "40x40", "quantite": 2, "longueur_unitaire_mm": 1020},
+            {"item": "Liaisons", "details": "40x20", "quantite": 1, "longueur_unitaire_mm": 1020},
+            {"item": "Lisse Haute", "details": "40x40", "quantite": 1, "longueur_unitaire_mm": 2400},
+            {"item": "Lisse Basse", "details": "40x40", "quantite": 1, "longueur_unitaire_mm": 2400},
+            {"item": "Barreaux L=1450mm", "details": "20x20", "quantite": 6, "longueur_unitaire_mm": 1450},
+            {"item": "Barreaux L=950mm", "details": "20x20", "quantite": 6, "longueur_unitaire_mm": 950},
+        ],
+        "morceaux": [
+            {
+                "id": 0,
+                "longueur_totale": 2500.0,
+                "structure": [
+                    {"type": "poteau", "longueur": None},
+                    {"type": "section", "longueur": 1500},
+                    {"type": "liaison", "longueur": None},
+                    {"type": "section", "longueur": 1000},
+                    {"type": "poteau", "longueur": None},
+                ],
+                "sections_details": [
+                    {"longueur_section": 1500.0, "longueur_libre": 1450.0, "nombre_barreaux": 0, "vide_entre_barreaux_mm": 0.0, "jeu_depart_mm": 0.0},
+                    {"longueur_section": 1000.0, "longueur_libre": 950.0, "nombre_barreaux": 0, "vide_entre_barreaux_mm": 0.0, "jeu_depart_mm": 0.0},
+                ],
+            },
+        ],
+        "hauteur_totale": 1020,
+        "hauteur_lisse_basse": 100,
+        "poteau_dims": "40x40",
+        "liaison_dims": "40x20",
+        "lissehaute_dims": "40x40",
+        "lissebasse_dims": "40x40",
+        "barreau_dims": "20x20",
+        "platine_details": None,
+        "remplissage_type": "barreaudage_horizontal",
+        "remplissage_details": {"nombre_barreaux": 6, "vide_entre_barreaux_mm": 102.85714285714286, "jeu_depart_mm": 102.85714285714286},
+    },
+    "verre_platine": {
+        "description_projet": "Garde-corps détaillé en 1 morceau(x).",
+        "nomenclature": [
+            {"item": "Poteaux", "details": "40x40", "quantite": 2, "longueur_unitaire_mm": 1020},
+            {"item": "Liaisons", "details": "40x20", "quantite": 1, "longueur_unitaire_mm": 1020},
+            {"item": "Lisse Haute", "details": "40x40", "quantite": 1, "longueur_unitaire_mm": 2400},
+            {"item": "Lisse Basse", "details": "40x40", "quantite": 1, "longueur_unitaire_mm": 2400},
+        ],
+        "morceaux": [
+            {
+                "id": 0,
+                "longueur_totale": 2500.0,
+                "structure": [
+                    {"type": "poteau", "longueur": None},
+                    {"type": "section", "longueur": 1500},
+                    {"type": "liaison", "longueur": None},
+                    {"type": "section", "longueur": 1000},
+                    {"type": "poteau", "longueur": None},
+                ],
+                "sections_details": [
+                    {"longueur_section": 1500.0, "longueur_libre": 1450.0, "nombre_barreaux": 0, "vide_entre_barreaux_mm": 0.0, "jeu_depart_mm": 0.0},
+                    {"longueur_section": 1000.0, "longueur_libre": 950.0, "nombre_barreaux": 0, "vide_entre_barreaux_mm": 0.0, "jeu_depart_mm": 0.0},
+                ],
+            },
+        ],
+        "hauteur_totale": 1020,
+        "hauteur_lisse_basse": 100,
+        "poteau_dims": "40x40",
+        "liaison_dims": "40x20",
+        "lissehaute_dims": "40x40",
+        "lissebasse_dims": "40x40",
+        "barreau_dims": "20x20",
+        "platine_details": {"longueur": 150.0, "largeur": 150.0, "epaisseur": 10.0, "nombre_trous": 4, "diametre_trous": 14.0, "entraxe_longueur": 110.0, "entraxe_largeur": 110.0},
+        "remplissage_type": "verre",
+        "remplissage_details": None,
+    },
+}
+VARIANTES_PROCESS_DATA = {
+    "vertical_platine": {},
+    "horizontal_scellement": {"remplissage_type": "barreaudage_horizontal", "type_fixation": "scellement"},
+    "verre_platine": {"remplissage_type": "verre"},
+}
+
+def test_en_dict_identique_a_l_ancien_process_data(projet_data):
+    """Vertical, horizontal, avec et sans platine : même JSON (valeurs, clés, ordre) que l'ancien calcul."""
+    morceau = {"nombre_sections": 2, "structure": [
+        {"type": "poteau"}, {"type": "section", "longueur": 1500},
+        {"type": "liaison"}, {"type": "section", "longueur": 1000},
+        {"type": "poteau"},
+    ]}
+    for nom, variante in VARIANTES_PROCESS_DATA.items():
+        plan = calculer_plan(ProjectData(**{**projet_data, "nombre_morceaux": 1, "morceaux": [morceau], **variante})).en_dict()
+        del plan["groupes_morceaux"]
+        assert json.dumps(plan) == json.dumps(ATTENDUS_PROCESS_DATA[nom]), nom
+
+def test_en_dict_identique_aux_modeles_pydantic(projet_data):
+    """Le JSON du moteur est celui qu'aurait produit FinalPlanData (clés, ordre et types)."""
+    for remplissage in ("barreaudage_vertical", "barreaudage_horizontal", "verre"):
+        plan = calculer_plan(ProjectData(**{**projet_data, "remplissage_type": remplissage})).en_dict()
+        assert json.dumps(plan) == json.dumps(FinalPlanData(**plan).model_dump())
+
+def test_plan_sans_dict_par_instance(projet_data):
+    """Les objets du moteur sont à slots : pas de __dict__ par instance."""
+    plan = calculer_plan(ProjectData(**projet_data))
+    assert isinstance(plan, Plan)
+    for objet in (plan, plan.morceaux[0], plan.morceaux[0].sections_details[0], plan.nomenclature[0], plan.platine_details):
+        assert not hasattr(objet, "__dict__")
+    assert isinstance(plan.nomenclature[0], LigneNomenclature)
+
+# --- Tests pour le regroupement des morceaux identiques ---
+
+def test_morceaux_identiques_calcules_une_fois(projet_data):
+    """Des morceaux identiques donnent le même plan que s'ils étaient calculés un par un, et un seul groupe."""
+    morceaux = [projet_data["morceaux"][1]] * 3 + [projet_data["morceaux"][0]]
+    plan = calculer_plan(ProjectData(**{**projet_data, "nombre_morceaux": 4, "morceaux": morceaux}))
+    assert plan.groupes_morceaux == [[0, 1, 2], [3]]
+    assert [m.id for m in plan.morceaux] == [0, 1, 2, 3]
+    assert plan.morceaux[0].sections_details == plan.morceaux[2].sections_details
+    seul = calculer_plan(ProjectData(**{**projet_data, "nombre_morceaux": 1, "morceaux": morceaux[:1]}))
+    poteaux = {n.item: n.quantite for n in plan.nomenclature}["Poteaux"]
+    assert poteaux == 3 * {n.item: n.quantite for n in seul.nomenclature}["Poteaux"] + 2
+
+def test_indication_morceaux_identiques_verifiee(projet_data):
+    """« morceaux_identiques: oui » ne regroupe pas des morceaux différents."""
+    plan = calculer_plan(ProjectData(**{**projet_data, "morceaux_identiques": "oui"}))
+    assert plan.groupes_morceaux == [[0], [1]]
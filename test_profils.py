@@ -0,0 +1,55 @@
+# test_profils.py
+import dataclasses
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from profils import PROFIL_VIDE, ProfileSpec, ProfilInvalideError, get_deduction_dimension, lire_profil
+
+# --- Tests pour ProfileSpec ---
+
+def test_profil_rectangulaire():
+    """Largeur, profondeur et forme d'un tube rectangulaire."""
+    assert ProfileSpec.depuis_texte("40x20") == ProfileSpec(largeur=40, profondeur=20, epaisseur_paroi=None, forme="rectangulaire")
+
+def test_profil_avec_paroi():
+    """La 3ème dimension est l'épaisseur de paroi."""
+    profil = ProfileSpec.depuis_texte("50x8x2")
+    assert (profil.largeur, profil.profondeur, profil.epaisseur_paroi) == (50, 8, 2)
+
+def test_profil_formes():
+    """Carré, rond et plat sont reconnus."""
+    assert ProfileSpec.depuis_texte("40x40").forme == "carre"
+    assert ProfileSpec.depuis_texte("Ø20").forme == "rond"
+    assert ProfileSpec.depuis_texte("plat 40x8").forme == "plat"
+    assert ProfileSpec.depuis_texte("").forme == "vide"
+
+def test_profil_rond_a_paroi():
+    """Rond : le diamètre en largeur et profondeur, le 2ème nombre en épaisseur de paroi ; la déduction historique est gardée."""
+    profil = ProfileSpec.depuis_texte("Ø42.4x2")
+    assert (profil.largeur, profil.profondeur, profil.epaisseur_paroi, profil.forme) == (42.4, 42.4, 2, "rond")
+    assert get_deduction_dimension("Ø42.4x2") == profil.deduction == 2
+    assert get_deduction_dimension("Ø20") == 20
+
+def test_profil_immuable_et_partage():
+    """Le profilé est immuable et la même désignation renvoie le même objet."""
+    profil = lire_profil("40x40")
+    assert profil is lire_profil("40x40")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        profil.largeur = 10
+
+def test_profil_invalide():
+    """La version stricte explique l'erreur, la version tolérante renvoie un profilé nul."""
+    with pytest.raises(ProfilInvalideError, match="aucune dimension"):
+        ProfileSpec.depuis_texte("abc")
+    assert lire_profil("abc") is PROFIL_VIDE
+
+# --- Tests pour la validation de ProjectData ---
+
+def test_process_data_refuse_profil_invalide(projet_data):
+    """Un profilé illisible est refusé avec un message explicite."""
+    projet_data["poteau_dims"] = "tube carré"
+    response = TestClient(app).post("/api/process-data", json=projet_data)
+    assert response.status_code == 422
+    assert "aucune dimension" in response.text
@@ -0,0 +1,190 @@
+# test_rendu.py
+import asyncio
+import io
+import threading
+import time
+import zipfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from cache_plans import CachePDF
+from rendu import PoolRendu, PoolSatureError, RenduInterrompu, flux_zip
+
+# --- Tests pour PoolRendu ---
+
+def test_pool_execute_hors_boucle():
+    """Le rendu tourne dans un autre thread que la boucle d'événements."""
+    pool = PoolRendu(workers=2, file_max=0)
+
+    async def scenario():
+        return await pool.executer(threading.get_ident)
+
+    try:
+        assert asyncio.run(scenario()) != threading.get_ident()
+    finally:
+        pool.fermer()
+
+def test_pool_sature():
+    """Au-delà de workers + file_max rendus en cours, la demande est refusée."""
+    pool = PoolRendu(workers=1, file_max=1)
+    liberation = threading.Event()
+
+    async def scenario():
+        taches = [asyncio.ensure_future(pool.executer(liberation.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        assert pool.sature()
+        with pytest.raises(PoolSatureError):
+            await pool.executer(liberation.wait)
+        liberation.set()
+        await asyncio.gather(*taches)
+        assert pool.en_cours == 0
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        pool.fermer()
+
+def _rendu_lent(pages, progression=None):
+    """Rendu factice d'un worker : `pages` pages de 50 ms."""
+    for numero in range(pages + 1):
+        if numero:
+            time.sleep(0.05)
+        progression(numero, pages)
+    return b"%PDF-factice"
+
+def test_executer_bloquant_compte_dans_la_limite():
+    """Un rendu en arrière-plan occupe le pool : /api/draw-pdf voit le pool saturé."""
+    pool = PoolRendu(workers=1, file_max=0)
+    liberation = threading.Event()
+    thread = threading.Thread(target=pool.executer_bloquant, args=(lambda progression: liberation.wait(5),))
+    thread.start()
+    try:
+        while pool.en_cours == 0:
+            time.sleep(0.01)
+        with pytest.raises(PoolSatureError):
+            asyncio.run(pool.executer(liberation.wait))
+    finally:
+        liberation.set()
+        thread.join()
+        pool.fermer()
+    assert pool.en_cours == 0
+
+def test_executer_bloquant_process_relaie_progression_et_annulation():
+    """En mode process, la progression du worker remonte, et l'annulation l'arrête en cours de rendu."""
+    pool = PoolRendu(mode="process", workers=1)
+    try:
+        vues = []
+        assert pool.executer_bloquant(_rendu_lent, 4, progression=lambda faites, total: vues.append((faites, total))) == b"%PDF-factice"
+        assert vues[-1] == (4, 4) and vues == sorted(vues)
+
+        vues.clear()
+        def progression(faites, total):
+            vues.append(faites)
+            if faites >= 2:
+                raise RenduInterrompu()
+        with pytest.raises(RenduInterrompu):
+            pool.executer_bloquant(_rendu_lent, 40, progression=progression)
+        assert max(vues) < 40
+    finally:
+        pool.fermer()
+
+def test_reservation_compte_dans_la_limite():
+    """Les places retenues saturent le pool pour les autres ; leurs rendus ne sont jamais refusés."""
+    pool = PoolRendu(workers=2, file_max=1)
+
+    async def scenario():
+        reservation = pool.reserver(5)
+        assert reservation.places == 3 and pool.sature()
+        with pytest.raises(PoolSatureError):
+            await pool.executer(threading.get_ident)
+        with pytest.raises(PoolSatureError):
+            pool.reserver(1)
+        assert await asyncio.gather(*(reservation.executer(lambda n: n, n) for n in range(3))) == [0, 1, 2]
+        reservation.liberer()
+        reservation.liberer()
+        assert pool.en_cours == 0
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        pool.fermer()
+
+def test_pool_mode_invalide():
+    """Un mode inconnu est refusé à la construction."""
+    with pytest.raises(ValueError):
+        PoolRendu(mode="gpu")
+
+# --- Tests pour /api/draw-pdf ---
+
+def test_draw_pdf_sature_retourne_503(plan_data, monkeypatch):
+    """Quand le pool est saturé, la route répond 503 avec Retry-After."""
+    pool = PoolRendu(workers=1, file_max=0, retry_after=7)
+    pool.en_cours = 1
+    monkeypatch.setattr(main, "pool_rendu", pool)
+    monkeypatch.setattr(main, "cache_pdf", CachePDF())
+    response = TestClient(main.app).post("/api/draw-pdf", json=plan_data)
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "7"
+
+# --- Tests pour flux_zip ---
+
+def test_flux_zip_fenetre_et_erreurs():
+    """Au plus `fenetre` rendus simultanés ; un rendu en échec n'interrompt pas l'archive."""
+    actifs, pic = [0], [0]
+
+    async def rendre(n):
+        actifs[0] += 1
+        pic[0] = max(pic[0], actifs[0])
+        await asyncio.sleep(0.001 * (5 - n))
+        actifs[0] -= 1
+        if n == 3:
+            raise RuntimeError("échec")
+        return f"pdf {n}".encode()
+
+    async def scenario():
+        morceaux = []
+        async for morceau in flux_zip([(f"{n}.pdf", n) for n in range(5)], rendre, fenetre=2):
+            morceaux.append(morceau)
+        return b"".join(morceaux)
+
+    archive = zipfile.ZipFile(io.BytesIO(asyncio.run(scenario())))
+    assert pic[0] == 2
+    assert sorted(archive.namelist()) == ["0.pdf", "1.pdf", "2.pdf", "3.pdf.erreur.txt", "4.pdf"]
+    assert archive.read("4.pdf") == b"pdf 4"
+
+# --- Tests pour /api/draw-pdf-zip ---
+
+def test_draw_pdf_zip(plan_data, projet_data):
+    """Plans envoyés et plans stockés sont rendus dans une seule archive."""
+    client = TestClient(main.app)
+    plan_id = client.post("/api/process-data", json=projet_data).json()["plan_id"]
+    response = client.post("/api/draw-pdf-zip", json={"plans": [plan_data, plan_data], "plan_ids": [plan_id]})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert len(archive.namelist()) == 3
+    assert all(archive.read(nom).startswith(b"%PDF") for nom in archive.namelist())
+    assert client.post("/api/draw-pdf-zip", json={"plan_ids": ["inconnu"]}).status_code == 404
+
+def test_draw_pdf_zip_reserve_ses_places(plan_data, monkeypatch):
+    """L'export retient ses places pendant l'envoi et les rend à la fin ; pool plein, il répond 503."""
+    pool = PoolRendu(workers=2, file_max=0)
+    occupation = []
+    monkeypatch.setattr(main, "pool_rendu", pool)
+    monkeypatch.setattr(main, "cache_pdf", CachePDF())
+    monkeypatch.setattr(main.dessin_pdf, "creer_plan_pdf", lambda plan: occupation.append(pool.en_cours) or b"%PDF-factice")
+    client = TestClient(main.app)
+    plans = [dict(plan_data, poteau_dims=f"{40 + i}x40") for i in range(5)]
+    try:
+        assert client.post("/api/draw-pdf-zip", json={"plans": plans}).status_code == 200
+        assert occupation == [2] * 5
+        assert pool.en_cours == 0
+        pool.en_cours = 2
+        response = client.post("/api/draw-pdf-zip", json={"plans": plans})
+        assert response.status_code == 503
+        assert pool.en_cours == 2
+    finally:
+        pool.fermer()
+
@@ -0,0 +1,99 @@
+# test_sessions_plan.py
+import copy
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import ProjectData, app
+from moteur import calculer_plan
+from sessions_plan import SessionPlan
+
+client = TestClient(app)
+
+
+def appliquer_diff(plan, diff):
+    """Applique des opérations `replace` de JSON Patch à un plan (dict)."""
+    plan = copy.deepcopy(plan)
+    for operation in diff:
+        assert operation["op"] == "replace"
+        *chemin, dernier = operation["path"].lstrip("/").split("/")
+        cible = plan
+        for cle in chemin:
+            cible = cible[int(cle)] if isinstance(cible, list) else cible[cle]
+        if isinstance(cible, list):
+            cible[int(dernier)] = operation["value"]
+        else:
+            cible[dernier] = operation["value"]
+    return plan
+
+
+def modifier_projet(projet, patch):
+    """Même modification, appliquée au projet complet."""
+    if patch["op"] == "ecart_barreaux":
+        projet["ecart_barreaux"] = patch["valeur"]
+        return
+    sections = [item for item in projet["morceaux"][patch["morceau"]]["structure"] if item["type"] == "section"]
+    sections[patch["section"]]["longueur"] = patch["longueur"]
+
+# --- Tests pour SessionPlan ---
+
+@pytest.mark.parametrize("remplissage", ["barreaudage_vertical", "barreaudage_horizontal"])
+def test_patchs_identiques_au_recalcul_complet(projet_data, remplissage):
+    """Après chaque modification, le plan de la session et le plan reçu + diff valent le recalcul complet.
+
+    Trois morceaux identiques au départ : les modifications séparent et réunissent les groupes.
+    """
+    morceaux = [copy.deepcopy(projet_data["morceaux"][i]) for i in (0, 1, 1, 1)]
+    projet = {**projet_data, "remplissage_type": remplissage, "nombre_morceaux": 4, "morceaux": morceaux}
+    session = SessionPlan(ProjectData(**projet))
+    plan_client = session.en_dict()
+    assert plan_client["groupes_morceaux"] == [[0], [1, 2, 3]]
+    alea = random.Random(3)
+    for _ in range(60):
+        if alea.random() < 0.2:
+            patch = {"op": "ecart_barreaux", "valeur": alea.randint(60, 200)}
+        else:
+            m = alea.randrange(4)
+            longueur = alea.choice([1000, 1500, 2000, alea.randint(0, 3000)])
+            patch = {"op": "section", "morceau": m, "section": alea.randrange(2 if m == 0 else 1), "longueur": longueur}
+        diff = session.appliquer([patch])
+        modifier_projet(projet, patch)
+        attendu = calculer_plan(ProjectData(**projet)).en_dict()
+        assert session.en_dict() == attendu
+        plan_client = appliquer_diff(plan_client, diff)
+        assert plan_client == attendu
+
+
+def test_diff_limite_a_la_section_modifiee(projet_data):
+    """Changer une section ne renvoie que cette section, son morceau et la nomenclature."""
+    session = SessionPlan(ProjectData(**projet_data))
+    diff = session.appliquer([{"op": "section", "morceau": 0, "section": 1, "longueur": 2500}])
+    chemins = [d["path"] for d in diff]
+    assert chemins == ["/morceaux/0/longueur_totale", "/morceaux/0/structure/3/longueur", "/morceaux/0/sections_details/1", "/nomenclature"]
+    assert session.version == 1
+
+
+def test_patch_invalide_laisse_la_session_intacte(projet_data):
+    """Une liste contenant une modification invalide n'applique rien."""
+    session = SessionPlan(ProjectData(**projet_data))
+    avant = session.en_dict()
+    with pytest.raises(ValueError):
+        session.appliquer([{"op": "section", "morceau": 0, "section": 0, "longueur": 1800}, {"op": "section", "morceau": 1, "section": 5, "longueur": 10}])
+    assert session.en_dict() == avant
+    assert session.version == 0
+
+# --- Tests pour les routes /api/sessions ---
+
+def test_routes_sessions(projet_data):
+    """Création, modification avec contrôle de version, relecture."""
+    creation = client.post("/api/sessions", json=projet_data).json()
+    session_id = creation["session_id"]
+    reponse = client.patch(f"/api/sessions/{session_id}", json={"version": 0, "patches": [{"op": "ecart_barreaux", "valeur": 90}]})
+    assert reponse.status_code == 200
+    assert reponse.json()["version"] == 1
+    plan = appliquer_diff(creation["data"], reponse.json()["diff"])
+    assert client.get(f"/api/sessions/{session_id}").json()["data"] == plan
+    assert client.patch(f"/api/sessions/{session_id}", json={"version": 0, "patches": []}).status_code == 409
+    assert client.patch(f"/api/sessions/{session_id}", json={"patches": [{"op": "hauteur"}]}).status_code == 422
+    assert client.patch("/api/sessions/inconnue", json={"patches": []}).status_code == 404
@@ -0,0 +1,112 @@
+# test_travaux.py
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from rendu import RenduInterrompu
+from travaux import ANNULE, ECHEC, TERMINE, TravauxRendu, TravauxSaturesError
+
+client = TestClient(app)
+
+
+def attendre(travaux, travail_id, etats=(TERMINE, ECHEC, ANNULE), delai=10):
+    fin = time.monotonic() + delai
+    while time.monotonic() < fin:
+        travail = travaux.get(travail_id)
+        if travail is None or travail.etat in etats:
+            return travail
+        time.sleep(0.01)
+    raise AssertionError("travail non terminé")
+
+
+def rendu_bloque(liberation, pages=3):
+    """Rendu factice : une page, puis attend `liberation` avant les suivantes."""
+    def rendre(progression):
+        progression(0, pages)
+        progression(1, pages)
+        liberation.wait(5)
+        for numero in range(2, pages + 1):
+            progression(numero, pages)
+        return b"%PDF-factice"
+    return rendre
+
+# --- Tests pour TravauxRendu ---
+
+def test_progression_et_resultat():
+    travaux = TravauxRendu(concurrence=1)
+    liberation = threading.Event()
+    travail = travaux.soumettre(rendu_bloque(liberation))
+    while travail.pages_faites < 1:
+        time.sleep(0.01)
+    assert (travail.etat, travail.pages_faites, travail.pages_total) == ("en_cours", 1, 3)
+    liberation.set()
+    travail = attendre(travaux, travail.id)
+    assert travail.en_dict()["etat"] == TERMINE and travail.en_dict()["pages_faites"] == 3
+    assert travail.resultat == b"%PDF-factice"
+    travaux.fermer()
+
+def test_annulation_en_cours_et_en_attente():
+    """Le rendu en cours s'arrête à la page suivante ; celui en attente ne démarre jamais."""
+    travaux = TravauxRendu(concurrence=1)
+    liberation = threading.Event()
+    en_cours = travaux.soumettre(rendu_bloque(liberation))
+    en_attente = travaux.soumettre(rendu_bloque(liberation))
+    while en_cours.pages_faites < 1:
+        time.sleep(0.01)
+    assert travaux.annuler(en_attente.id).etat == ANNULE
+    travaux.annuler(en_cours.id)
+    liberation.set()
+    assert attendre(travaux, en_cours.id).etat == ANNULE
+    assert en_cours.resultat is None and en_attente.pages_faites == 0
+    travaux.fermer()
+
+def test_file_bornee_et_expiration():
+    travaux = TravauxRendu(concurrence=1, file_max=1, ttl=0.05)
+    liberation = threading.Event()
+    premier = travaux.soumettre(rendu_bloque(liberation))
+    travaux.soumettre(rendu_bloque(liberation))
+    with pytest.raises(TravauxSaturesError):
+        travaux.soumettre(rendu_bloque(liberation))
+    liberation.set()
+    attendre(travaux, premier.id)
+    time.sleep(0.1)
+    assert travaux.get(premier.id) is None
+    travaux.fermer()
+
+def test_echec_du_rendu():
+    travaux = TravauxRendu()
+    def rendre(progression):
+        raise ValueError("plan illisible")
+    travail = attendre(travaux, travaux.soumettre(rendre).id)
+    assert (travail.etat, travail.erreur) == (ECHEC, "plan illisible")
+    travaux.fermer()
+
+# --- Tests pour les routes /api/jobs ---
+
+def test_routes_jobs(projet_data):
+    plan = client.post("/api/process-data", json=projet_data).json()["data"]
+    plan["description_projet"] += " (rendu en arrière-plan)"  # évite le cache des PDF
+    reponse = client.post("/api/jobs", json={"plan": plan})
+    assert reponse.status_code == 202
+    job_id = reponse.json()["job_id"]
+    fin = time.monotonic() + 10
+    while (statut := client.get(f"/api/jobs/{job_id}").json())["etat"] != TERMINE and time.monotonic() < fin:
+        time.sleep(0.02)
+    assert statut["pages_faites"] == statut["pages_total"] > 0
+    pdf = client.get(f"/api/jobs/{job_id}/pdf")
+    assert pdf.status_code == 200 and pdf.content.startswith(b"%PDF")
+    assert client.delete(f"/api/jobs/{job_id}").status_code == 200
+    assert client.get(f"/api/jobs/{job_id}").status_code == 404
+
+def test_creer_plan_pdf_interrompu(projet_data):
+    """RenduInterrompu levée par le rappel de progression remonte au lieu d'être avalée."""
+    import dessin_pdf
+    plan = client.post("/api/process-data", json=projet_data).json()["data"]
+    def progression(faites, total):
+        if faites == 1:
+            raise RenduInterrompu()
+    with pytest.raises(RenduInterrompu):
+        dessin_pdf.creer_plan_pdf(plan, progression=progression)
@@ -0,0 +1,173 @@
+# travaux.py
+
+import collections
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from rendu import RenduInterrompu
+
+# États d'un travail ; les trois derniers sont définitifs.
+EN_ATTENTE, EN_COURS, TERMINE, ECHEC, ANNULE = "en_attente", "en_cours", "termine", "echec", "annule"
+ETATS_FINAUX = (TERMINE, ECHEC, ANNULE)
+
+
+class TravauxSaturesError(Exception):
+    """Levée quand la file des travaux en attente est pleine."""
+
+
+class TravailRendu:
+    """Un rendu soumis : état, progression (pages dessinées sur le total), PDF ou erreur une fois fini."""
+
+    def __init__(self, travail_id: str):
+        self.id = travail_id
+        self.etat = EN_ATTENTE
+        self.pages_faites = 0
+        self.pages_total: Optional[int] = None
+        self.resultat: Optional[bytes] = None
+        self.erreur: Optional[str] = None
+        self.soumis = time.monotonic()
+        self.debut: Optional[float] = None
+        self.fin: Optional[float] = None
+        self.annulation = threading.Event()
+        self.futur: Optional[Future] = None
+
+    def progression(self, faites: int, total: int):
+        """Rappel passé au rendu, appelé après chaque page ; après une annulation, arrête le rendu."""
+        if self.annulation.is_set():
+            raise RenduInterrompu(f"Travail {self.id} annulé.")
+        self.pages_faites, self.pages_total = faites, total
+
+    def en_dict(self) -> Dict[str, Any]:
+        fin = self.fin if self.fin is not None else time.monotonic()
+        return {
+            "job_id": self.id,
+            "etat": self.etat,
+            "pages_faites": self.pages_faites,
+            "pages_total": self.pages_total,
+            "attente_s": round((self.debut if self.debut is not None else fin) - self.soumis, 3),
+            "duree_s": round(fin - self.debut, 3) if self.debut is not None else None,
+            "taille_octets": len(self.resultat) if self.resultat is not None else None,
+            "erreur": self.erreur,
+        }
+
+
+class TravauxRendu:
+    """Rendus longs exécutés en arrière-plan, suivis par identifiant.
+
+    Au plus `concurrence` travaux sont lancés en même temps ; au-delà, jusqu'à `file_max`
+    attendent et `soumettre` refuse les suivants. Chaque travail lancé occupe un thread qui
+    ne fait qu'attendre : `rendre` confie le dessin au pool de rendu (PoolRendu.executer_bloquant),
+    qui borne les rendus de toutes les routes ensemble. Un travail fini (PDF compris) est gardé
+    `ttl` secondes, et au plus `max_finis`.
+    """
+
+    def __init__(self, concurrence: int = 2, file_max: int = 32, ttl: float = 900, max_finis: int = 100):
+        self.concurrence = max(1, concurrence)
+        self.file_max = max(0, file_max)
+        self.ttl = ttl
+        self.max_finis = max_finis
+        self._travaux: Dict[str, TravailRendu] = {}
+        # Travaux finis par ordre de fin, donc d'échéance.
+        self._finis: "collections.OrderedDict[str, float]" = collections.OrderedDict()
+        self._verrou = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.concurrence, thread_name_prefix="travail")
+        return self._executor
+
+    def actifs(self) -> int:
+        return sum(1 for t in self._travaux.values() if t.etat not in ETATS_FINAUX)
+
+    def soumettre(self, rendre: Callable[[Callable[[int, int], None]], bytes]) -> TravailRendu:
+        """Planifie `rendre(progression)`, qui renvoie le PDF ; lève TravauxSaturesError si la file est pleine."""
+        with self._verrou:
+            self._purger()
+            if self.actifs() >= self.concurrence + self.file_max:
+                raise TravauxSaturesError(f"{self.actifs()} travaux en cours ou en attente (limite {self.concurrence + self.file_max}).")
+            travail = TravailRendu(secrets.token_urlsafe(8))
+            self._travaux[travail.id] = travail
+        travail.futur = self.executor.submit(self._executer, travail, rendre)
+        return travail
+
+    def get(self, travail_id: str) -> Optional[TravailRendu]:
+        with self._verrou:
+            self._purger()
+            return self._travaux.get(travail_id)
+
+    def annuler(self, travail_id: str) -> Optional[TravailRendu]:
+        """Annule un travail en attente ou en cours ; un travail fini est oublié (son PDF libéré)."""
+        with self._verrou:
+            self._purger()
+            travail = self._travaux.get(travail_id)
+            if travail is None:
+                return None
+            if travail.etat in ETATS_FINAUX:
+                del self._travaux[travail_id]
+                self._finis.pop(travail_id, None)
+                return travail
+            travail.annulation.set()
+            if travail.futur is not None and travail.futur.cancel():
+                # Jamais démarré : le thread ne le verra pas, on le clôt ici.
+                self._clore(travail, ANNULE)
+        return travail
+
+    def _executer(self, travail: TravailRendu, rendre: Callable[[Callable[[int, int], None]], bytes]):
+        with self._verrou:
+            if travail.annulation.is_set():
+                self._clore(travail, ANNULE)
+                return
+            travail.etat, travail.debut = EN_COURS, time.monotonic()
+        try:
+            resultat = rendre(travail.progression)
+        except RenduInterrompu:
+            etat, resultat = ANNULE, None
+        except Exception as e:
+            etat, resultat = ECHEC, None
+            travail.erreur = str(e) or type(e).__name__
+        else:
+            # Annulé pendant la dernière page ou l'écriture du PDF : le résultat est abandonné.
+            etat = ANNULE if travail.annulation.is_set() else TERMINE
+            resultat = resultat if etat == TERMINE else None
+        with self._verrou:
+            travail.resultat = resultat
+            self._clore(travail, etat)
+
+    def _clore(self, travail: TravailRendu, etat: str):
+        travail.etat, travail.fin = etat, time.monotonic()
+        self._finis[travail.id] = travail.fin + self.ttl
+        while len(self._finis) > self.max_finis:
+            ancien, _ = self._finis.popitem(last=False)
+            self._travaux.pop(ancien, None)
+
+    def _purger(self):
+        maintenant = time.monotonic()
+        while self._finis:
+            travail_id, echeance = next(iter(self._finis.items()))
+            if echeance > maintenant:
+                break
+            del self._finis[travail_id]
+            self._travaux.pop(travail_id, None)
+
+    def fermer(self):
+        for travail in list(self._travaux.values()):
+            travail.annulation.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def travaux_depuis_env() -> TravauxRendu:
+    """Construit le gestionnaire à partir des variables d'environnement TRAVAUX_*."""
+    return TravauxRendu(
+        concurrence=int(os.getenv("TRAVAUX_CONCURRENCE", "2")),
+        file_max=int(os.getenv("TRAVAUX_FILE_MAX", "32")),
+        ttl=float(os.getenv("TRAVAUX_TTL_SECONDES", "900")),
+        max_finis=int(os.getenv("TRAVAUX_MAX_FINIS", "100")),
+    )